@@ -0,0 +1,283 @@
+"""
+Adaptive bitrate.
+Chooses between the bitrate variants of multi-bitrate stations. A background
+thread measures the sustained download rate of the playing stream and the
+decoder's underruns, steps down to a lower bitrate when the connection cannot
+keep up, and tries the next higher bitrate again after a stable period. The
+chosen bitrate is a ceiling shared by all stations, since a weak connection
+affects them alike.
+"""
+import collections
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import constants as const
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class VariantSelector:
+    """Bitrate ceiling for multi-bitrate stations, adjusted to the measured throughput."""
+
+    def __init__(self, measure: Callable[[], Optional[Tuple[Optional[int], Optional[int]]]]):
+        """
+        Initialize the VariantSelector.
+
+        Args:
+            measure: Function returning (bytes received, decoder underruns) of the playing stream,
+                     either may be None if unknown; returns None while nothing is playing
+        """
+        self.measure = measure
+        # Highest bitrate in kbps that plays without stalling, None while there is no limit
+        self.ceiling_kbps: Optional[int] = None
+        self.station: Optional[str] = None
+        self.variants: List[Dict] = []
+        self.index = 0
+        self.reason: Optional[str] = None
+        self.throughput_kbps: Optional[float] = None
+        self.step_downs = 0
+        self.step_ups = 0
+
+        self._lock = threading.Lock()
+        # (monotonic time, bytes received) within the measuring window
+        self._samples = collections.deque()
+        self._underrun_times = collections.deque()
+        self._last_underruns: Optional[int] = None
+        self._started_at = time.monotonic()
+        self._stable_since = self._started_at
+        self._stepped_up_at: Optional[float] = None
+        self._up_hold = const.ADAPTIVE_UP_HOLD
+        self._listeners: List[Callable[[str], None]] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="variant-selector", daemon=True)
+
+    def start(self):
+        """Start measuring in the background."""
+        self._thread.start()
+
+    def stop(self):
+        """Stop the measuring thread."""
+        self._stop.set()
+
+    def add_listener(self, callback: Callable[[str], None]):
+        """
+        Register a function to call when the playing station should change variant.
+
+        Args:
+            callback: Function taking the station name, called on the measuring thread
+        """
+        self._listeners.append(callback)
+
+    def index_for(self, variants: List[Dict]) -> int:
+        """
+        Get the best variant within the ceiling.
+
+        Args:
+            variants: Variants of a station, best first
+
+        Returns:
+            Index of the first variant at or below the ceiling, the last one if all are above it
+        """
+        ceiling = self.ceiling_kbps
+        if ceiling is None:
+            return 0
+        for index, variant in enumerate(variants):
+            if variant['bitrate'] <= ceiling:
+                return index
+        return max(len(variants) - 1, 0)
+
+    def choose(self, station_name: str, variants: List[Dict]) -> int:
+        """
+        Pick the variant of a station that is being started and measure it from now on.
+
+        Args:
+            station_name: Name of the station
+            variants: Variants of the station, best first; empty for single-stream stations
+
+        Returns:
+            Index of the variant to play
+        """
+        with self._lock:
+            self.station = station_name
+            self.variants = variants
+            self.index = self.index_for(variants)
+            self._reset(time.monotonic())
+            return self.index
+
+    def _reset(self, now: float):
+        """Forget the measurements of the previous stream. Caller holds the lock."""
+        self._samples.clear()
+        self._underrun_times.clear()
+        self._last_underruns = None
+        self.throughput_kbps = None
+        self._started_at = now
+        self._stable_since = now
+
+    def _run(self):
+        """Measuring loop."""
+        while not self._stop.wait(const.ADAPTIVE_CHECK_INTERVAL):
+            try:
+                station = self.sample()
+                if station is None:
+                    continue
+                for callback in self._listeners:
+                    callback(station)
+            except Exception as e:
+                logger.error(f"Variant selector error: {e}")
+
+    def sample(self) -> Optional[str]:
+        """
+        Measure the playing stream once and move the ceiling if needed.
+
+        Returns:
+            Station to restart with another variant, or None to keep playing
+        """
+        measurement = self.measure()
+        now = time.monotonic()
+        with self._lock:
+            if measurement is None:
+                # Stopped or paused: nothing is played that could underrun
+                self._reset(now)
+                return None
+            if now - self._started_at < const.ADAPTIVE_START_GRACE:
+                # The connect burst is faster than the stream, leave it out
+                return None
+            self._record(now, *measurement)
+            if len(self.variants) < 2:
+                return None
+
+            problem = self._find_problem(now)
+            if problem is not None:
+                return self._step_down(now, problem)
+            if now - self._stable_since >= self._up_hold and self.index > 0:
+                return self._step_up(now)
+            return None
+
+    def _record(self, now: float, bytes_received: Optional[int], underruns: Optional[int]):
+        """Add a sample and drop the ones that left the window. Caller holds the lock."""
+        if bytes_received is not None:
+            if self._samples and bytes_received < self._samples[-1][1]:
+                # A new connection counts from zero again
+                self._samples.clear()
+            self._samples.append((now, bytes_received))
+        while self._samples and now - self._samples[0][0] > const.ADAPTIVE_WINDOW:
+            self._samples.popleft()
+        if len(self._samples) > 1:
+            (first_at, first_bytes), (last_at, last_bytes) = self._samples[0], self._samples[-1]
+            if last_at > first_at:
+                self.throughput_kbps = (last_bytes - first_bytes) * 8 / 1000 / (last_at - first_at)
+
+        if underruns is not None:
+            # The first sample is the baseline; the decoder's counter starts again for every stream it loads
+            previous = underruns if self._last_underruns is None else self._last_underruns
+            if underruns < previous:
+                previous = 0
+            self._underrun_times.extend([now] * (underruns - previous))
+            self._last_underruns = underruns
+        while self._underrun_times and now - self._underrun_times[0] > const.ADAPTIVE_WINDOW:
+            self._underrun_times.popleft()
+
+    def _find_problem(self, now: float) -> Optional[str]:
+        """
+        Check whether the playing variant keeps up. Caller holds the lock.
+
+        Args:
+            now: Current monotonic time
+
+        Returns:
+            Description of the problem, or None if the variant plays fine
+        """
+        if len(self._underrun_times) >= const.ADAPTIVE_UNDERRUNS_DOWN:
+            return f"{len(self._underrun_times)} underruns in {const.ADAPTIVE_WINDOW}s"
+        full_window = self._samples and now - self._samples[0][0] >= const.ADAPTIVE_WINDOW * 0.9
+        bitrate = self.variants[self.index]['bitrate']
+        if full_window and self.throughput_kbps < bitrate * const.ADAPTIVE_SLOW_RATIO:
+            return f"{self.throughput_kbps:.0f} kbps received for {bitrate} kbps"
+        if self._underrun_times:
+            # A single underrun does not step down, but it is not stable either
+            self._stable_since = now
+        return None
+
+    def _step_down(self, now: float, problem: str) -> Optional[str]:
+        """
+        Lower the ceiling below the playing variant. Caller holds the lock.
+
+        Args:
+            now: Current monotonic time
+            problem: Why the playing variant does not keep up
+
+        Returns:
+            Station to restart, or None if it already plays its lowest variant
+        """
+        if self.index >= len(self.variants) - 1:
+            self._stable_since = now
+            return None
+        index = self.index + 1
+        if self.throughput_kbps is not None:
+            # Skip variants the measured throughput cannot carry either
+            usable = self.throughput_kbps * const.ADAPTIVE_SAFETY_RATIO
+            while index < len(self.variants) - 1 and self.variants[index]['bitrate'] > usable:
+                index += 1
+
+        if self._stepped_up_at is not None and now - self._stepped_up_at < const.ADAPTIVE_PROBE_TIME:
+            # The last step up did not hold, wait longer before the next one
+            self._up_hold = min(self._up_hold * 2, const.ADAPTIVE_UP_HOLD_MAX)
+        else:
+            self._up_hold = const.ADAPTIVE_UP_HOLD
+        self._stepped_up_at = None
+        return self._set_ceiling(index, 'down', problem)
+
+    def _step_up(self, now: float) -> str:
+        """Raise the ceiling to the next higher variant after a stable period. Caller holds the lock."""
+        self._stepped_up_at = now
+        return self._set_ceiling(self.index - 1, 'up', f"stable for {now - self._stable_since:.0f}s")
+
+    def _set_ceiling(self, index: int, direction: str, reason: str) -> str:
+        """
+        Move the ceiling to a variant of the playing station. Caller holds the lock.
+
+        Args:
+            index: Variant to play next
+            direction: 'up' or 'down'
+            reason: Why the ceiling moved
+
+        Returns:
+            Station to restart
+        """
+        old, new = self.variants[self.index]['bitrate'], self.variants[index]['bitrate']
+        self.ceiling_kbps = new if index > 0 else None
+        self.reason = reason
+        if direction == 'down':
+            self.step_downs += 1
+            logger.warning(f"Stepping {self.station} down from {old} to {new} kbps: {reason}")
+        else:
+            self.step_ups += 1
+            logger.info(f"Stepping {self.station} up from {old} to {new} kbps: {reason}")
+        metrics.VARIANT_SWITCHES.inc(direction=direction)
+        self._reset(time.monotonic())
+        return self.station
+
+    def get_stats(self) -> Dict:
+        """
+        Get the variant choice for /status.
+
+        Returns:
+            Dictionary with the playing variant, ceiling, throughput and step counts
+        """
+        with self._lock:
+            variant = self.variants[self.index] if self.index < len(self.variants) else None
+            return {
+                'station': self.station,
+                'index': self.index if variant is not None else None,
+                'variants': len(self.variants),
+                'bitrate_kbps': variant['bitrate'] if variant is not None else None,
+                'ceiling_kbps': self.ceiling_kbps,
+                'throughput_kbps': round(self.throughput_kbps) if self.throughput_kbps is not None else None,
+                'recent_underruns': len(self._underrun_times),
+                'reason': self.reason,
+                'step_downs': self.step_downs,
+                'step_ups': self.step_ups,
+            }
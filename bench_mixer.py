@@ -0,0 +1,88 @@
+"""
+Microbenchmark for the volume mixer backends.
+Times volume up/down steps with the persistent amixer session and with one
+amixer process per call, each until amixer has reported the new level, and
+restores the original volume afterwards.
+
+Usage: python bench_mixer.py [--iterations N] [--amixer PATH]
+"""
+import argparse
+import shutil
+import statistics
+import sys
+import time
+from typing import Tuple
+
+import constants as const
+from mixer import AmixerSessionMixer, SubprocessMixer, read_mixer_state
+
+
+def bench(mixer, iterations: int, step: int, start_level: int) -> Tuple[list, int]:
+    """
+    Time alternating volume up and down steps through to the confirmed level.
+
+    Args:
+        mixer: Mixer backend to benchmark
+        iterations: Number of up/down pairs
+        step: Step size in percentage points
+        start_level: Volume before the first step
+
+    Returns:
+        Tuple of (per-call durations in milliseconds, steps not confirmed at the expected level)
+    """
+    durations = []
+    mismatches = 0
+    level = start_level
+    for _ in range(iterations):
+        for delta in (step, -step):
+            start = time.perf_counter()
+            confirmed = mixer.adjust(delta)
+            durations.append((time.perf_counter() - start) * 1000)
+            level = max(0, min(100, level + delta))
+            if confirmed != level:
+                # amixer rounds to hardware steps, continue from what it reports
+                mismatches += 1
+                level = confirmed if confirmed is not None else level
+    return durations, mismatches
+
+
+def main():
+    """Run the benchmark and print a comparison."""
+    parser = argparse.ArgumentParser(description="Compare mixer backend latency")
+    parser.add_argument('--iterations', type=int, default=50, help="up/down pairs per backend (default: 50)")
+    parser.add_argument('--amixer', default=shutil.which('amixer'), help="path to amixer")
+    args = parser.parse_args()
+
+    if not args.amixer:
+        print("amixer not found, nothing to benchmark")
+        return 1
+
+    original_level, _ = read_mixer_state(args.amixer)
+    if original_level is None:
+        print("could not read the volume, nothing to benchmark")
+        return 1
+    step = int(const.VOLUME_STEP.rstrip('%'))
+    results = {}
+
+    for mixer_class in (SubprocessMixer, AmixerSessionMixer):
+        mixer = mixer_class(args.amixer)
+        try:
+            results[mixer_class.name] = bench(mixer, args.iterations, step, original_level)
+        finally:
+            mixer.set_level(original_level)
+            mixer.close()
+
+    print(f"{'backend':<16} {'calls':>6} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'mismatch':>9}")
+    for name, (durations, mismatches) in results.items():
+        ordered = sorted(durations)
+        p95 = ordered[int(len(ordered) * 0.95) - 1]
+        print(f"{name:<16} {len(durations):>6} {statistics.mean(durations):>9.2f} "
+              f"{statistics.median(durations):>8.2f} {p95:>8.2f} {ordered[-1]:>8.2f} {mismatches:>9}")
+
+    speedup = statistics.mean(results['subprocess'][0]) / max(statistics.mean(results['amixer-session'][0]), 1e-6)
+    print(f"\namixer session is {speedup:.1f}x faster per volume step")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,418 @@
+"""
+Switch-latency benchmark.
+Starts the stand-in stream server, drives RadioPlayer or the HTTP API through
+a scripted zapping session and reports time-to-audio, switch latency and the
+CPU and memory use of this process and the decoder. Results are written as
+JSON so runs can be compared over time. No network access is needed.
+
+Usage: python bench_switch.py [--session zap|jump|linger] [--rounds N]
+                              [--driver player|api] [--output FILE] [--compare FILE]
+"""
+import argparse
+import datetime
+import http.client
+import json
+import logging
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import constants as const
+import main as radio
+from coalescer import CommandCoalescer
+from executor import CommandExecutor
+from stream_standin import MP3_BYTES_PER_SECOND, StandinServer
+
+# Stand-in stations and their faults
+STANDIN_STATIONS = {
+    'standin_fast_1': {},
+    'standin_slow_connect': {'delay': 1.0},
+    'standin_fast_2': {},
+    'standin_capped': {'rate': int(MP3_BYTES_PER_SECOND * 1.1), 'burst': 0},
+    'standin_redirect': {'redirect': 2},
+    'standin_fast_3': {},
+    'standin_dropping': {'drop_after': MP3_BYTES_PER_SECOND * 6},
+    'standin_playlist': {'playlist': 'm3u'},
+}
+
+SESSIONS = {
+    # Step through the list like a user holding the joystick
+    'zap': {'dwell': 1.5, 'order': 'sequential'},
+    # Jump to random stations, seeded so runs are comparable
+    'jump': {'dwell': 3.0, 'order': 'random'},
+    # Stay long enough for drops and reconnects to happen
+    'linger': {'dwell': 10.0, 'order': 'sequential'},
+}
+
+SAMPLE_INTERVAL = 0.5
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """
+    Get a nearest-rank percentile.
+
+    Args:
+        values: Samples
+        fraction: Percentile as a fraction, e.g. 0.95
+
+    Returns:
+        Percentile, or None without samples
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(fraction * len(ordered))) - 1))]
+
+
+def summarize(values: List[float]) -> Dict:
+    """Get count, p50, p95 and max of a list of seconds."""
+    def rounded(value):
+        return round(value, 4) if value is not None else None
+    return {
+        'samples': len(values),
+        'p50': rounded(percentile(values, 0.5)),
+        'p95': rounded(percentile(values, 0.95)),
+        'max': rounded(max(values) if values else None),
+    }
+
+
+def read_process_stats(pid: int) -> Optional[Tuple[int, int]]:
+    """
+    Read CPU ticks and resident memory of a process from /proc.
+
+    Args:
+        pid: Process id
+
+    Returns:
+        Tuple of (utime + stime in clock ticks, RSS in KB), or None if the process is gone
+    """
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # The command name may contain spaces, fields start after the closing parenthesis
+            fields = f.read().rsplit(')', 1)[1].split()
+        ticks = int(fields[11]) + int(fields[12])
+        rss_kb = 0
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss_kb = int(line.split()[1])
+                    break
+        return ticks, rss_kb
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class ResourceSampler:
+    """Samples CPU and RSS of this process and the decoder in the background."""
+
+    def __init__(self, player):
+        """
+        Initialize the ResourceSampler.
+
+        Args:
+            player: RadioPlayer whose decoder is sampled
+        """
+        self.player = player
+        self.samples = {'python': [], 'decoder': []}
+        # pid -> (first ticks, last ticks)
+        self._ticks = {'python': {}, 'decoder': {}}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._started_at = 0.0
+        self._stopped_at = 0.0
+
+    def start(self):
+        """Start sampling."""
+        self._started_at = time.monotonic()
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling."""
+        self._stop.set()
+        self._thread.join()
+        self._stopped_at = time.monotonic()
+
+    def _decoder_pid(self) -> Optional[int]:
+        """Get the pid of the current decoder process."""
+        process = getattr(self.player.backend, 'process', None)
+        return process.pid if process is not None and process.poll() is None else None
+
+    def _run(self):
+        """Sampling loop."""
+        while True:
+            for kind, pid in (('python', os.getpid()), ('decoder', self._decoder_pid())):
+                stats = read_process_stats(pid) if pid else None
+                if stats is None:
+                    continue
+                ticks, rss_kb = stats
+                first, _ = self._ticks[kind].get(pid, (ticks, ticks))
+                self._ticks[kind][pid] = (first, ticks)
+                self.samples[kind].append(rss_kb)
+            if self._stop.wait(SAMPLE_INTERVAL):
+                break
+
+    def results(self) -> Dict:
+        """Get CPU percentage and RSS statistics per process kind."""
+        wall = max(self._stopped_at - self._started_at, 1e-6)
+        clock_ticks = os.sysconf('SC_CLK_TCK')
+        results = {}
+        for kind, samples in self.samples.items():
+            ticks = sum(last - first for first, last in self._ticks[kind].values())
+            results[kind] = {
+                'cpu_percent': round(100 * ticks / clock_ticks / wall, 2),
+                'rss_max_kb': max(samples) if samples else None,
+                'rss_mean_kb': round(sum(samples) / len(samples)) if samples else None,
+                'processes': len(self._ticks[kind]),
+            }
+        return results
+
+
+def build_schedule(session: str, rounds: int, seed: int) -> List[Tuple[str, float]]:
+    """
+    Build the list of switches for a session.
+
+    Args:
+        session: Session name from SESSIONS
+        rounds: Number of passes over the station list
+        seed: Random seed for the 'random' order
+
+    Returns:
+        List of (station, dwell seconds)
+    """
+    config = SESSIONS[session]
+    names = list(STANDIN_STATIONS)
+    if config['order'] == 'random':
+        rng = random.Random(seed)
+        order = [rng.choice(names) for _ in range(rounds * len(names))]
+    else:
+        order = names * rounds
+    return [(name, config['dwell']) for name in order]
+
+
+def write_stations(base_dir: str, server: StandinServer):
+    """
+    Write a station list pointing at the stand-in server.
+
+    Args:
+        base_dir: Directory the StationManager loads from
+        server: Running stand-in server
+    """
+    stations = {}
+    for name, params in STANDIN_STATIONS.items():
+        params = dict(params)
+        playlist = params.pop('playlist', None)
+        if playlist:
+            stations[name] = server.playlist_url(name, playlist, **params)
+        else:
+            stations[name] = server.url(name, **params)
+    with open(os.path.join(base_dir, 'default_stations.json'), 'w') as f:
+        json.dump(stations, f, indent=2)
+
+
+class ApiDriver:
+    """Switches stations through the HTTP API over one keep-alive connection."""
+
+    def __init__(self, port: int):
+        """
+        Initialize the ApiDriver.
+
+        Args:
+            port: Port of the HTTP API
+        """
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+
+    def switch(self, player, station: str):
+        """Request a station and wait for the response."""
+        self.connection.request('GET', f'/play/{quote(station)}')
+        response = self.connection.getresponse()
+        response.read()
+
+
+class PlayerDriver:
+    """Switches stations by calling RadioPlayer directly."""
+
+    def switch(self, player, station: str):
+        """Start a station and return once start_stream() returned."""
+        player.play_station_by_name(station)
+
+
+def run_session(player, driver, schedule: List[Tuple[str, float]]) -> Dict:
+    """
+    Play the schedule and measure every switch.
+
+    Args:
+        player: RadioPlayer instance
+        driver: PlayerDriver or ApiDriver
+        schedule: List of (station, dwell seconds)
+
+    Returns:
+        Dictionary with time-to-audio and switch latency results
+    """
+    time_to_audio = {'all': [], 'warm': [], 'cold': []}
+    switch_latency = []
+    per_station: Dict[str, List[float]] = {}
+    no_audio = 0
+
+    for station, dwell in schedule:
+        seen = len(player.switch_latencies)
+        started_at = time.monotonic()
+        driver.switch(player, station)
+        switch_latency.append(time.monotonic() - started_at)
+        time.sleep(max(0.0, dwell - (time.monotonic() - started_at)))
+
+        new = [entry for entry in list(player.switch_latencies)[seen:] if entry[0] == station]
+        if not new:
+            no_audio += 1
+            print(f"  {station:<22} no audio within {dwell:.1f}s")
+            continue
+        _, latency, warm = new[0]
+        time_to_audio['all'].append(latency)
+        time_to_audio['warm' if warm else 'cold'].append(latency)
+        per_station.setdefault(station, []).append(latency)
+        print(f"  {station:<22} {latency * 1000:>7.0f} ms {'warm' if warm else 'cold'}")
+
+    return {
+        'time_to_audio': {kind: summarize(values) for kind, values in time_to_audio.items()},
+        'switch_latency': summarize(switch_latency),
+        'no_audio': no_audio,
+        'per_station': {name: summarize(values) for name, values in sorted(per_station.items())},
+    }
+
+
+def git_commit() -> Optional[str]:
+    """Get the current commit, if this is a git checkout."""
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+        return result.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(previous: Dict, current: Dict):
+    """
+    Print the change of the headline numbers against an earlier run.
+
+    Args:
+        previous: Results loaded from an earlier output file
+        current: Results of this run
+    """
+    rows = [
+        ('time to audio p50', ('time_to_audio', 'all', 'p50')),
+        ('time to audio p95', ('time_to_audio', 'all', 'p95')),
+        ('warm p50', ('time_to_audio', 'warm', 'p50')),
+        ('cold p50', ('time_to_audio', 'cold', 'p50')),
+        ('switch latency p95', ('switch_latency', 'p95')),
+        ('python cpu %', ('resources', 'python', 'cpu_percent')),
+        ('python rss max KB', ('resources', 'python', 'rss_max_kb')),
+        ('decoder cpu %', ('resources', 'decoder', 'cpu_percent')),
+        ('decoder rss max KB', ('resources', 'decoder', 'rss_max_kb')),
+    ]
+
+    def lookup(data, path):
+        for key in path:
+            data = data.get(key) if isinstance(data, dict) else None
+        return data
+
+    print(f"\nCompared with {previous.get('commit')} ({previous.get('timestamp')}):")
+    for label, path in rows:
+        old, new = lookup(previous, path), lookup(current, path)
+        if old is None or new is None:
+            continue
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"  {label:<20} {old:>10} -> {new:<10} {change}")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark station switching against a local stand-in server")
+    parser.add_argument('--session', choices=sorted(SESSIONS), default='zap', help="zapping script (default: zap)")
+    parser.add_argument('--rounds', type=int, default=3, help="passes over the station list (default: 3)")
+    parser.add_argument('--driver', choices=('player', 'api'), default='player',
+                        help="switch through RadioPlayer or the HTTP API (default: player)")
+    parser.add_argument('--seed', type=int, default=1, help="random seed for the jump session (default: 1)")
+    parser.add_argument('--warmup', type=float, default=3.0, help="seconds to settle before measuring (default: 3)")
+    parser.add_argument('--media', help="directory with canned MP3/AAC files for the stand-in server")
+    parser.add_argument('--output', default='bench_switch.json', help="results file (default: bench_switch.json)")
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    server = StandinServer(media_dir=args.media)
+    server.start()
+    base_dir = tempfile.mkdtemp(prefix='pi-radio-bench-')
+    write_stations(base_dir, server)
+
+    executor = CommandExecutor()
+    executor.start()
+    player = radio.RadioPlayer(radio.StationManager(base_dir), executor)
+    http_api = None
+    if args.driver == 'api':
+        const.HTTP_API_PORT = 0
+        volume = radio.VolumeController()
+        http_api = radio.HttpApi(player, volume, CommandCoalescer(player, volume, executor), executor, None)
+        http_api.start()
+        driver = ApiDriver(http_api.server.server_address[1])
+    else:
+        driver = PlayerDriver()
+
+    schedule = build_schedule(args.session, args.rounds, args.seed)
+    print(f"Session '{args.session}': {len(schedule)} switches via {args.driver}, "
+          f"{player.backend.name if player.backend else 'no'} backend")
+    time.sleep(args.warmup)
+
+    sampler = ResourceSampler(player)
+    sampler.start()
+    try:
+        results = run_session(player, driver, schedule)
+    finally:
+        sampler.stop()
+        if http_api is not None:
+            http_api.stop()
+        player.stop_stream()
+        player.shutdown()
+        server.stop()
+        shutil.rmtree(base_dir, ignore_errors=True)
+
+    report = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'session': args.session,
+        'rounds': args.rounds,
+        'driver': args.driver,
+        'seed': args.seed,
+        'backend': player.backend.name if player.backend else None,
+        'python_version': sys.version.split()[0],
+        **results,
+        'resources': sampler.results(),
+        'standin_connections': server.connections,
+    }
+
+    tta, resources = report['time_to_audio'], report['resources']
+    print(f"\ntime to audio  p50 {tta['all']['p50']}s  p95 {tta['all']['p95']}s  "
+          f"(warm p50 {tta['warm']['p50']}s, cold p50 {tta['cold']['p50']}s)")
+    print(f"switch latency p50 {report['switch_latency']['p50']}s  p95 {report['switch_latency']['p95']}s")
+    print(f"no audio       {report['no_audio']} of {len(schedule)} switches")
+    for kind in ('python', 'decoder'):
+        print(f"{kind:<14} cpu {resources[kind]['cpu_percent']}%  rss max {resources[kind]['rss_max_kb']} KB")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
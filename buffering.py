@@ -0,0 +1,236 @@
+"""
+Memory-budgeted buffering.
+Derives the decoder, warm-stream and time-shift buffer sizes from each
+stream's bitrate and a global budget based on the RAM reported by
+/proc/meminfo. A background thread samples available memory and the RSS of
+the service and the decoder, and shrinks all buffers under memory pressure
+before the OOM killer has to step in.
+"""
+import logging
+import os
+import threading
+from typing import Callable, Dict, List, Optional
+
+import constants as const
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Buffer scale per memory level, from no pressure to critical
+LEVEL_SCALES = {'normal': 1.0, 'pressure': 0.5, 'critical': 0.25}
+
+
+def read_meminfo(path: str = '/proc/meminfo') -> Dict[str, int]:
+    """
+    Read system memory counters.
+
+    Args:
+        path: meminfo file
+
+    Returns:
+        Dictionary of counter name to bytes, empty where /proc is not available
+    """
+    info = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                fields = value.split()
+                if fields and fields[0].isdigit():
+                    info[name] = int(fields[0]) * (1024 if fields[1:] == ['kB'] else 1)
+    except OSError:
+        pass
+    return info
+
+
+def read_rss(pid: int) -> Optional[int]:
+    """
+    Get the resident memory of a process.
+
+    Args:
+        pid: Process id
+
+    Returns:
+        RSS in bytes, or None if the process is gone
+    """
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class BufferPolicy:
+    """Buffer sizes within a memory budget, shrunk while the system is short on memory."""
+
+    def __init__(self, decoder_pid: Optional[Callable[[], Optional[int]]] = None):
+        """
+        Initialize the BufferPolicy and compute the budget.
+
+        Args:
+            decoder_pid: Function returning the pid of the decoder process, if there is one
+        """
+        self.decoder_pid = decoder_pid
+        info = read_meminfo()
+        self.total_bytes: Optional[int] = info.get('MemTotal')
+        self.available_bytes: Optional[int] = info.get('MemAvailable')
+        self.budget_bytes = self._compute_budget(self.total_bytes)
+        self.level = 'normal'
+        self.rss: Dict[str, Optional[int]] = {'service': None, 'decoder': None}
+        self.peak_rss: Dict[str, int] = {'service': 0, 'decoder': 0}
+        self.min_available_bytes = self.available_bytes
+        self._listeners: List[Callable[[], None]] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="buffer-policy", daemon=True)
+        logger.info(f"Buffer budget {self.budget_bytes // 1024} KB"
+                    f"{f' of {self.total_bytes // (1024 * 1024)} MB RAM' if self.total_bytes else ''}")
+
+    @staticmethod
+    def _compute_budget(total_bytes: Optional[int]) -> int:
+        """Get the memory all stream buffers together may use."""
+        if const.BUFFER_MEMORY_BUDGET:
+            return const.BUFFER_MEMORY_BUDGET
+        if not total_bytes:
+            return const.BUFFER_MEMORY_MAX
+        return int(min(total_bytes * const.BUFFER_MEMORY_FRACTION, const.BUFFER_MEMORY_MAX))
+
+    def start(self):
+        """Start sampling memory in the background."""
+        self._thread.start()
+
+    def stop(self):
+        """Stop the sampling thread."""
+        self._stop.set()
+
+    def add_listener(self, callback: Callable[[], None]):
+        """
+        Register a function to call when the buffer sizes change.
+
+        Args:
+            callback: Function without arguments, called on the sampling thread
+        """
+        self._listeners.append(callback)
+
+    @property
+    def scale(self) -> float:
+        """Factor applied to all buffer sizes at the current memory level."""
+        return LEVEL_SCALES[self.level]
+
+    @staticmethod
+    def _bytes_per_second(bitrate_kbps: Optional[int]) -> float:
+        """Get the data rate of a stream, assuming TIMESHIFT_DEFAULT_KBPS if it is unknown."""
+        return (bitrate_kbps or const.TIMESHIFT_DEFAULT_KBPS) * 1000 / 8
+
+    def decoder_buffer_bytes(self, bitrate_kbps: Optional[int] = None) -> int:
+        """
+        Get the buffer size for the decoder.
+
+        Args:
+            bitrate_kbps: Bitrate of the stream, None if unknown
+
+        Returns:
+            Bytes, DECODER_BUFFER_SECONDS of audio within the decoder's share of the budget
+        """
+        wanted = const.DECODER_BUFFER_SECONDS * self._bytes_per_second(bitrate_kbps)
+        limit = self.budget_bytes * const.BUFFER_DECODER_SHARE
+        return max(int(min(wanted, limit) * self.scale), const.BUFFER_MIN_BYTES)
+
+    def warm_buffer_bytes(self) -> int:
+        """Get the window of each relay stream that is not time-shifted."""
+        limit = self.budget_bytes * const.BUFFER_WARM_SHARE / max(2 * const.WARM_NEIGHBOUR_COUNT, 1)
+        return max(int(min(const.WARM_BUFFER_BYTES, limit) * self.scale), const.BUFFER_MIN_BYTES)
+
+    def timeshift_bytes(self) -> int:
+        """Get the largest time-shift window of the playing station."""
+        limit = self.budget_bytes * (1 - const.BUFFER_DECODER_SHARE - const.BUFFER_WARM_SHARE)
+        return max(int(limit * self.scale), const.BUFFER_MIN_BYTES)
+
+    def sample(self) -> bool:
+        """
+        Read available memory and RSS, and change the memory level if needed.
+
+        Returns:
+            True if the level, and with it the buffer sizes, changed
+        """
+        self.available_bytes = read_meminfo().get('MemAvailable')
+        decoder_pid = self.decoder_pid() if self.decoder_pid is not None else None
+        for kind, pid in (('service', os.getpid()), ('decoder', decoder_pid)):
+            rss = read_rss(pid) if pid else None
+            self.rss[kind] = rss
+            if rss is not None:
+                self.peak_rss[kind] = max(self.peak_rss[kind], rss)
+
+        if self.available_bytes is None or not self.total_bytes:
+            return False
+        if self.min_available_bytes is None or self.available_bytes < self.min_available_bytes:
+            self.min_available_bytes = self.available_bytes
+
+        level = self._next_level(self.available_bytes / self.total_bytes)
+        if level == self.level:
+            return False
+        previous, self.level = self.level, level
+        message = (f"Memory {previous} -> {level}: {self.available_bytes // (1024 * 1024)} MB available, "
+                   f"buffers at {self.scale:.0%}")
+        if LEVEL_SCALES[level] < LEVEL_SCALES[previous]:
+            logger.warning(message)
+            metrics.BUFFER_SHRINKS.inc(level=level)
+        else:
+            logger.info(message)
+        return True
+
+    def _next_level(self, available_fraction: float) -> str:
+        """
+        Get the memory level for the available fraction of RAM.
+
+        Levels drop as soon as memory runs short, but only recover once clearly
+        above the threshold, so the buffers don't flap.
+
+        Args:
+            available_fraction: MemAvailable / MemTotal
+
+        Returns:
+            'normal', 'pressure' or 'critical'
+        """
+        recover = const.BUFFER_RECOVER_FACTOR
+        if available_fraction < const.BUFFER_CRITICAL_AVAILABLE:
+            return 'critical'
+        if self.level == 'critical' and available_fraction < const.BUFFER_CRITICAL_AVAILABLE * recover:
+            return 'critical'
+        if available_fraction < const.BUFFER_PRESSURE_AVAILABLE:
+            return 'pressure'
+        if self.level != 'normal' and available_fraction < const.BUFFER_PRESSURE_AVAILABLE * recover:
+            return 'pressure'
+        return 'normal'
+
+    def _run(self):
+        """Sampling loop."""
+        while not self._stop.wait(const.BUFFER_CHECK_INTERVAL):
+            try:
+                if not self.sample():
+                    continue
+                for callback in self._listeners:
+                    callback()
+            except Exception as e:
+                logger.error(f"Buffer policy error: {e}")
+
+    def get_stats(self) -> Dict:
+        """
+        Get the memory state for /health.
+
+        Returns:
+            Dictionary with budget, level, buffer sizes, available memory and RSS
+        """
+        def kb(value):
+            return value // 1024 if value is not None else None
+
+        return {
+            'level': self.level,
+            'budget_kb': kb(self.budget_bytes),
+            'decoder_buffer_kb': kb(self.decoder_buffer_bytes()),
+            'warm_buffer_kb': kb(self.warm_buffer_bytes()),
+            'timeshift_kb': kb(self.timeshift_bytes()),
+            'available_kb': kb(self.available_bytes),
+            'min_available_kb': kb(self.min_available_bytes),
+            'rss_kb': {kind: kb(value) for kind, value in self.rss.items()},
+            'peak_rss_kb': {kind: kb(value) for kind, value in self.peak_rss.items()},
+        }
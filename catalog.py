@@ -0,0 +1,299 @@
+"""
+Indexed station catalog.
+Holds stations in insertion order with O(1) name to index lookup, keeps
+names, URLs and search text packed in flat buffers instead of one string
+object per field, and answers prefix and substring searches over names and
+metadata. Sized for directory dumps with tens of thousands of stations.
+"""
+import bisect
+import re
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Metadata fields included in the search text, next to the station name
+SEARCH_FIELDS = ('display_name', 'genre', 'country', 'tags')
+# Slots of the name lookup table of an empty catalog, a power of two
+MIN_NAME_SLOTS = 64
+
+
+class PackedStrings:
+    """Append-only list of strings stored as one UTF-8 buffer and an offset array."""
+
+    def __init__(self):
+        """Initialize the PackedStrings."""
+        self._data = bytearray()
+        self._offsets = array('I', [0])
+
+    def append(self, value: str):
+        """
+        Add a string.
+
+        Args:
+            value: String to add
+        """
+        self._data += value.encode('utf-8')
+        self._offsets.append(len(self._data))
+
+    def __getitem__(self, index: int) -> str:
+        return self._data[self._offsets[index]:self._offsets[index + 1]].decode('utf-8')
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __iter__(self) -> Iterator[str]:
+        data, offsets = self._data, self._offsets
+        for index in range(len(self)):
+            yield data[offsets[index]:offsets[index + 1]].decode('utf-8')
+
+
+class StationCatalog:
+    """Array-backed station list with lookup by name and search."""
+
+    def __init__(self, entries: Iterable[Tuple[str, str, Dict]] = ()):
+        """
+        Initialize the StationCatalog.
+
+        Args:
+            entries: (name, url, metadata) tuples in display order
+        """
+        self._names = PackedStrings()
+        # Open-addressing hash table from name to index: each slot holds index + 1, or 0 if empty.
+        # A hit is confirmed against the packed name, so no string object is kept per station.
+        self._name_slots = array('I', [0]) * MIN_NAME_SLOTS
+        self._urls = PackedStrings()
+        # Only stations in the extended format have metadata
+        self._metadata: Dict[int, Dict] = {}
+        # Lower-cased search text of all stations, one line each, searched with str.find
+        self._search_text = ''
+        self._search_offsets = array('I')
+        self._sorted = array('I')
+
+        for name, url, metadata in entries:
+            self._add(name, url, metadata)
+        self._build_search_index()
+
+    def _add(self, name: str, url: str, metadata: Dict):
+        """
+        Append a station. Duplicate names are ignored, the first entry wins.
+
+        Args:
+            name: Station name
+            url: Stream URL
+            metadata: Extra fields such as display_name, genre, country and bitrate
+        """
+        if self._find(name) is not None:
+            return
+        index = len(self._names)
+        self._names.append(name)
+        self._urls.append(url)
+        if metadata:
+            self._metadata[index] = metadata
+        if len(self._names) * 2 > len(self._name_slots):
+            # Keep the table at most half full so probe runs stay short
+            self._resize_name_slots(len(self._name_slots) * 2)
+        else:
+            self._insert_name(name, index)
+
+    def _find(self, name: str) -> Optional[int]:
+        """
+        Look up a station by name in the hash table.
+
+        Args:
+            name: Station name
+
+        Returns:
+            Index of the station, or None if unknown
+        """
+        slots = self._name_slots
+        mask = len(slots) - 1
+        slot = hash(name) & mask
+        while slots[slot]:
+            index = slots[slot] - 1
+            if self._names[index] == name:
+                return index
+            slot = (slot + 1) & mask
+        return None
+
+    def _insert_name(self, name: str, index: int):
+        """Put a station into the first free slot after its hash slot."""
+        slots = self._name_slots
+        mask = len(slots) - 1
+        slot = hash(name) & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = index + 1
+
+    def _resize_name_slots(self, size: int):
+        """Rebuild the hash table with a new number of slots."""
+        self._name_slots = array('I', [0]) * size
+        for index, name in enumerate(self._names):
+            self._insert_name(name, index)
+
+    def _build_search_index(self):
+        """Build the search text and the name order used for prefix search."""
+        lines = []
+        offsets = array('I')
+        position = 0
+        for index, name in enumerate(self._names):
+            metadata = self._metadata.get(index, {})
+            words = [name.replace('_', ' ')]
+            for field in SEARCH_FIELDS:
+                value = metadata.get(field)
+                if isinstance(value, list):
+                    words.extend(str(item) for item in value)
+                elif value:
+                    words.append(str(value))
+            line = ' '.join(words).lower().replace('\n', ' ')
+            offsets.append(position)
+            lines.append(line)
+            position += len(line) + 1
+        self._search_text = '\n'.join(lines)
+        self._search_offsets = offsets
+        self._sorted = array('I', sorted(range(len(self._names)), key=lambda i: self._names[i].lower()))
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        return self._find(name) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def names(self) -> List[str]:
+        """Get all station names in display order."""
+        return list(self._names)
+
+    def index_of(self, name: str) -> Optional[int]:
+        """
+        Get the position of a station.
+
+        Args:
+            name: Station name
+
+        Returns:
+            Index in display order, or None if unknown
+        """
+        return self._find(name)
+
+    def name_at(self, index: int) -> str:
+        """Get the name of the station at an index."""
+        return self._names[index]
+
+    def get_url(self, name: str) -> Optional[str]:
+        """
+        Get the stream URL of a station.
+
+        Args:
+            name: Station name
+
+        Returns:
+            URL, or None if unknown
+        """
+        index = self._find(name)
+        return self._urls[index] if index is not None else None
+
+    def get_metadata(self, name: str) -> Dict:
+        """
+        Get the extended-format fields of a station.
+
+        Args:
+            name: Station name
+
+        Returns:
+            Copy of the metadata, empty if there is none or the station is unknown
+        """
+        index = self._find(name)
+        return dict(self._metadata.get(index, {})) if index is not None else {}
+
+    def get_info(self, index: int) -> Dict:
+        """
+        Get a station as a dictionary for the API.
+
+        Args:
+            index: Station index
+
+        Returns:
+            Dictionary with name, url and metadata fields
+        """
+        return {**self._metadata.get(index, {}), 'name': self._names[index], 'url': self._urls[index]}
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        """Iterate over (name, url) pairs in display order."""
+        for index, name in enumerate(self._names):
+            yield name, self._urls[index]
+
+    def entries(self) -> Iterator[Tuple[str, str, Dict]]:
+        """Iterate over (name, url, metadata) tuples in display order."""
+        for index, name in enumerate(self._names):
+            yield name, self._urls[index], dict(self._metadata.get(index, {}))
+
+    def search(self, query: str, limit: int, offset: int = 0) -> Tuple[int, List[int]]:
+        """
+        Find stations by name prefix or by substring of name and metadata.
+
+        Name prefix matches come first in alphabetical order, followed by the
+        other matches in display order. All words of the query must match.
+
+        Args:
+            query: Search text, case-insensitive
+            limit: Maximum number of results
+            offset: Number of results to skip
+
+        Returns:
+            Tuple of (total number of matches, station indices of the requested page)
+        """
+        words = query.lower().split()
+        if not words:
+            return 0, []
+
+        prefix = query.lower().strip()
+        start = self._first_at_or_after(prefix)
+        prefix_matches = []
+        for position in range(start, len(self._sorted)):
+            index = self._sorted[position]
+            if not self._names[index].lower().startswith(prefix):
+                break
+            prefix_matches.append(index)
+
+        seen = set(prefix_matches)
+        other_matches = [index for index in self._find_all(words) if index not in seen]
+        matches = prefix_matches + other_matches
+        return len(matches), matches[offset:offset + limit]
+
+    def _first_at_or_after(self, prefix: str) -> int:
+        """
+        Binary search the alphabetical name order.
+
+        bisect only takes a key function from Python 3.10 on, so the search is
+        done here to keep working on 3.9 without a second list of names.
+
+        Args:
+            prefix: Lower-cased text
+
+        Returns:
+            Position in the name order of the first name not sorting before the prefix
+        """
+        low, high = 0, len(self._sorted)
+        while low < high:
+            middle = (low + high) // 2
+            if self._names[self._sorted[middle]].lower() < prefix:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _find_all(self, words: List[str]) -> List[int]:
+        """
+        Find stations whose search text contains all words.
+
+        Args:
+            words: Lower-cased words
+
+        Returns:
+            Matching station indices in display order
+        """
+        # One lookahead per word, anchored at each line start, so scanning stays inside the regex engine
+        pattern = re.compile('^' + ''.join(f'(?=[^\\n]*{re.escape(word)})' for word in words), re.MULTILINE)
+        offsets = self._search_offsets
+        return [bisect.bisect_right(offsets, match.start()) - 1 for match in pattern.finditer(self._search_text)]
@@ -0,0 +1,160 @@
+"""
+Command coalescing.
+Rapid station navigation only moves a cursor; the stream for the selected
+station is started once input has settled. Repeated volume commands are merged
+into a single mixer call. All player and mixer changes are submitted to the
+command executor.
+"""
+import logging
+import threading
+import time
+from typing import Optional
+
+import constants as const
+import metrics
+from speech import PRIORITY_STATION
+
+logger = logging.getLogger(__name__)
+
+
+class CommandCoalescer:
+    """Merges bursts of navigation and volume commands from gamepad and HTTP API."""
+
+    def __init__(self, player, volume, executor):
+        """
+        Initialize the CommandCoalescer.
+
+        Args:
+            player: RadioPlayer instance
+            volume: VolumeController instance
+            executor: CommandExecutor that runs the resulting commands
+        """
+        self.player = player
+        self.volume = volume
+        self.executor = executor
+        self._lock = threading.Lock()
+        self._station_timer: Optional[threading.Timer] = None
+        self._volume_timer: Optional[threading.Timer] = None
+        self._pending_steps = 0
+        self._pending_level: Optional[int] = None
+        self._last_input_at = 0.0
+
+    def navigate(self, step: int):
+        """
+        Queue a station cursor move.
+
+        Args:
+            step: Number of stations to move, negative for previous
+
+        Returns:
+            Job whose result is the station under the cursor, or None if there are no stations
+        """
+        self._last_input_at = time.monotonic()
+        return self.executor.submit('navigate', self._move_cursor, step)
+
+    def _move_cursor(self, step: int) -> Optional[str]:
+        """
+        Move the station cursor and schedule the stream start. Runs on the executor.
+
+        Args:
+            step: Number of stations to move, negative for previous
+
+        Returns:
+            Name of the station under the cursor, or None if there are no stations
+        """
+        with self._lock:
+            if not self.player.stations:
+                logger.error("No stations available")
+                return None
+
+            index = (self.player.current_station_index + step) % len(self.player.stations)
+            self.player.current_station_index = index
+            station = self.player.stations[index]
+
+            if self._station_timer is not None:
+                self._station_timer.cancel()
+            self._station_timer = threading.Timer(const.COALESCE_SETTLE_TIME, self._commit_station, args=(station,))
+            self._station_timer.daemon = True
+            self._station_timer.start()
+
+        logger.debug(f"Station cursor moved to {station}")
+        self.player.publish('station', {'station': station})
+        if const.COALESCE_ANNOUNCE_CURSOR:
+            self.player.speak(station, PRIORITY_STATION, category='station')
+        return station
+
+    def _commit_station(self, station: str):
+        """
+        Queue the stream start for the station the cursor settled on.
+
+        Args:
+            station: Station under the cursor when the timer was started
+        """
+        with self._lock:
+            self._station_timer = None
+        self.executor.submit('play', self._start_station, station, self._last_input_at)
+
+    def _start_station(self, station: str, input_at: float):
+        """
+        Start the selected station and record the latency since the last input. Runs on the executor.
+
+        Args:
+            station: Station to start
+            input_at: Monotonic time of the navigation input that selected it
+        """
+        # The name was already announced while navigating
+        self.player.start_stream(station, announce=not const.COALESCE_ANNOUNCE_CURSOR)
+        metrics.COMMAND_LATENCY.observe(time.monotonic() - input_at, command='navigate')
+
+    def cancel_pending(self):
+        """Drop a scheduled stream start, e.g. when another action takes over."""
+        with self._lock:
+            if self._station_timer is not None:
+                self._station_timer.cancel()
+                self._station_timer = None
+
+    def adjust_volume(self, direction: str):
+        """
+        Queue a relative volume step.
+
+        Args:
+            direction: 'up' or 'down'
+        """
+        if direction not in ('up', 'down'):
+            logger.warning(f"Invalid volume direction: {direction}")
+            return
+        with self._lock:
+            self._pending_steps += 1 if direction == 'up' else -1
+            self._schedule_volume()
+
+    def set_volume(self, level: int):
+        """
+        Queue an absolute volume level, replacing any queued steps.
+
+        Args:
+            level: Desired volume as a percentage
+        """
+        with self._lock:
+            self._pending_level = level
+            self._pending_steps = 0
+            self._schedule_volume()
+
+    def _schedule_volume(self):
+        """Start the volume flush timer if not already running. Caller holds the lock."""
+        if self._volume_timer is None:
+            self._volume_timer = threading.Timer(const.COALESCE_VOLUME_WINDOW, self._flush_volume)
+            self._volume_timer.daemon = True
+            self._volume_timer.start()
+
+    def _flush_volume(self):
+        """Queue all pending volume changes as a single mixer call."""
+        with self._lock:
+            steps, level = self._pending_steps, self._pending_level
+            self._pending_steps = 0
+            self._pending_level = None
+            self._volume_timer = None
+
+        if level is not None:
+            self.executor.submit('volume', self.volume.set_level, level + steps * self.volume.step_percent)
+        elif steps:
+            self.executor.submit('volume', self.volume.adjust, 'up' if steps > 0 else 'down', abs(steps))
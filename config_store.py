@@ -0,0 +1,169 @@
+"""
+Write-behind config store.
+Keeps settings and playback state in memory and writes them to disk from a
+background thread, a moment after the last change, so input handling never
+waits for the SD card. Files are replaced atomically (temp file, fsync,
+rename), so a power cut leaves either the old or the new version.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import constants as const
+
+logger = logging.getLogger(__name__)
+
+
+def write_atomic(path: str, text: str):
+    """
+    Replace a file so that it has either its old or its new content after a crash.
+
+    Args:
+        path: File to write
+        text: New content
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    # Persist the rename itself
+    directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+class ConfigStore:
+    """In-memory key-value store flushed to a JSON file in the background."""
+
+    def __init__(self, path: str, defaults: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the ConfigStore and load the file.
+
+        Args:
+            path: JSON file to keep the values in
+            defaults: Values for keys missing from the file
+        """
+        self.path = path
+        self.writes = 0
+        self._values: Dict[str, Any] = {**(defaults or {}), **self._load()}
+        self._lock = threading.Lock()
+        # Held from taking a snapshot until it is on disk, so an older snapshot never replaces a newer one
+        self._write_lock = threading.Lock()
+        self._changed = threading.Event()
+        self._stop = threading.Event()
+        # Monotonic times of the first and the latest change since the last write
+        self._first_change_at: Optional[float] = None
+        self._last_change_at = 0.0
+        self._thread = threading.Thread(target=self._run, name="config-store", daemon=True)
+
+    def _load(self) -> Dict[str, Any]:
+        """Read the file, or return an empty dict if it is missing or invalid."""
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                values = json.load(f)
+            if not isinstance(values, dict):
+                raise ValueError("not a JSON object")
+            return values
+        except Exception as e:
+            logger.error(f"Error loading {self.path}, using defaults: {e}")
+            return {}
+
+    def start(self):
+        """Start the background writer."""
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background writer and write pending changes."""
+        self._stop.set()
+        self._changed.set()
+        self.flush()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Get a value.
+
+        Args:
+            key: Key to look up
+            default: Returned if the key is not set
+
+        Returns:
+            Stored value or default
+        """
+        with self._lock:
+            return self._values.get(key, default)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get a copy of all values."""
+        with self._lock:
+            return dict(self._values)
+
+    def update(self, **values):
+        """
+        Set values and schedule a write. Returns immediately.
+
+        Args:
+            **values: Keys and their new values
+        """
+        with self._lock:
+            if all(self._values.get(key) == value for key, value in values.items()):
+                return
+            self._values.update(values)
+            now = time.monotonic()
+            if self._first_change_at is None:
+                self._first_change_at = now
+            self._last_change_at = now
+        self._changed.set()
+
+    def flush(self) -> bool:
+        """
+        Write pending changes now, e.g. before a reboot.
+
+        Returns:
+            True if the file is up to date
+        """
+        with self._write_lock:
+            with self._lock:
+                if self._first_change_at is None:
+                    return True
+                text = json.dumps(self._values, indent=2)
+                self._first_change_at = None
+            try:
+                write_atomic(self.path, text)
+                self.writes += 1
+                logger.debug(f"Saved {os.path.basename(self.path)}")
+                return True
+            except Exception as e:
+                logger.error(f"Error saving {self.path}: {e}")
+                with self._lock:
+                    # Keep the changes pending so the next flush retries
+                    if self._first_change_at is None:
+                        self._first_change_at = time.monotonic()
+                return False
+
+    def _run(self):
+        """Writer loop: wait for changes, let them settle, then write."""
+        while not self._stop.is_set():
+            self._changed.wait()
+            self._changed.clear()
+            while not self._stop.is_set():
+                with self._lock:
+                    if self._first_change_at is None:
+                        break
+                    # Write once changes pause, but never hold them back longer than the max delay
+                    due_at = min(self._last_change_at + const.CONFIG_FLUSH_DELAY,
+                                 self._first_change_at + const.CONFIG_FLUSH_MAX_DELAY)
+                delay = due_at - time.monotonic()
+                if delay > 0:
+                    self._stop.wait(delay)
+                    continue
+                if not self.flush():
+                    self._stop.wait(const.CONFIG_FLUSH_MAX_DELAY)
@@ -9,21 +9,119 @@ __version__ = '1.2.0'
 DEBOUNCE_TIME = 0.3  # seconds
 
 # Network settings
-NETWORK_TIMEOUT = 30  # seconds to wait for network connectivity
-NETWORK_CHECK_INTERVAL = 5  # seconds between network check retries
-NETWORK_CHECK_URL = 'https://1.1.1.1'  # Cloudflare DNS for network check
-NETWORK_REQUEST_TIMEOUT = 5  # seconds for network request timeout
+NETWORK_CHECK_INTERVAL = 0.5  # seconds between network check retries while offline
+NETWORK_RECHECK_INTERVAL = 30  # seconds between cheap link and address checks besides change notifications
+NETWORK_POLL_INTERVAL = 5  # seconds between link and address checks while online, without netlink
+NETWORK_SETTLE_TIME = 0.2  # seconds without further link changes before the state is evaluated
+NETWORK_PROBE_ADDRESS = ('1.1.1.1', 443)  # Cloudflare DNS, reached with a plain TCP connect
+NETWORK_PROBE_TIMEOUT = 1.0  # seconds for one connect attempt
+
+# Command coalescing
+COALESCE_SETTLE_TIME = 0.8  # seconds of quiet navigation before the selected stream starts
+COALESCE_ANNOUNCE_CURSOR = True  # Speak the station name while navigating
+COALESCE_VOLUME_WINDOW = 0.15  # seconds over which volume commands are merged
 
 # Bookmark timing
 BOOKMARK_SAVE_WINDOW = 10  # seconds - window to save bookmark after Select press
 
 # Volume settings
 VOLUME_STEP = '5%'  # Volume adjustment step for amixer
+MIXER_BACKEND = 'amixer-session'  # 'amixer-session' (persistent amixer -s) or 'subprocess'
+MIXER_CONTROL = 'Master'  # ALSA mixer control
+MIXER_CACHE_TTL = 30  # seconds before the cached volume is re-read from the mixer
+MIXER_REPLY_TIMEOUT = 1.0  # seconds to wait for amixer to confirm a command
+
+# Text-to-speech settings
+TTS_WAIT_TIMEOUT = 15  # max seconds to wait for a system announcement to finish
+TTS_CACHE_ENABLED = True  # Play pre-rendered announcements instead of live synthesis
+TTS_CACHE_DIR = '.tts_cache'  # relative to project directory
+TTS_CACHE_MAX_BYTES = 20 * 1024 * 1024  # Size budget for rendered announcements
+TTS_PLAYER_COMMAND = ['aplay', '-q']  # Command used to play rendered WAV files
+TTS_PRERENDER_MAX_STATIONS = 500  # Only the first stations are pre-rendered, large catalogs render on demand
+
+# Ducking settings
+DUCKING_ENABLED = True  # Lower the stream while announcements play over it
+DUCK_LEVEL = 30  # Stream volume in percent while ducked
+DUCK_ATTACK_TIME = 0.3  # seconds to ramp the stream down before an announcement
+DUCK_RELEASE_TIME = 0.8  # seconds to ramp the stream back up
+DUCK_HOLD_TIME = 0.5  # seconds to stay ducked after an announcement, so consecutive ones don't pump
+DUCK_STEP_INTERVAL = 0.03  # seconds between volume steps of a ramp
+
+# Playback engine settings
+PLAYBACK_BACKEND = 'mpv'  # 'mpv' (persistent process) or 'ffplay' (process per stream)
+MPV_SOCKET_PATH = '/tmp/pi-radio-mpv.sock'  # JSON IPC socket of the mpv engine
+MPV_STARTUP_TIMEOUT = 5  # seconds to wait for the mpv IPC socket
+MPV_NETWORK_TIMEOUT = 10  # seconds before mpv gives up on a stream
+
+# Stream supervisor settings
+SUPERVISOR_ENABLED = True  # Reconnect automatically when a stream drops or stalls
+SUPERVISOR_INTERVAL = 1.0  # seconds between checks
+SUPERVISOR_STALL_TIMEOUT = 15  # seconds without new data before a stream counts as stalled
+SUPERVISOR_START_GRACE = 5  # seconds a reconnected stream must survive to count as recovered
+SUPERVISOR_BACKOFF_BASE = 2  # seconds before the second reconnect attempt, doubled each time
+SUPERVISOR_BACKOFF_MAX = 60  # max seconds between reconnect attempts
+SUPERVISOR_MAX_ATTEMPTS = 5  # attempts before moving on to the next station
+SUPERVISOR_SKIP_FAILED_STATIONS = False  # Move on to the next station after repeated failures
+SUPERVISOR_OUTAGE_HISTORY = 20  # Number of outages kept for /health
 
 # FFplay settings
-FFPLAY_BUFFER_SIZE = '1500M'  # rtbufsize parameter
 FFPLAY_MAX_DELAY = '5000000'  # max_delay parameter in microseconds
 
+# Warm neighbour settings (pre-connected adjacent stations)
+WARM_NEIGHBOURS_ENABLED = True  # Keep next/previous stations connected for instant switching
+WARM_NEIGHBOUR_COUNT = 1  # Stations kept warm on each side of the current one
+WARM_BUFFER_BYTES = 512 * 1024  # Max bytes buffered per stream (~30s at 128 kbps)
+WARM_BURST_BYTES = 64 * 1024  # Buffered bytes handed to the decoder on switch
+RELAY_CONNECT_TIMEOUT = 10  # seconds for upstream connect/read
+RELAY_READ_SIZE = 16 * 1024  # bytes per upstream read
+RELAY_USER_AGENT = 'pi-radio'
+SWITCH_LATENCY_HISTORY = 20  # Number of switch latencies kept for /status
+
+# Buffer memory settings (sizes follow the stream bitrate within a budget)
+BUFFER_MEMORY_BUDGET = None  # bytes for all stream buffers, None to derive it from MemTotal
+BUFFER_MEMORY_FRACTION = 0.25  # Share of RAM for stream buffers when deriving the budget
+BUFFER_MEMORY_MAX = 64 * 1024 * 1024  # Upper limit of the derived budget
+BUFFER_DECODER_SHARE = 0.25  # Share of the budget for the decoder's own buffer
+BUFFER_WARM_SHARE = 0.25  # Share of the budget for warm neighbour streams; the rest is for time-shift
+BUFFER_MIN_BYTES = 64 * 1024  # No buffer is shrunk below this
+DECODER_BUFFER_SECONDS = 30  # seconds of audio the decoder may buffer
+BUFFER_CHECK_INTERVAL = 5  # seconds between memory samples
+BUFFER_PRESSURE_AVAILABLE = 0.10  # Halve buffers when MemAvailable falls below this share of RAM
+BUFFER_CRITICAL_AVAILABLE = 0.05  # Quarter buffers below this share
+BUFFER_RECOVER_FACTOR = 1.5  # Grow buffers again above threshold * factor
+
+# Time-shift settings
+TIMESHIFT_ENABLED = True  # Pause keeps receiving the stream and resumes where it stopped
+TIMESHIFT_MAX_MINUTES = 10  # Minutes of audio kept for the playing station
+TIMESHIFT_DEFAULT_KBPS = 192  # Assumed bitrate for sizing the buffer when the server does not send icy-br
+TIMESHIFT_LIVE_THRESHOLD = 2  # seconds behind live still treated as live
+
+# ICY metadata settings (now-playing titles read from the relay connection)
+ICY_METADATA_ENABLED = True  # Ask servers for in-stream titles; needs the relay
+ICY_ANNOUNCE_TITLES = False  # Speak the title when the track on the playing station changes
+ICY_TITLE_CACHE_SIZE = 200  # Stations whose latest title is kept
+ICY_TITLE_HISTORY = 16  # Title changes kept per stream, for the title of time-shifted audio
+
+# Adaptive bitrate settings (stations with several bitrate variants)
+ADAPTIVE_BITRATE_ENABLED = True  # Step between the variants of multi-bitrate stations
+ADAPTIVE_CHECK_INTERVAL = 2  # seconds between throughput samples
+ADAPTIVE_WINDOW = 20  # seconds of throughput and underruns a decision is based on
+ADAPTIVE_START_GRACE = 5  # seconds after a start before measuring, so the connect burst is left out
+ADAPTIVE_UNDERRUNS_DOWN = 2  # Underruns within the window that step down
+ADAPTIVE_SLOW_RATIO = 0.9  # Step down when the throughput stays below this share of the bitrate
+ADAPTIVE_SAFETY_RATIO = 0.8  # Share of the measured throughput a lower variant may use
+ADAPTIVE_UP_HOLD = 120  # seconds without problems before trying the next higher variant
+ADAPTIVE_UP_HOLD_MAX = 1800  # Upper limit of that wait, doubled after each step up that did not hold
+ADAPTIVE_PROBE_TIME = 60  # seconds a step up must play without problems to count as held
+
+# Resolver cache settings (final stream URLs and host addresses)
+RESOLVER_ENABLED = True  # Start streams from cached endpoints instead of following redirects and playlists
+RESOLVER_CACHE_FILE = '.resolver_cache.json'  # relative to project directory
+RESOLVER_TTL = 6 * 3600  # seconds a resolved endpoint is used before it is resolved again
+RESOLVER_NEGATIVE_TTL = 300  # seconds before a station that could not be resolved is tried again
+RESOLVER_MAX_HOPS = 5  # redirects and playlists followed per station
+RESOLVER_WORKERS = 2  # background resolver threads
+
 # Joystick thresholds
 JOYSTICK_MIN_THRESHOLD = 100  # Below this = left/up
 JOYSTICK_MAX_THRESHOLD = 150  # Above this = right/down
@@ -36,14 +134,34 @@ BUTTON_B = 'BTN_THUMB'
 JOYSTICK_X = 'ABS_X'
 JOYSTICK_Y = 'ABS_Y'
 
+# Config store settings
+CONFIG_FLUSH_DELAY = 1.0  # seconds without further changes before config.json is written
+CONFIG_FLUSH_MAX_DELAY = 5.0  # longest time a change waits to be written while changes keep coming
+
 # File paths (relative to project directory)
 CONFIG_FILE = 'config.json'
 DEFAULT_STATIONS_FILE = 'default_stations.json'
 CUSTOM_STATIONS_FILE = 'custom_stations.json'
+STATION_DB_FILE = 'stations.db'  # SQLite station store used by the sqlite backend
 UPDATE_SCRIPT = 'update.sh'
 
+# Station list settings
+STATION_BACKEND = 'json'  # 'json' loads the station files into memory, 'sqlite' reads stations.db on demand
+STATION_WATCH_ENABLED = True  # Reload the station list when the station files change
+STATION_WATCH_DEBOUNCE = 0.5  # seconds without further writes before a changed file is reloaded
+STATION_WATCH_POLL_INTERVAL = 2  # seconds between checks when inotify is not available
+
 # HTTP API settings
 HTTP_API_PORT = 8080
+HTTP_COMMAND_WAIT = 0.5  # seconds a request waits for its command before answering 202 with a job id
+STATION_PAGE_SIZE = 50  # default number of stations per /stations and /search page
+STATION_PAGE_MAX = 500  # largest page a client may request
+EXECUTOR_JOB_HISTORY = 100  # finished commands kept for polling via /jobs/<id>
+EVENT_HISTORY = 200  # recent events kept so /events clients can resume with Last-Event-ID
+EVENT_KEEPALIVE_INTERVAL = 15  # seconds between keepalive comments on /events
+EVENT_RETRY_MS = 2000  # reconnect delay suggested to /events clients
+EVENT_MAX_PENDING_BYTES = 256 * 1024  # unsent bytes after which a stuck subscriber is dropped
+METRICS_MAX_STATIONS = 100  # stations with their own /metrics series, later ones are counted as 'other'
 
 # Service settings
 SERVICE_NAME = 'pi-radio'
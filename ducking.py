@@ -0,0 +1,118 @@
+"""
+Audio ducking.
+Lowers the stream while an announcement plays over it and raises it again
+afterwards, ramping the decoder volume in small steps so the change is
+smooth. The stream keeps playing throughout, so no reconnect is needed.
+"""
+import logging
+import threading
+import time
+from typing import Optional
+
+import constants as const
+
+logger = logging.getLogger(__name__)
+
+FULL_LEVEL = 100.0
+
+
+class AudioDucker:
+    """Background thread that ramps the stream volume of a playback backend."""
+
+    def __init__(self, backend):
+        """
+        Initialize the AudioDucker.
+
+        Args:
+            backend: PlaybackBackend whose stream volume is ramped; must support set_volume()
+        """
+        self.backend = backend
+        self.level = FULL_LEVEL
+        self.ducks = 0
+        self._target = FULL_LEVEL
+        self._holds = 0
+        self._release_at: Optional[float] = None
+        self._condition = threading.Condition()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="ducker", daemon=True)
+
+    def start(self):
+        """Start the ramp thread."""
+        self._thread.start()
+
+    def stop(self):
+        """Stop the ramp thread, leaving the stream at its current level."""
+        with self._condition:
+            self._stop = True
+            self._condition.notify_all()
+
+    @property
+    def ducked(self) -> bool:
+        """True while the stream is lowered or ramping."""
+        return self.level < FULL_LEVEL
+
+    def duck(self, timeout: float = const.DUCK_ATTACK_TIME * 2):
+        """
+        Lower the stream and wait until it is down, so speech never starts over full volume.
+
+        Every duck() must be followed by a release().
+
+        Args:
+            timeout: Maximum seconds to wait for the ramp
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            self._holds += 1
+            self._release_at = None
+            if self._target != const.DUCK_LEVEL:
+                self._target = const.DUCK_LEVEL
+                self.ducks += 1
+            self._condition.notify_all()
+            while self.level > self._target and not self._stop:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+    def release(self):
+        """Raise the stream again once no announcement has held it down for the hold time."""
+        with self._condition:
+            self._holds = max(self._holds - 1, 0)
+            if self._holds == 0:
+                self._release_at = time.monotonic() + const.DUCK_HOLD_TIME
+                self._condition.notify_all()
+
+    def _run(self):
+        """Ramp loop: step the volume towards the target, sleep while it is reached."""
+        while True:
+            with self._condition:
+                while not self._stop:
+                    now = time.monotonic()
+                    if self._release_at is not None and now >= self._release_at:
+                        self._release_at = None
+                        self._target = FULL_LEVEL
+                    if self.level != self._target:
+                        break
+                    timeout = self._release_at - now if self._release_at is not None else None
+                    self._condition.wait(timeout)
+                if self._stop:
+                    return
+                self.level = self._next_level()
+                level = self.level
+                # Wakes duck() once the stream is down
+                self._condition.notify_all()
+
+            try:
+                self.backend.set_volume(level)
+            except Exception as e:
+                logger.error(f"Error setting stream volume: {e}")
+            time.sleep(const.DUCK_STEP_INTERVAL)
+
+    def _next_level(self) -> float:
+        """Get the next volume of the ramp towards the target. Caller holds the lock."""
+        ramp_time = const.DUCK_ATTACK_TIME if self._target < self.level else const.DUCK_RELEASE_TIME
+        steps = max(ramp_time / const.DUCK_STEP_INTERVAL, 1.0)
+        step = (FULL_LEVEL - const.DUCK_LEVEL) / steps
+        if abs(self._target - self.level) <= step:
+            return self._target
+        return self.level - step if self._target < self.level else self.level + step
@@ -0,0 +1,227 @@
+"""
+Server-sent events broadcaster.
+State changes are published as numbered events and pushed to every subscriber
+from one selector thread, so subscribers cost a socket and a buffer rather
+than a thread each. Recent events are kept so clients can resume with
+Last-Event-ID after a reconnect.
+"""
+import collections
+import json
+import logging
+import selectors
+import socket
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import constants as const
+
+logger = logging.getLogger(__name__)
+
+
+def format_event(event_id: int, event_type: str, data: Dict) -> bytes:
+    """
+    Encode an event in text/event-stream format.
+
+    Args:
+        event_id: Event id, sent back by clients as Last-Event-ID
+        event_type: Event name, e.g. 'playback'
+        data: JSON-serializable payload
+
+    Returns:
+        Encoded event
+    """
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+class EventBroadcaster:
+    """Pushes published events to all subscribed sockets."""
+
+    def __init__(self, history: int = const.EVENT_HISTORY):
+        """
+        Initialize the EventBroadcaster.
+
+        Args:
+            history: Number of recent events kept for resuming clients
+        """
+        self.last_id = 0
+        self._history = collections.deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._selector = selectors.DefaultSelector()
+        # Socket -> bytes waiting to be sent
+        self._clients: Dict[socket.socket, bytearray] = {}
+        self._new_clients = []
+        # In-process listeners, called with (event_type, data) on the publishing thread
+        self._listeners: List[Callable[[str, Dict], None]] = []
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._wake_reader.setblocking(False)
+        self._wake_writer.setblocking(False)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="events", daemon=True)
+
+    def start(self):
+        """Start the broadcaster thread."""
+        self._selector.register(self._wake_reader, selectors.EVENT_READ)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the broadcaster and disconnect all subscribers."""
+        self._stop.set()
+        self._wake()
+
+    @property
+    def subscriber_count(self) -> int:
+        """Number of connected subscribers."""
+        with self._lock:
+            return len(self._clients) + len(self._new_clients)
+
+    def add_listener(self, callback: Callable[[str, Dict], None]):
+        """
+        Register a function to call for every published event.
+
+        Args:
+            callback: Function taking the event type and data; it must return quickly
+        """
+        self._listeners.append(callback)
+
+    def publish(self, event_type: str, data: Dict):
+        """
+        Publish an event to all subscribers.
+
+        Args:
+            event_type: Event name, e.g. 'playback'
+            data: JSON-serializable payload
+        """
+        with self._lock:
+            self.last_id += 1
+            message = format_event(self.last_id, event_type, data)
+            self._history.append((self.last_id, message))
+            for buffer in self._clients.values():
+                buffer += message
+            for _, buffer in self._new_clients:
+                buffer += message
+        self._wake()
+
+        for callback in self._listeners:
+            try:
+                callback(event_type, data)
+            except Exception as e:
+                logger.error(f"Error in event listener: {e}")
+
+    def subscribe(self, sock: socket.socket, last_event_id: Optional[int], snapshot: Callable[[], Dict]):
+        """
+        Hand a connection over to the broadcaster.
+
+        The response headers must already have been sent. A client resuming
+        within the kept history receives the events it missed; any other
+        client first receives a 'status' event with the full current state.
+
+        Args:
+            sock: Connected client socket, owned by the broadcaster from now on
+            last_event_id: Last-Event-ID sent by the client, or None
+            snapshot: Function returning the current state for the 'status' event
+        """
+        sock.setblocking(False)
+        with self._lock:
+            oldest = self._history[0][0] if self._history else self.last_id + 1
+            buffer = bytearray(f"retry: {const.EVENT_RETRY_MS}\n\n".encode())
+            if last_event_id is not None and oldest - 1 <= last_event_id <= self.last_id:
+                for event_id, message in self._history:
+                    if event_id > last_event_id:
+                        buffer += message
+            else:
+                # Too old or fresh connection, start from the current state
+                buffer += format_event(self.last_id, 'status', snapshot())
+            self._new_clients.append((sock, buffer))
+        self._wake()
+        logger.debug(f"Event subscriber connected (resume from {last_event_id})")
+
+    def _wake(self):
+        """Wake the broadcaster thread."""
+        try:
+            self._wake_writer.send(b'\0')
+        except (BlockingIOError, OSError):
+            # Already woken or shutting down
+            pass
+
+    def _run(self):
+        """Selector loop."""
+        next_keepalive = time.monotonic() + const.EVENT_KEEPALIVE_INTERVAL
+        while not self._stop.is_set():
+            for key, mask in self._selector.select(timeout=max(0.0, next_keepalive - time.monotonic())):
+                if key.fileobj is self._wake_reader:
+                    try:
+                        while self._wake_reader.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                elif mask & selectors.EVENT_READ:
+                    # Subscribers never send anything; readable means closed
+                    try:
+                        data = key.fileobj.recv(1024)
+                    except BlockingIOError:
+                        continue
+                    except OSError:
+                        data = b''
+                    if not data:
+                        with self._lock:
+                            self._drop(key.fileobj)
+
+            with self._lock:
+                for sock, buffer in self._new_clients:
+                    self._clients[sock] = buffer
+                    self._selector.register(sock, selectors.EVENT_READ)
+                self._new_clients = []
+
+                if time.monotonic() >= next_keepalive:
+                    # Comments keep proxies open and reveal dead connections
+                    for buffer in self._clients.values():
+                        buffer += b": keepalive\n\n"
+                    next_keepalive = time.monotonic() + const.EVENT_KEEPALIVE_INTERVAL
+
+                for sock in list(self._clients):
+                    self._flush(sock)
+
+        with self._lock:
+            for sock in list(self._clients):
+                self._drop(sock)
+
+    def _flush(self, sock: socket.socket):
+        """
+        Send as much buffered data as the socket accepts. Caller holds the lock.
+
+        Args:
+            sock: Subscriber socket
+        """
+        buffer = self._clients.get(sock)
+        if buffer is None:
+            return
+        if buffer:
+            try:
+                sent = sock.send(buffer)
+                del buffer[:sent]
+            except BlockingIOError:
+                pass
+            except OSError:
+                self._drop(sock)
+                return
+        if len(buffer) > const.EVENT_MAX_PENDING_BYTES:
+            logger.warning("Dropping event subscriber that is not reading")
+            self._drop(sock)
+            return
+        self._selector.modify(sock, selectors.EVENT_READ | selectors.EVENT_WRITE if buffer else selectors.EVENT_READ)
+
+    def _drop(self, sock: socket.socket):
+        """
+        Disconnect a subscriber. Caller holds the lock.
+
+        Args:
+            sock: Subscriber socket
+        """
+        self._clients.pop(sock, None)
+        try:
+            self._selector.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+        sock.close()
+        logger.debug("Event subscriber disconnected")
@@ -0,0 +1,146 @@
+"""
+Serialized command executor.
+Every state-changing operation (from the gamepad, the HTTP API, the command
+coalescer or the stream supervisor) runs on one worker thread, one at a time,
+so RadioPlayer never sees concurrent mutations. Submitting returns a Job that
+can be waited on or polled through the HTTP API.
+"""
+import collections
+import itertools
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import constants as const
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """A submitted command and its outcome."""
+
+    def __init__(self, job_id: int, name: str, func: Callable, args: tuple, kwargs: dict):
+        """
+        Initialize the Job.
+
+        Args:
+            job_id: Unique job id
+            name: Short description used in logs and the API
+            func: Function to run
+            args: Positional arguments for func
+            kwargs: Keyword arguments for func
+        """
+        self.id = job_id
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.status = 'pending'
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._done = threading.Event()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for the job to finish.
+
+        Args:
+            timeout: Maximum seconds to wait, None to wait forever
+
+        Returns:
+            True if the job finished, False on timeout
+        """
+        return self._done.wait(timeout)
+
+    @property
+    def done(self) -> bool:
+        """True once the job has finished or failed."""
+        return self._done.is_set()
+
+    def to_dict(self) -> Dict:
+        """Get the job state as a dictionary."""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'submitted_at': self.submitted_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class CommandExecutor:
+    """Runs submitted commands one at a time on a single worker thread."""
+
+    def __init__(self, history: int = const.EXECUTOR_JOB_HISTORY):
+        """
+        Initialize the CommandExecutor.
+
+        Args:
+            history: Number of finished jobs kept for polling
+        """
+        self._queue = queue.Queue()
+        self._ids = itertools.count(1)
+        self._jobs = collections.OrderedDict()
+        self._history = history
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="executor", daemon=True)
+
+    def start(self):
+        """Start the worker thread."""
+        self._thread.start()
+
+    def submit(self, name: str, func: Callable, *args, **kwargs) -> Job:
+        """
+        Queue a command.
+
+        Args:
+            name: Short description used in logs and the API
+            func: Function to run on the executor thread
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            Job tracking the command
+        """
+        job = Job(next(self._ids), name, func, args, kwargs)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self._history:
+                self._jobs.popitem(last=False)
+        self._queue.put(job)
+        return job
+
+    def get_job(self, job_id: int) -> Optional[Job]:
+        """
+        Look up a recent job.
+
+        Args:
+            job_id: Id returned by submit()
+
+        Returns:
+            Job, or None if unknown or expired
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self):
+        """Worker loop."""
+        while True:
+            job = self._queue.get()
+            job.status = 'running'
+            try:
+                job.result = job.func(*job.args, **job.kwargs)
+                job.status = 'done'
+            except Exception as e:
+                logger.error(f"Command {job.name} failed: {e}")
+                job.error = str(e)
+                job.status = 'failed'
+            finally:
+                job.finished_at = time.time()
+                job._done.set()
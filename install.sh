@@ -77,7 +77,7 @@ fi
 # Install system dependencies
 echo -e "${GREEN}[1/5]${NC} Installing system dependencies..."
 sudo apt update
-sudo apt install -y python3-venv espeak pulseaudio ffmpeg
+sudo apt install -y python3-venv espeak pulseaudio ffmpeg mpv
 
 if ! command -v ffplay &> /dev/null; then
     echo -e "${RED}Error: ffplay not installed. Please install ffmpeg.${NC}"
@@ -4,19 +4,38 @@ Pi Radio - Gamepad-controlled internet radio player.
 import time
 import os
 import signal
+import socket
 import subprocess
 import json
 import logging
 import shutil
 import threading
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from urllib.parse import unquote
+import collections
+import importlib
+import itertools
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs, unquote, urlsplit
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Dict
-from inputs import get_gamepad
-import pyttsx3
-import requests
 
 from stations import StationManager
+from relay import StreamRelay
+from resolver import ResolverCache
+from playback import PlaybackBackend, create_backend
+from supervisor import StreamSupervisor
+from watcher import StationFileWatcher
+from coalescer import CommandCoalescer
+from executor import CommandExecutor, Job
+from events import EventBroadcaster
+from config_store import ConfigStore
+import metrics
+from startup import StartupTimer
+from netmon import NetworkMonitor, get_local_address
+from mixer import SubprocessMixer, create_mixer
+from ducking import AudioDucker
+from buffering import BufferPolicy
+from adaptive import VariantSelector
+from speech import AnnouncementCache, SpeechWorker, PRIORITY_NORMAL, PRIORITY_STATION, PRIORITY_SYSTEM
 import constants as const
 
 # Setup logging
@@ -31,109 +50,716 @@ logger = logging.getLogger(__name__)
 class RadioPlayer:
     """Manages radio streaming and playback."""
 
-    def __init__(self, station_manager: StationManager):
+    def __init__(self, station_manager: StationManager, executor: Optional[CommandExecutor] = None,
+                 events: Optional[EventBroadcaster] = None):
         """
         Initialize the RadioPlayer.
 
         Args:
             station_manager: StationManager instance for accessing stations
+            executor: CommandExecutor that serializes state changes, used for automatic reconnects
+            events: EventBroadcaster that receives state changes
         """
         self.station_manager = station_manager
+        self.executor = executor
+        self.events = events
+        self._last_health_key = None
         self.stations = station_manager.get_station_names()
         self.current_station_index = 0
-        self.current_process: Optional[subprocess.Popen] = None
-        self.tts_engine: Optional[pyttsx3.Engine] = None
-        self._init_tts()
+        # Station actually being played; differs from the cursor while navigating
+        self.playing_station: Optional[str] = None
+        # Relay offset the paused station resumes from, None unless paused
+        self._paused_offset: Optional[int] = None
+        # (relay stream, offset, monotonic time) the decoder started playing from
+        self._play_position: Optional[tuple] = None
+        # (station, title) last published, so a title is announced once
+        self._last_title: Optional[tuple] = None
+        self._title_lock = threading.Lock()
+        self.backend: Optional[PlaybackBackend] = create_backend()
+        self.buffers = BufferPolicy(self._decoder_pid)
+        self.buffers.add_listener(self._apply_buffer_sizes)
+        self.buffers.start()
+        self.ducker: Optional[AudioDucker] = self._init_ducker()
+        self.speech = SpeechWorker(self._init_announcement_cache(), self.ducker)
+        self.speech.start()
+        self._prerender_announcements()
+        station_manager.add_reload_listener(self._prerender_announcements)
+        station_manager.add_reload_listener(self._on_stations_reloaded)
+
+        # Switch-to-first-audio latencies as (station, seconds, warm)
+        self.switch_latencies = collections.deque(maxlen=const.SWITCH_LATENCY_HISTORY)
+        # Set by main() to log the boot-to-audio time on the first played stream
+        self.startup_timer: Optional[StartupTimer] = None
+        self.resolver: Optional[ResolverCache] = None
+        if const.RESOLVER_ENABLED:
+            self.resolver = ResolverCache(os.path.join(station_manager.base_dir, const.RESOLVER_CACHE_FILE))
+            self.resolver.start()
+        self.relay: Optional[StreamRelay] = None
+        if const.WARM_NEIGHBOURS_ENABLED:
+            self._init_relay()
+        self.adaptive: Optional[VariantSelector] = None
+        if const.ADAPTIVE_BITRATE_ENABLED:
+            self.adaptive = VariantSelector(self._measure_stream)
+            self.adaptive.add_listener(self._on_variant_change)
+            self.adaptive.start()
+
+        self.supervisor: Optional[StreamSupervisor] = None
+        if const.SUPERVISOR_ENABLED:
+            self.supervisor = StreamSupervisor(self)
+            self.supervisor.start()
+
+    def _init_ducker(self) -> Optional[AudioDucker]:
+        """Initialize ducking of the stream under announcements, if the backend supports it."""
+        if not const.DUCKING_ENABLED or self.backend is None:
+            return None
+        if not self.backend.can_set_volume:
+            logger.info(f"The {self.backend.name} backend cannot lower the stream, announcements play at full mix")
+            return None
+        ducker = AudioDucker(self.backend)
+        ducker.start()
+        return ducker
 
-    def _init_tts(self):
-        """Initialize text-to-speech engine."""
+    def _init_announcement_cache(self) -> Optional[AnnouncementCache]:
+        """Initialize the on-disk cache of rendered announcements."""
+        if not const.TTS_CACHE_ENABLED:
+            return None
         try:
-            self.tts_engine = pyttsx3.init()
-            logger.info("Text-to-speech initialized")
+            return AnnouncementCache(os.path.join(self.station_manager.base_dir, const.TTS_CACHE_DIR))
         except Exception as e:
-            logger.error(f"Failed to initialize text-to-speech: {e}")
-            self.tts_engine = None
+            logger.error(f"Failed to open announcement cache: {e}")
+            return None
+
+    def _prerender_announcements(self):
+        """Render the announcement of every station into the cache in the background."""
+        names = list(itertools.islice(self.station_manager.get_station_names(), const.TTS_PRERENDER_MAX_STATIONS))
+        self.speech.prerender(self._station_announcement(name) for name in names)
+        if const.COALESCE_ANNOUNCE_CURSOR:
+            # Station names are spoken on their own while navigating
+            self.speech.prerender(names)
+
+    def _on_stations_reloaded(self):
+        """Apply a reloaded station list, on the executor so it does not race with navigation."""
+        if self.executor is not None:
+            self.executor.submit('reload_stations', self.apply_station_list)
+        else:
+            self.apply_station_list()
 
-    def speak(self, text: str):
+    def apply_station_list(self) -> Dict:
         """
-        Speak text using TTS.
+        Swap in the station list of the StationManager without interrupting playback.
 
-        Args:
-            text: Text to speak
+        The cursor stays on the current station if it still exists; otherwise
+        it keeps its position, clamped to the new list. A playing station that
+        was removed keeps playing until the next switch.
+
+        Returns:
+            Dictionary with the added and removed station counts and the new total
         """
-        if self.tts_engine is None:
-            logger.warning(f"TTS not available, would have said: {text}")
-            return
+        old_stations = self.stations
+        new_stations = self.station_manager.get_station_names()
+        current = self.get_current_station()
+
+        if isinstance(old_stations, list) and isinstance(new_stations, list):
+            old_names, new_names = set(old_stations), set(new_stations)
+            added, removed = len(new_names - old_names), len(old_names - new_names)
+        else:
+            # Lazy station lists from the sqlite backend are not compared name by name
+            added = removed = None
+
+        index = self.station_manager.get_station_index(current) if current is not None else None
+        if index is None:
+            index = min(self.current_station_index, max(len(new_stations) - 1, 0))
+        self.stations = new_stations
+        self.current_station_index = index
+
+        if self.playing_station is not None and not self.station_manager.is_valid_station(self.playing_station):
+            logger.warning(f"Playing station {self.playing_station} was removed, it keeps playing until the next switch")
+        if self.playing_station is not None and self.is_playing():
+            # Warm neighbours follow the new order, removed stations are disconnected
+            self._update_warm_neighbours(self.playing_station)
+
+        change = {'added': added, 'removed': removed, 'total': len(new_stations)}
+        logger.info(f"Station list updated: {added} added, {removed} removed, {len(new_stations)} total")
+        self.publish('stations', change)
+        return change
+
+    @staticmethod
+    def _station_announcement(station_name: str) -> str:
+        """Get the text announced when a station starts."""
+        return f"Starting stream of {station_name}"
 
+    def _init_relay(self):
+        """Initialize the local relay used to keep neighbouring stations warm."""
         try:
-            self.tts_engine.say(text)
-            self.tts_engine.runAndWait()
+            self.relay = StreamRelay(opener=self.resolver.build_opener() if self.resolver is not None else None,
+                                     max_bytes=self.buffers.warm_buffer_bytes())
+            self.relay.add_title_listener(self._on_title_received)
+            self.relay.start()
         except Exception as e:
-            logger.error(f"TTS error: {e}")
+            logger.error(f"Failed to start stream relay, warm neighbours disabled: {e}")
+            self.relay = None
+
+    def speak(self, text: str, priority: int = PRIORITY_NORMAL, category: Optional[str] = None,
+              cache: bool = True) -> threading.Event:
+        """
+        Queue text to be spoken using TTS. Returns immediately.
+
+        Args:
+            text: Text to speak
+            priority: Queue priority, lower is spoken first (see speech.PRIORITY_*)
+            category: Optional category; newer announcements cancel older ones in the same category
+            cache: False for one-off text that should not be kept in the announcement cache
 
-    def start_stream(self, station_name: str):
+        Returns:
+            Event that is set once the text was spoken or dropped
+        """
+        return self.speech.say(text, priority, category, cache)
+
+    def start_stream(self, station_name: str, announce: bool = True):
         """
         Start streaming a radio station.
 
         Args:
             station_name: Name of the station to stream
+            announce: False to start without the spoken announcement, e.g. on reconnect
         """
+        switch_started_at = time.monotonic()
+
         # Validate station
-        stream_url = self.station_manager.get_station_url(station_name)
-        if stream_url is None:
+        if not self.station_manager.is_valid_station(station_name):
             logger.error(f"Station '{station_name}' not found, using default")
             if not self.stations:
                 logger.error("No stations available!")
                 return
             station_name = self.stations[0]
-            stream_url = self.station_manager.get_station_url(station_name)
-
-        # Stop any current stream
-        self.stop_stream()
+        stream_url = self._get_stream_url(station_name, start=True)
 
-        # Check if ffplay is available
-        if shutil.which('ffplay') is None:
-            logger.error("ffplay not found! Install ffmpeg to play audio.")
+        if self.backend is None:
+            logger.error("No playback backend available!")
             return
 
+        # Silence the current stream, the backend replaces it on play
+        self.backend.pause()
+        self._paused_offset = None
+
         # Start new stream
-        self.speak(f"Starting stream of {station_name}")
+        if announce:
+            self.speak(self._station_announcement(station_name), PRIORITY_STATION, category='station')
         logger.info(f"Starting stream: {station_name} -> {stream_url}")
 
-        command = [
-            'ffplay',
-            '-autoexit',
-            '-nodisp',
-            '-rtbufsize', const.FFPLAY_BUFFER_SIZE,
-            '-max_delay', const.FFPLAY_MAX_DELAY,
-            stream_url
-        ]
+        resolved_url = self._resolve_url(stream_url)
+        source_url, warm = self._get_source_url(station_name, resolved_url)
+        on_first_audio = lambda: self._record_switch_latency(
+            station_name, time.monotonic() - switch_started_at, warm)
+
+        self.playing_station = station_name
+        self._apply_buffer_sizes()
+        play_started_at = time.monotonic()
+        started = self.backend.play(source_url, on_first_audio)
+        if not started and resolved_url != stream_url:
+            logger.warning(f"Resolved endpoint of {station_name} failed, using the station URL")
+            self.resolver.invalidate(stream_url)
+            source_url, warm = self._get_source_url(station_name, stream_url)
+            started = self.backend.play(source_url, on_first_audio)
+        metrics.DECODER_START.observe(time.monotonic() - play_started_at, backend=self.backend.name)
+        self._mark_play_position(station_name)
+        if started:
+            logger.info(f"Stream started successfully: {station_name}{' (warm)' if warm else ''}")
+        else:
+            logger.error(f"Failed to start stream: {station_name}")
+            metrics.FAILED_STARTS.inc(station=station_name)
+        self.publish('playback', {'playing': True, 'station': station_name})
 
-        try:
-            self.current_process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            logger.info(f"Stream started successfully: {station_name}")
-        except Exception as e:
-            logger.error(f"Failed to start stream: {e}")
-            self.current_process = None
+        if self.supervisor is not None:
+            self.supervisor.on_stream_started()
 
-    def stop_stream(self):
-        """Stop the current stream if playing."""
-        if self.current_process is not None:
-            try:
-                self.current_process.terminate()
-                self.current_process.wait(timeout=5)
-                logger.info("Stream stopped")
-            except subprocess.TimeoutExpired:
-                logger.warning("Stream didn't stop gracefully, killing...")
-                self.current_process.kill()
-            except Exception as e:
-                logger.error(f"Error stopping stream: {e}")
-            finally:
-                self.current_process = None
+        self._update_warm_neighbours(station_name)
+
+    def _resolve_url(self, stream_url: str, record: bool = True) -> str:
+        """
+        Get the cached final media URL of a station, skipping its redirects and playlists.
+
+        Args:
+            stream_url: Upstream URL of the station
+            record: False to leave the resolver hit statistics alone
+
+        Returns:
+            Resolved URL, or the station URL if it is not resolved (yet)
+        """
+        if self.resolver is None:
+            return stream_url
+        return self.resolver.lookup(stream_url, record) or stream_url
+
+    def _get_stream_url(self, station_name: str, start: bool = False) -> Optional[str]:
+        """
+        Get the upstream URL of a station, the variant within the bitrate ceiling for multi-bitrate stations.
+
+        Args:
+            station_name: Name of the station
+            start: True if the station is being started, so its variant is measured from now on
+
+        Returns:
+            Stream URL, or None if the station is not found
+        """
+        stream_url = self.station_manager.get_station_url(station_name)
+        if stream_url is None or self.adaptive is None:
+            return stream_url
+        variants = self.station_manager.get_station_variants(station_name)
+        if start:
+            index = self.adaptive.choose(station_name, variants)
+        elif variants:
+            index = self.adaptive.index_for(variants)
+        else:
+            return stream_url
+        return variants[index]['url'] if variants else stream_url
+
+    def _measure_stream(self):
+        """
+        Get the bytes received and decoder underruns of the playing stream, for the variant selector.
+
+        Returns:
+            Tuple of (bytes received, underruns), None while stopped or paused
+        """
+        if not self.is_playing():
+            return None
+        stream = self.get_current_relay_stream()
+        return (stream.bytes_received if stream is not None else None,
+                self.backend.get_health().get('underruns'))
+
+    def _on_variant_change(self, station_name: str):
+        """Restart a station with the variant the selector chose, on the executor."""
+        if self.executor is not None:
+            self.executor.submit('variant', self._restart_variant, station_name)
+        else:
+            self._restart_variant(station_name)
+
+    def _restart_variant(self, station_name: str):
+        """
+        Play another variant of a station that is still playing.
+
+        Args:
+            station_name: Station whose bitrate ceiling changed
+        """
+        if self.playing_station != station_name or not self.is_playing():
+            # Switched, stopped or paused meanwhile; the next start uses the new ceiling
+            return
+        self.start_stream(station_name, announce=False)
+        self.publish('variant', self.adaptive.get_stats())
+
+    def forget_resolved_url(self, station_name: str):
+        """
+        Drop the resolved endpoint of a station so the next start uses the station URL.
+
+        Args:
+            station_name: Station whose stream failed
+        """
+        stream_url = self._get_stream_url(station_name)
+        if self.resolver is not None and stream_url is not None:
+            self.resolver.invalidate(stream_url)
+
+    def _get_source_url(self, station_name: str, stream_url: str):
+        """
+        Get the URL the decoder should open for a station.
+
+        Args:
+            station_name: Name of the station
+            stream_url: Upstream URL of the station
+
+        Returns:
+            Tuple of (url, warm) where warm is True if an already buffered stream is used
+        """
+        if self.relay is None or not self.relay.can_relay(stream_url):
+            return stream_url, False
+
+        stream = self.relay.get(station_name)
+        warm = (stream is not None and stream.url == stream_url
+                and stream.is_healthy() and stream.buffered_bytes > 0)
+        self.relay.open(station_name, stream_url)
+        return self.relay.local_url(station_name), warm
+
+    def _update_warm_neighbours(self, station_name: str):
+        """
+        Keep the stations around the current one connected and buffering, or only resolved without the relay.
+
+        Args:
+            station_name: Station that is currently playing
+        """
+        if (self.relay is None and self.resolver is None) or not self.stations:
+            return
+
+        neighbours = []
+        for step in range(1, const.WARM_NEIGHBOUR_COUNT + 1):
+            for index in (self.current_station_index + step, self.current_station_index - step):
+                name = self.stations[index % len(self.stations)]
+                if name != station_name and name not in neighbours:
+                    neighbours.append(name)
+
+        if self.relay is None:
+            # Without the relay, neighbours are only resolved ahead of time
+            self.resolver.prefetch(filter(None, map(self._get_stream_url, neighbours)))
+            return
+
+        self.relay.retain([station_name] + neighbours)
+        for name in neighbours:
+            url = self._get_stream_url(name)
+            if url and self.relay.can_relay(url):
+                self.relay.open(name, self._resolve_url(url, record=False))
+
+    def _decoder_pid(self) -> Optional[int]:
+        """Get the pid of the decoder process, for memory sampling."""
+        process = getattr(self.backend, 'process', None)
+        return process.pid if process is not None and process.poll() is None else None
+
+    def _apply_buffer_sizes(self):
+        """Size the decoder and relay buffers from the memory budget and the playing stream's bitrate."""
+        station = self.playing_station
+        stream = self.relay.get(station) if self.relay is not None and station else None
+        if self.backend is not None:
+            self.backend.set_buffer_size(self.buffers.decoder_buffer_bytes(stream.bitrate_kbps if stream else None))
+        if self.relay is not None:
+            # Only the playing station keeps minutes of audio for pausing
+            seconds = const.TIMESHIFT_MAX_MINUTES * 60 if const.TIMESHIFT_ENABLED else None
+            self.relay.set_window(station, seconds, self.buffers.timeshift_bytes(), self.buffers.warm_buffer_bytes())
+
+    def _record_switch_latency(self, station_name: str, latency: float, warm: bool):
+        """
+        Record the time from a switch request until the first audio was played.
+
+        Args:
+            station_name: Station that was started
+            latency: Seconds until first audio
+            warm: True if the stream was pre-connected
+        """
+        self.switch_latencies.append((station_name, latency, warm))
+        metrics.FIRST_AUDIO.observe(latency, station=station_name, warm='true' if warm else 'false')
+        logger.info(f"First audio for {station_name} after {latency:.2f}s ({'warm' if warm else 'cold'})")
+        if self.startup_timer is not None:
+            self.startup_timer.first_audio()
+            self.startup_timer = None
+
+    def get_stream_health(self) -> Dict:
+        """
+        Get live health metrics of the current stream.
+
+        Returns:
+            Dictionary with bytes received, codec, bitrate, buffer fill and underrun count
+        """
+        station = self.playing_station
+        health = {'station': station, 'backend': self.backend.name if self.backend else None}
+        if self.backend is not None and self.backend.is_active():
+            health.update(self.backend.get_health())
+
+        # Bytes received are only known when the stream runs through the relay
+        stream = self.relay.get(station) if self.relay is not None and station else None
+        health['bytes_received'] = stream.bytes_received if stream is not None else None
+
+        if self.supervisor is not None:
+            health['reliability'] = self.supervisor.get_stats()
+        if self.resolver is not None:
+            health['resolver'] = self.resolver.get_stats()
+        health['memory'] = self.buffers.get_stats()
+        # ffplay cannot be held to the decoder buffer size
+        health['memory']['decoder_buffer_limited'] = self.backend.limits_buffer if self.backend else None
+        return health
+
+    def get_current_relay_stream(self):
+        """
+        Get the relay stream feeding the decoder for the current station.
+
+        Returns:
+            BufferedStream, or None if the decoder does not read from a live relay stream
+        """
+        station = self.playing_station
+        if self.relay is None or station is None:
+            return None
+        stream = self.relay.get(station)
+        if stream is None or stream.finished:
+            return None
+        return stream
+
+    def get_switch_latency_stats(self) -> Dict:
+        """
+        Get recent switch-to-first-audio latencies.
+
+        Returns:
+            Dictionary with the last latency and averages for warm and cold switches
+        """
+        def average(values):
+            return round(sum(values) / len(values), 3) if values else None
+
+        history = list(self.switch_latencies)
+        return {
+            'last': round(history[-1][1], 3) if history else None,
+            'average_warm': average([latency for _, latency, warm in history if warm]),
+            'average_cold': average([latency for _, latency, warm in history if not warm]),
+            'samples': len(history),
+        }
+
+    def stop_stream(self, user_initiated: bool = True):
+        """
+        Stop the current stream if playing.
+
+        Args:
+            user_initiated: False for stops before an update, restart or reboot,
+                            which must not be saved as the playback state
+        """
+        if self.backend is not None and self.backend.is_active():
+            stop_started_at = time.monotonic()
+            self.backend.stop()
+            metrics.DECODER_STOP.observe(time.monotonic() - stop_started_at, backend=self.backend.name)
+            logger.info("Stream stopped")
+        self.playing_station = None
+        self._paused_offset = None
+        self.publish('playback', {'playing': False, 'station': None, 'user_initiated': user_initiated})
+
+    def pause(self):
+        """
+        Stop the audio output but keep receiving the stream, so resume() continues from here.
+
+        Without a relay stream for the station, e.g. for HLS, the stream is stopped instead.
+        """
+        stream = self.get_current_relay_stream() if const.TIMESHIFT_ENABLED else None
+        if stream is None or not self.is_playing():
+            self.stop_stream()
+            return
+
+        offset = self._get_play_offset(stream)
+        self.backend.stop()
+        self._paused_offset = offset
+        logger.info(f"Paused {self.playing_station}, time-shift buffer keeps receiving")
+        self.publish('playback', {'playing': False, 'station': self.playing_station, 'paused': True})
+
+    def resume(self, live: bool = False) -> Optional[str]:
+        """
+        Continue the paused station from where it was paused, from memory.
+
+        If the stream was lost meanwhile, the station is started again.
+
+        Args:
+            live: True to skip the time-shifted audio and continue at live
+
+        Returns:
+            Name of the resumed station, or None if nothing was paused
+        """
+        station, offset = self.playing_station, self._paused_offset
+        if station is None or offset is None:
+            return None
+        self._paused_offset = None
+        stream = self.relay.get(station) if self.relay is not None else None
+        if stream is None or (stream.finished and stream.live_offset <= offset):
+            logger.info(f"Time-shift buffer of {station} is gone, reconnecting")
+            self.start_stream(station, announce=False)
+            return station
+
+        if offset < stream.start_offset:
+            logger.info(f"Paused longer than the time-shift buffer, resuming {station} "
+                        f"{stream.seconds_behind(stream.start_offset):.0f}s behind live")
+        resumed_at = time.monotonic()
+        source_url = self.relay.local_url(station, None if live else offset)
+        on_first_audio = lambda: logger.info(f"Resumed {station} after {time.monotonic() - resumed_at:.2f}s")
+        if not self.backend.play(source_url, on_first_audio):
+            logger.error(f"Failed to resume {station}")
+            metrics.FAILED_STARTS.inc(station=station)
+        self._mark_play_position(station, None if live else max(offset, stream.start_offset))
+        self.publish('playback', {'playing': True, 'station': station})
+        if self.supervisor is not None:
+            self.supervisor.on_stream_started()
+        return station
+
+    def go_live(self) -> Optional[str]:
+        """
+        Catch up to live: drop the time-shifted audio and continue at the newest data.
+
+        Returns:
+            Name of the playing station, or None if nothing is playing or paused
+        """
+        if self.is_paused():
+            return self.resume(live=True)
+        stream = self.get_current_relay_stream()
+        if stream is None or not self.is_playing():
+            return self.playing_station if self.is_playing() else None
+        behind = self._seconds_behind_live(stream)
+        if behind > const.TIMESHIFT_LIVE_THRESHOLD:
+            logger.info(f"Catching up to live on {self.playing_station}, skipping {behind:.0f}s")
+            self.backend.play(self.relay.local_url(self.playing_station))
+            self._mark_play_position(self.playing_station)
+            if self.supervisor is not None:
+                self.supervisor.on_stream_started()
+        return self.playing_station
+
+    def _seconds_behind_live(self, stream) -> float:
+        """
+        Get how far playback of the relay stream is behind live.
+
+        Args:
+            stream: Relay stream of the playing station
+
+        Returns:
+            Seconds behind, where a fresh start from the burst offset counts as live
+        """
+        return stream.seconds_behind(self._get_play_offset(stream)) - stream.seconds_behind(stream.burst_offset())
+
+    def _mark_play_position(self, station_name: str, offset: Optional[int] = None):
+        """
+        Remember where in the relay stream the decoder started playing.
+
+        Args:
+            station_name: Station that was started
+            offset: Offset playback started from, None for the burst offset of a fresh start
+        """
+        stream = self.relay.get(station_name) if self.relay is not None else None
+        if stream is None:
+            self._play_position = None
+            return
+        self._play_position = (stream, stream.burst_offset() if offset is None else offset, time.monotonic())
+
+    def _get_play_offset(self, stream) -> int:
+        """
+        Estimate the offset being heard, from where playback started and the time since.
+
+        Socket and decoder buffers hide how far the decoder has really read, so
+        the position advances at the stream's data rate instead.
+
+        Args:
+            stream: Relay stream of the playing station
+
+        Returns:
+            Absolute offset in the stream
+        """
+        if self._paused_offset is not None:
+            return self._paused_offset
+        position = self._play_position
+        if position is None or position[0] is not stream:
+            # Reconnected since playback started, the new stream is played near live
+            return stream.burst_offset()
+        _, offset, started_at = position
+        offset += int((time.monotonic() - started_at) * stream.bytes_per_second)
+        return max(min(offset, stream.live_offset), stream.start_offset)
+
+    def is_paused(self) -> bool:
+        """Check if the playing station is paused with its time-shift buffer kept."""
+        return self._paused_offset is not None
+
+    def get_timeshift(self) -> Dict:
+        """
+        Get the time-shift state of the playing station.
+
+        Returns:
+            Dictionary with paused state, seconds behind live and seconds of audio buffered
+        """
+        stream = self.relay.get(self.playing_station) if self.relay is not None and self.playing_station else None
+        if stream is None:
+            return {'paused': self.is_paused(), 'behind_seconds': 0.0, 'buffered_seconds': 0.0}
+        position = self._get_play_offset(stream) if self.is_paused() or self.is_playing() else stream.live_offset
+        return {
+            'paused': self.is_paused(),
+            'behind_seconds': round(stream.seconds_behind(position), 1),
+            'buffered_seconds': round(stream.buffered_bytes / stream.bytes_per_second, 1),
+        }
+
+    def get_now_playing(self) -> Optional[str]:
+        """
+        Get the ICY title of the track being heard on the playing station.
+
+        Returns:
+            Title, or None if nothing is playing or the station sends no titles
+        """
+        station = self.playing_station
+        if self.relay is None or station is None:
+            return None
+        stream = self.relay.get(station)
+        if stream is not None and stream.title is not None and (self.is_playing() or self.is_paused()):
+            # Time-shifted audio has the title that was current when it was received
+            return stream.title_at(self._get_play_offset(stream))
+        return self.relay.get_title(station)
+
+    def _on_title_received(self, station_name: str, title: str):
+        """Check the title of the playing station when a relay stream receives a new one."""
+        if station_name == self.playing_station:
+            self.check_title()
+
+    def check_title(self):
+        """
+        Publish the title being heard when it changed, and announce it if ICY_ANNOUNCE_TITLES is set.
+
+        Called when a title arrives and on the supervisor tick, so time-shifted
+        playback reports titles when they are heard rather than when received.
+        """
+        with self._title_lock:
+            station = self.playing_station
+            title = self.get_now_playing()
+            if title is None or (station, title) == self._last_title:
+                return
+            previous, self._last_title = self._last_title, (station, title)
+
+        logger.info(f"Now playing on {station}: {title}")
+        self.publish('title', {'station': station, 'title': title})
+        # A new station is announced by name, only track changes on the same station are spoken
+        if const.ICY_ANNOUNCE_TITLES and previous is not None and previous[0] == station and self.is_playing():
+            self.speak(title, PRIORITY_NORMAL, category='title', cache=False)
+
+    def publish(self, event_type: str, data: Dict):
+        """
+        Publish a state change to /events subscribers.
+
+        Args:
+            event_type: Event name, e.g. 'playback'
+            data: Event payload
+        """
+        if self.events is not None:
+            self.events.publish(event_type, data)
+
+    def publish_health(self):
+        """Publish stream health if codec, bitrate, underruns or reliability changed."""
+        if self.events is None or not self.events.subscriber_count:
+            return
+        health = self.get_stream_health()
+        reliability = health.get('reliability', {})
+        key = (health.get('station'), health.get('playing'), health.get('codec'), health.get('bitrate_kbps'),
+               health.get('underruns'), reliability.get('reconnects'))
+        if key != self._last_health_key:
+            self._last_health_key = key
+            self.publish('health', health)
+
+    def get_status(self) -> Dict:
+        """
+        Get the playback state reported by /status and as the first /events event.
+
+        Returns:
+            Dictionary with playing state, station list and neighbours, track title, variant choice and switch latency
+        """
+        stations, index = self.stations, self.current_station_index
+        count = len(stations)
+        return {
+            'playing': self.is_playing(),
+            'station': self.get_current_station(),
+            # Lazy station lists from the sqlite backend would be read in full, clients page them with /stations
+            'stations': list(stations) if isinstance(stations, list) else None,
+            'station_count': count,
+            'previous': stations[(index - 1) % count] if count else None,
+            'next': stations[(index + 1) % count] if count else None,
+            'paused': self.is_paused(),
+            'title': self.get_now_playing(),
+            'timeshift': self.get_timeshift(),
+            'variant': self.adaptive.get_stats() if self.adaptive is not None else None,
+            'switch_latency': self.get_switch_latency_stats(),
+        }
+
+    def shutdown(self):
+        """Stop playback and release the playback engine and relay."""
+        if self.supervisor is not None:
+            self.supervisor.stop()
+        self.buffers.stop()
+        if self.adaptive is not None:
+            self.adaptive.stop()
+        if self.ducker is not None:
+            self.ducker.stop()
+        if self.backend is not None:
+            self.backend.close()
+        if self.relay is not None:
+            self.relay.stop()
+        if self.resolver is not None:
+            self.resolver.stop()
 
     def next_station(self):
         """Switch to the next station."""
@@ -153,6 +779,24 @@ class RadioPlayer:
         self.current_station_index = (self.current_station_index - 1) % len(self.stations)
         self.start_stream(self.stations[self.current_station_index])
 
+    def toggle(self) -> Optional[str]:
+        """
+        Pause the stream if playing, resume it if paused, otherwise start the current station.
+
+        Returns:
+            Name of the started or resumed station, or None if playback was paused or stopped
+        """
+        if self.is_playing():
+            self.pause()
+            return None
+        if self.is_paused():
+            return self.resume()
+
+        station = self.get_current_station() or (self.stations[0] if self.stations else None)
+        if station:
+            self.start_stream(station)
+        return station
+
     def play_station_by_name(self, station_name: str):
         """
         Play a specific station by name.
@@ -160,8 +804,9 @@ class RadioPlayer:
         Args:
             station_name: Name of station to play
         """
-        if station_name in self.stations:
-            self.current_station_index = self.stations.index(station_name)
+        index = self.station_manager.get_station_index(station_name)
+        if index is not None:
+            self.current_station_index = index
             self.start_stream(station_name)
         else:
             logger.warning(f"Station '{station_name}' not found")
@@ -169,7 +814,7 @@ class RadioPlayer:
 
     def is_playing(self) -> bool:
         """Check if a stream is currently playing."""
-        return self.current_process is not None
+        return self.backend is not None and self.backend.is_active()
 
     def get_current_station(self) -> Optional[str]:
         """Get the name of the currently playing station."""
@@ -181,42 +826,75 @@ class RadioPlayer:
 class VolumeController:
     """Manages system volume control."""
 
-    def __init__(self):
-        """Initialize the VolumeController."""
+    def __init__(self, events: Optional[EventBroadcaster] = None):
+        """
+        Initialize the VolumeController.
+
+        Args:
+            events: EventBroadcaster that receives volume changes
+        """
+        self.events = events
         self.amixer_path = shutil.which('amixer')
+        self.step_percent = int(const.VOLUME_STEP.rstrip('%'))
+        self.mixer = None
         if self.amixer_path is None:
             logger.error("amixer not found! Volume control disabled.")
+        else:
+            self.mixer = create_mixer(self.amixer_path)
 
-    def adjust(self, direction: str):
+    def _fall_back(self, error: Exception):
+        """
+        Switch to one amixer process per call after the mixer backend failed.
+
+        Args:
+            error: Error raised by the mixer backend
+        """
+        if isinstance(self.mixer, SubprocessMixer):
+            raise error
+        logger.warning(f"{self.mixer.name} mixer failed ({error}), falling back to subprocess")
+        self.mixer.close()
+        self.mixer = SubprocessMixer(self.amixer_path)
+
+    def _publish_level(self, level: Optional[int]):
+        """
+        Publish the new volume level to /events subscribers.
+
+        Args:
+            level: Level confirmed by the mixer, None if it did not report one
+        """
+        if self.events is not None:
+            self.events.publish('volume', {'level': level})
+
+    def adjust(self, direction: str, steps: int = 1):
         """
         Adjust system volume.
 
         Args:
             direction: 'up' or 'down'
+            steps: Number of volume steps to move in one call
         """
-        if self.amixer_path is None:
+        if self.mixer is None:
             logger.warning("Volume control not available")
             return
 
-        try:
-            # Unmute first
-            subprocess.call([self.amixer_path, 'set', 'Master', 'unmute'],
-                          stdout=subprocess.DEVNULL,
-                          stderr=subprocess.DEVNULL)
-
-            # Adjust volume
-            if direction == "up":
-                command = [self.amixer_path, 'set', 'Master', f'{const.VOLUME_STEP}+']
-            elif direction == "down":
-                command = [self.amixer_path, 'set', 'Master', f'{const.VOLUME_STEP}-']
-            else:
-                logger.warning(f"Invalid volume direction: {direction}")
-                return
+        if direction == "up":
+            delta = self.step_percent * steps
+        elif direction == "down":
+            delta = -self.step_percent * steps
+        else:
+            logger.warning(f"Invalid volume direction: {direction}")
+            return
 
-            subprocess.call(command,
-                          stdout=subprocess.DEVNULL,
-                          stderr=subprocess.DEVNULL)
-            logger.info(f"Volume adjusted: {direction}")
+        try:
+            started_at = time.monotonic()
+            try:
+                new_level = self.mixer.adjust(delta)
+            except Exception as e:
+                self._fall_back(e)
+                new_level = self.mixer.adjust(delta)
+            metrics.MIXER_LATENCY.observe(time.monotonic() - started_at, operation='adjust', mixer=self.mixer.name)
+            logger.info(f"Volume adjusted: {direction} x{steps}")
+            self._publish_level(new_level)
         except Exception as e:
             logger.error(f"Error adjusting volume: {e}")
 
@@ -230,7 +908,7 @@ class VolumeController:
         Returns:
             True if the volume was set, False otherwise
         """
-        if self.amixer_path is None:
+        if self.mixer is None:
             logger.warning("Volume control not available")
             return False
 
@@ -238,15 +916,15 @@ class VolumeController:
         level = max(0, min(100, level))
 
         try:
-            # Unmute first
-            subprocess.call([self.amixer_path, 'set', 'Master', 'unmute'],
-                          stdout=subprocess.DEVNULL,
-                          stderr=subprocess.DEVNULL)
-
-            subprocess.call([self.amixer_path, 'set', 'Master', f'{level}%'],
-                          stdout=subprocess.DEVNULL,
-                          stderr=subprocess.DEVNULL)
+            started_at = time.monotonic()
+            try:
+                new_level = self.mixer.set_level(level)
+            except Exception as e:
+                self._fall_back(e)
+                new_level = self.mixer.set_level(level)
+            metrics.MIXER_LATENCY.observe(time.monotonic() - started_at, operation='set_level', mixer=self.mixer.name)
             logger.info(f"Volume set to {level}%")
+            self._publish_level(new_level)
             return True
         except Exception as e:
             logger.error(f"Error setting volume: {e}")
@@ -256,7 +934,8 @@ class VolumeController:
 class SystemManager:
     """Manages system-level operations like network info, updates, and reboots."""
 
-    def __init__(self, base_dir: str, tts_callback, player):
+    def __init__(self, base_dir: str, tts_callback, player, network: Optional[NetworkMonitor] = None,
+                 config_manager: Optional['ConfigManager'] = None):
         """
         Initialize SystemManager.
 
@@ -264,10 +943,14 @@ class SystemManager:
             base_dir: Base directory of the project
             tts_callback: Function to call for text-to-speech
             player: RadioPlayer instance for stopping/starting streams
+            network: NetworkMonitor with the cached IP address
+            config_manager: ConfigManager whose playback state is saved before the service goes down
         """
         self.base_dir = base_dir
         self.speak = tts_callback
         self.player = player
+        self.network = network
+        self.config_manager = config_manager
         self.update_script = os.path.join(base_dir, const.UPDATE_SCRIPT)
 
     def get_ip_address(self) -> Optional[str]:
@@ -277,19 +960,12 @@ class SystemManager:
         Returns:
             IP address string or None if not found
         """
-        try:
-            # Create a socket to get the local IP
-            import socket
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            # Connect to an external address (doesn't actually send data)
-            # Using Cloudflare DNS (same as network check)
-            s.connect((const.NETWORK_CHECK_URL.replace('https://', ''), 80))
-            ip = s.getsockname()[0]
-            s.close()
-            return ip
-        except Exception as e:
-            logger.error(f"Failed to get IP address: {e}")
-            return None
+        if self.network is not None:
+            return self.network.ip
+        ip = get_local_address()
+        if ip is None:
+            logger.error("Failed to get IP address: no route to the network")
+        return ip
 
     def get_hostname(self) -> str:
         """
@@ -299,54 +975,44 @@ class SystemManager:
             Hostname string
         """
         try:
-            import socket
             return socket.gethostname()
         except Exception as e:
             logger.error(f"Failed to get hostname: {e}")
             return "unknown"
 
     def speak_network_info(self):
-        """Speak the IP address and hostname via TTS."""
-        # Remember if we were playing
-        was_playing = self.player.is_playing()
-        current_station = self.player.get_current_station()
-
-        # Stop radio for clear TTS
-        logger.info("Stopping radio for network info")
-        self.player.stop_stream()
-
-        # Get and speak network info
+        """Speak the IP address and hostname via TTS, over the ducked stream."""
         ip = self.get_ip_address()
         hostname = self.get_hostname()
 
         if ip:
             message = f"IP address {ip}, hostname {hostname}"
             logger.info(f"Network info: {message}")
-            self.speak(message)
         else:
             message = "Unable to retrieve IP address"
             logger.warning(message)
-            self.speak(message)
 
-        # Restart radio if it was playing
-        if was_playing and current_station:
-            logger.info(f"Restarting radio: {current_station}")
-            self.player.start_stream(current_station)
+        self.speak(message, PRIORITY_SYSTEM, cache=False)
+
+    def _stop_for_exit(self):
+        """Stop the radio before the service goes down, keeping the saved state so it resumes afterwards."""
+        self.player.stop_stream(user_initiated=False)
+        if self.config_manager is not None:
+            self.config_manager.save()
 
     def run_update(self):
         """Run the update script."""
-        # Stop radio first
-        logger.info("Stopping radio for update")
-        self.player.stop_stream()
-
         if not os.path.exists(self.update_script):
             message = "Update script not found"
             logger.error(message)
-            self.speak(message)
+            self.speak(message, PRIORITY_SYSTEM)
             return
 
         try:
-            self.speak("Starting update")
+            # Announce over the ducked stream, then stop the radio for the update
+            self.speak("Starting update", PRIORITY_SYSTEM).wait(const.TTS_WAIT_TIMEOUT)
+            logger.info("Stopping radio for update")
+            self._stop_for_exit()
             logger.info("Running update script...")
 
             # Run update script in background
@@ -362,19 +1028,17 @@ class SystemManager:
         except Exception as e:
             message = f"Failed to start update: {e}"
             logger.error(message)
-            self.speak("Update failed")
+            self.speak("Update failed", PRIORITY_SYSTEM)
 
     def restart_app(self):
         """Restart the pi-radio application service."""
-        # Stop radio first
-        logger.info("Stopping radio for app restart")
-        self.player.stop_stream()
-
         try:
-            self.speak("Restarting application")
             logger.info("Restarting application service...")
 
-            # Give TTS time to complete
+            # Announce over the ducked stream, then stop the radio
+            self.speak("Restarting application", PRIORITY_SYSTEM).wait(const.TTS_WAIT_TIMEOUT)
+            logger.info("Stopping radio for app restart")
+            self._stop_for_exit()
             time.sleep(1)
 
             # Try systemctl restart
@@ -390,7 +1054,7 @@ class SystemManager:
             else:
                 logger.error(f"Failed to restart service: {result.stderr}")
                 # If we're here, the restart failed but we're still running
-                self.speak("Restart failed")
+                self.speak("Restart failed", PRIORITY_SYSTEM)
 
         except subprocess.TimeoutExpired:
             # This is actually expected if we restart ourselves
@@ -398,19 +1062,17 @@ class SystemManager:
         except Exception as e:
             message = f"Failed to restart application: {e}"
             logger.error(message)
-            self.speak("Restart failed")
+            self.speak("Restart failed", PRIORITY_SYSTEM)
 
     def reboot_system(self):
         """Reboot the entire system."""
-        # Stop radio first
-        logger.info("Stopping radio for system reboot")
-        self.player.stop_stream()
-
         try:
-            self.speak("Rebooting system")
             logger.warning("System reboot initiated via gamepad!")
 
-            # Give TTS time to speak
+            # Announce over the ducked stream, then stop the radio
+            self.speak("Rebooting system", PRIORITY_SYSTEM).wait(const.TTS_WAIT_TIMEOUT)
+            logger.info("Stopping radio for system reboot")
+            self._stop_for_exit()
             time.sleep(2)
 
             # Reboot the system
@@ -419,11 +1081,22 @@ class SystemManager:
         except Exception as e:
             message = f"Failed to reboot system: {e}"
             logger.error(message)
-            self.speak("Reboot failed")
+            self.speak("Reboot failed", PRIORITY_SYSTEM)
 
 
 class ConfigManager:
-    """Manages application configuration including bookmarks and admin settings."""
+    """Manages application configuration including bookmarks, admin settings and playback state."""
+
+    DEFAULT_CONFIG = {
+        'bookmark_A': None,
+        'bookmark_B': None,
+        'admin_mode_enabled': True,
+        'admin_command_cooldown': 3.0,
+        # Playback state, restored after a restart
+        'last_station': None,
+        'volume': None,
+        'playing': True,
+    }
 
     def __init__(self, config_file: str):
         """
@@ -433,42 +1106,17 @@ class ConfigManager:
             config_file: Path to config file
         """
         self.config_file = config_file
-        self.config = self._load_config()
-
-    def _load_config(self) -> Dict:
-        """Load configuration from file."""
-        # Default configuration
-        default_config = {
-            'bookmark_A': None,
-            'bookmark_B': None,
-            'admin_mode_enabled': True,
-            'admin_command_cooldown': 3.0
-        }
-
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, 'r') as f:
-                    config = json.load(f)
-                    # Merge with defaults to ensure all keys exist
-                    merged_config = {**default_config, **config}
-                    logger.info(f"Config loaded: {merged_config}")
-                    return merged_config
-            except json.JSONDecodeError as e:
-                logger.error(f"Invalid config file: {e}")
-            except Exception as e:
-                logger.error(f"Error loading config: {e}")
+        self.store = ConfigStore(config_file, self.DEFAULT_CONFIG)
+        self.store.start()
+        logger.info(f"Config loaded: {self.store.snapshot()}")
 
-        logger.info("Using default configuration")
-        return default_config
+    def save(self):
+        """Write pending changes to disk now, e.g. before shutdown or reboot."""
+        self.store.flush()
 
-    def _save_config(self):
-        """Save configuration to file."""
-        try:
-            with open(self.config_file, 'w') as f:
-                json.dump(self.config, f, indent=2)
-            logger.info(f"Config saved: {self.config}")
-        except Exception as e:
-            logger.error(f"Error saving config: {e}")
+    def close(self):
+        """Stop the background writer after saving pending changes."""
+        self.store.stop()
 
     def set_bookmark(self, bookmark_name: str, station_name: str):
         """
@@ -478,8 +1126,7 @@ class ConfigManager:
             bookmark_name: 'bookmark_A' or 'bookmark_B'
             station_name: Station to bookmark
         """
-        self.config[bookmark_name] = station_name
-        self._save_config()
+        self.store.update(**{bookmark_name: station_name})
         logger.info(f"{bookmark_name} set to {station_name}")
 
     def get_bookmark(self, bookmark_name: str) -> Optional[str]:
@@ -492,7 +1139,7 @@ class ConfigManager:
         Returns:
             Station name or None
         """
-        return self.config.get(bookmark_name)
+        return self.store.get(bookmark_name)
 
     def get_admin_mode_enabled(self) -> bool:
         """
@@ -501,7 +1148,7 @@ class ConfigManager:
         Returns:
             True if admin mode is enabled, False otherwise
         """
-        return self.config.get('admin_mode_enabled', True)
+        return self.store.get('admin_mode_enabled', True)
 
     def get_admin_command_cooldown(self) -> float:
         """
@@ -510,13 +1157,40 @@ class ConfigManager:
         Returns:
             Cooldown time in seconds
         """
-        return self.config.get('admin_command_cooldown', 3.0)
+        return self.store.get('admin_command_cooldown', 3.0)
+
+    def get_playback_state(self) -> Dict:
+        """
+        Get the playback state saved before the last shutdown.
+
+        Returns:
+            Dictionary with last_station, volume and playing
+        """
+        return {key: self.store.get(key) for key in ('last_station', 'volume', 'playing')}
+
+    def record_event(self, event_type: str, data: Dict):
+        """
+        Keep the playback state up to date from player and volume events.
+
+        Args:
+            event_type: Event name, e.g. 'playback'
+            data: Event payload
+        """
+        if event_type == 'playback':
+            if data.get('playing'):
+                self.store.update(last_station=data.get('station'), playing=True)
+            elif data.get('user_initiated', True):
+                # Stops before an update, restart or reboot keep the radio playing afterwards
+                self.store.update(playing=False)
+        elif event_type == 'volume' and data.get('level') is not None:
+            self.store.update(volume=data['level'])
 
 
 class GamepadController:
     """Handles gamepad input and controls the radio."""
 
-    def __init__(self, player: RadioPlayer, volume: VolumeController, config_manager: ConfigManager, system_manager: SystemManager):
+    def __init__(self, player: RadioPlayer, volume: VolumeController, config_manager: ConfigManager,
+                 system_manager: SystemManager, coalescer: CommandCoalescer, executor: CommandExecutor):
         """
         Initialize GamepadController.
 
@@ -525,9 +1199,13 @@ class GamepadController:
             volume: VolumeController instance
             config_manager: ConfigManager instance for bookmarks and admin settings
             system_manager: SystemManager instance for admin commands
+            coalescer: CommandCoalescer for station navigation and volume
+            executor: CommandExecutor that runs all state-changing commands
         """
         self.player = player
         self.volume = volume
+        self.coalescer = coalescer
+        self.executor = executor
         self.config_manager = config_manager
         self.system_manager = system_manager
 
@@ -583,16 +1261,16 @@ class GamepadController:
         if self.select_pressed_time > 0 and current_time - self.select_pressed_time < const.BOOKMARK_SAVE_WINDOW:
             station = self.player.get_current_station()
             if station:
-                self.config_manager.set_bookmark('bookmark_A', station)
-                self.player.speak(f"Bookmark A set to {station}")
+                self._submit('set_bookmark_A', self._set_bookmark, 'A', station)
         else:
             # Play bookmarked station
+            self.coalescer.cancel_pending()
             station = self.config_manager.get_bookmark('bookmark_A')
             if station and self.player.station_manager.is_valid_station(station):
-                self.player.play_station_by_name(station)
+                self._submit('play_bookmark_A', self.player.play_station_by_name, station)
             else:
                 logger.info("Bookmark A not set or invalid, playing first station")
-                self.player.play_station_by_name(self.player.stations[0])
+                self._submit('play_bookmark_A', self.player.play_station_by_name, self.player.stations[0])
 
         self.select_pressed_time = 0
 
@@ -604,29 +1282,56 @@ class GamepadController:
         if self.select_pressed_time > 0 and current_time - self.select_pressed_time < const.BOOKMARK_SAVE_WINDOW:
             station = self.player.get_current_station()
             if station:
-                self.config_manager.set_bookmark('bookmark_B', station)
-                self.player.speak(f"Bookmark B set to {station}")
+                self._submit('set_bookmark_B', self._set_bookmark, 'B', station)
         else:
             # Play bookmarked station
+            self.coalescer.cancel_pending()
             station = self.config_manager.get_bookmark('bookmark_B')
             if station and self.player.station_manager.is_valid_station(station):
-                self.player.play_station_by_name(station)
+                self._submit('play_bookmark_B', self.player.play_station_by_name, station)
             else:
                 logger.info("Bookmark B not set or invalid, playing first station")
-                self.player.play_station_by_name(self.player.stations[0])
+                self._submit('play_bookmark_B', self.player.play_station_by_name, self.player.stations[0])
 
         self.select_pressed_time = 0
 
+    def _submit(self, name: str, func, *args):
+        """
+        Queue a command and record the time from the gamepad event until it returned.
+
+        Args:
+            name: Command name, used in logs and as metric label
+            func: Function to run on the executor
+            *args: Arguments for func
+        """
+        event_at = time.monotonic()
+
+        def run():
+            try:
+                return func(*args)
+            finally:
+                metrics.COMMAND_LATENCY.observe(time.monotonic() - event_at, command=name)
+
+        return self.executor.submit(name, run)
+
+    def _set_bookmark(self, label: str, station: str):
+        """
+        Save a bookmark and confirm it via TTS.
+
+        Args:
+            label: 'A' or 'B'
+            station: Station to bookmark
+        """
+        self.config_manager.set_bookmark(f'bookmark_{label}', station)
+        self.player.speak(f"Bookmark {label} set to {station}")
+
     def _handle_button_start(self):
-        """Handle Start button press (play/pause)."""
-        if self.player.is_playing():
-            self.player.stop_stream()
+        """Handle Start button press (play/pause, Select + Start catches up to live)."""
+        self.coalescer.cancel_pending()
+        if self.select_is_pressed:
+            self._submit('live', self.player.go_live)
         else:
-            station = self.player.get_current_station()
-            if station:
-                self.player.start_stream(station)
-            else:
-                self.player.start_stream(self.player.stations[0])
+            self._submit('toggle', self.player.toggle)
 
     def process_event(self, event):
         """
@@ -675,16 +1380,16 @@ class GamepadController:
                         # Admin mode: Left = restart app, Right = speak IP
                         if event.state < const.JOYSTICK_MIN_THRESHOLD:
                             logger.info("Admin command: App restart triggered")
-                            self.system_manager.restart_app()
+                            self._submit('restart_app', self.system_manager.restart_app)
                         elif event.state > const.JOYSTICK_MAX_THRESHOLD:
                             logger.info("Admin command: Network info triggered")
-                            self.system_manager.speak_network_info()
+                            self._submit('network_info', self.system_manager.speak_network_info)
                     else:
                         # Normal mode: Left = previous station, Right = next station
                         if event.state < const.JOYSTICK_MIN_THRESHOLD:
-                            self.player.previous_station()
+                            self.coalescer.navigate(-1)
                         elif event.state > const.JOYSTICK_MAX_THRESHOLD:
-                            self.player.next_station()
+                            self.coalescer.navigate(1)
 
                 elif event.code == const.JOYSTICK_Y and self._is_debounced(const.JOYSTICK_Y):
                     # Check if Select is held (admin mode)
@@ -697,32 +1402,65 @@ class GamepadController:
                         # Admin mode: Up = update, Down = reboot system
                         if event.state < const.JOYSTICK_MIN_THRESHOLD:
                             logger.info("Admin command: Update triggered")
-                            self.system_manager.run_update()
+                            self._submit('update', self.system_manager.run_update)
                         elif event.state > const.JOYSTICK_MAX_THRESHOLD:
                             logger.info("Admin command: System reboot triggered")
-                            self.system_manager.reboot_system()
+                            self._submit('reboot', self.system_manager.reboot_system)
                     else:
                         # Normal mode: Up = volume up, Down = volume down
                         if event.state < const.JOYSTICK_MIN_THRESHOLD:
-                            self.volume.adjust("up")
+                            self.coalescer.adjust_volume("up")
                         elif event.state > const.JOYSTICK_MAX_THRESHOLD:
-                            self.volume.adjust("down")
+                            self.coalescer.adjust_volume("down")
 
         except Exception as e:
             logger.error(f"Error processing event: {e}")
 
 
+class ApiServer(ThreadingHTTPServer):
+    """HTTP server whose connections can be handed over to the event broadcaster."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._detached = set()
+        self._detached_lock = threading.Lock()
+
+    def detach(self, request):
+        """
+        Keep a connection open after its handler returns.
+
+        Args:
+            request: Client socket now owned by someone else
+        """
+        with self._detached_lock:
+            self._detached.add(request)
+
+    def shutdown_request(self, request):
+        with self._detached_lock:
+            if request in self._detached:
+                self._detached.discard(request)
+                return
+        super().shutdown_request(request)
+
+
 class HttpApi:
     """Simple HTTP API for controlling the radio."""
 
-    def __init__(self, player: RadioPlayer, volume: 'VolumeController'):
+    def __init__(self, player: RadioPlayer, volume: 'VolumeController', coalescer: CommandCoalescer,
+                 executor: CommandExecutor, events: EventBroadcaster, network: Optional[NetworkMonitor] = None):
         self.player = player
         self.volume = volume
+        self.coalescer = coalescer
+        self.executor = executor
+        self.events = events
+        self.network = network
         self.server = None
 
     def start(self):
-        handler = self._make_handler(self.player, self.volume)
-        self.server = HTTPServer(('0.0.0.0', const.HTTP_API_PORT), handler)
+        handler = self._make_handler(self.player, self.volume, self.coalescer, self.executor, self.events,
+                                     self.network)
+        # One thread per connection, so slow commands never block /status polls
+        self.server = ApiServer(('0.0.0.0', const.HTTP_API_PORT), handler)
         thread = threading.Thread(target=self.server.serve_forever, daemon=True)
         thread.start()
         logger.info(f"HTTP API listening on port {const.HTTP_API_PORT}")
@@ -732,40 +1470,46 @@ class HttpApi:
             self.server.shutdown()
 
     @staticmethod
-    def _make_handler(player: RadioPlayer, volume: 'VolumeController'):
+    def _make_handler(player: RadioPlayer, volume: 'VolumeController', coalescer: CommandCoalescer,
+                      executor: CommandExecutor, events: EventBroadcaster, network: Optional[NetworkMonitor]):
         class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 keeps connections alive between requests
+            protocol_version = 'HTTP/1.1'
+
             def do_GET(self):
-                path = self.path.rstrip('/')
+                url = urlsplit(self.path)
+                path = url.path.rstrip('/')
+                if path in ('/toggle', '/play', '/stop', '/live') or path.startswith('/play/'):
+                    # Direct playback commands take over from pending navigation
+                    coalescer.cancel_pending()
+
                 if path == '/toggle':
-                    if player.is_playing():
-                        player.stop_stream()
-                        self._respond(200, {'status': 'stopped'})
-                    else:
-                        station = player.get_current_station() or (player.stations[0] if player.stations else None)
-                        if station:
-                            player.start_stream(station)
-                            self._respond(200, {'status': 'playing', 'station': station})
-                        else:
-                            self._respond(500, {'error': 'no stations available'})
+                    job = executor.submit('toggle', player.toggle)
+                    self._respond_job(job, lambda station: {'status': 'playing', 'station': station}
+                                      if station else {'status': 'paused' if player.is_paused() else 'stopped'})
+                elif path == '/live':
+                    job = executor.submit('live', player.go_live)
+                    self._respond_job(job, lambda station: {'status': 'playing', 'station': station}
+                                      if station else {'status': 'stopped'})
                 elif path.startswith('/play/'):
                     station = unquote(path[len('/play/'):])
                     if player.station_manager.is_valid_station(station):
-                        player.play_station_by_name(station)
-                        self._respond(200, {'status': 'playing', 'station': station})
+                        job = executor.submit('play', player.play_station_by_name, station)
+                        self._respond_job(job, lambda _: {'status': 'playing', 'station': station})
                     else:
                         self._respond(404, {'error': 'station not found', 'station': station})
                 elif path == '/play':
                     station = player.get_current_station() or (player.stations[0] if player.stations else None)
                     if station:
-                        player.start_stream(station)
-                        self._respond(200, {'status': 'playing', 'station': station})
+                        job = executor.submit('play', player.start_stream, station)
+                        self._respond_job(job, lambda _: {'status': 'playing', 'station': station})
                     else:
                         self._respond(500, {'error': 'no stations available'})
                 elif path == '/volume/up':
-                    volume.adjust('up')
+                    coalescer.adjust_volume('up')
                     self._respond(200, {'status': 'ok', 'volume': 'up'})
                 elif path == '/volume/down':
-                    volume.adjust('down')
+                    coalescer.adjust_volume('down')
                     self._respond(200, {'status': 'ok', 'volume': 'down'})
                 elif path.startswith('/volume/'):
                     raw = path[len('/volume/'):]
@@ -775,33 +1519,124 @@ class HttpApi:
                         self._respond(400, {'error': 'volume must be an integer 0-100', 'value': raw})
                     else:
                         clamped = max(0, min(100, level))
-                        if volume.set_level(clamped):
+                        if volume.amixer_path is not None:
+                            coalescer.set_volume(clamped)
                             self._respond(200, {'status': 'ok', 'volume': clamped})
                         else:
                             self._respond(500, {'error': 'volume control not available'})
                 elif path == '/stop':
-                    player.stop_stream()
-                    self._respond(200, {'status': 'stopped'})
-                elif path == '/next':
-                    player.next_station()
-                    self._respond(200, {'status': 'playing', 'station': player.get_current_station()})
-                elif path == '/prev':
-                    player.previous_station()
-                    self._respond(200, {'status': 'playing', 'station': player.get_current_station()})
+                    job = executor.submit('stop', player.stop_stream)
+                    self._respond_job(job, lambda _: {'status': 'stopped'})
+                elif path in ('/next', '/prev'):
+                    job = coalescer.navigate(1 if path == '/next' else -1)
+                    # Only the cursor moved; the stream starts after the settle time unless another input comes first
+                    self._respond_job(job, lambda station: {'status': 'selected', 'station': station,
+                                                            'starts_in': const.COALESCE_SETTLE_TIME})
+                elif path.startswith('/jobs/'):
+                    raw = path[len('/jobs/'):]
+                    job = executor.get_job(int(raw)) if raw.isdigit() else None
+                    if job is not None:
+                        self._respond(200, job.to_dict())
+                    else:
+                        self._respond(404, {'error': 'job not found', 'job': raw})
+                elif path == '/health':
+                    self._respond(200, player.get_stream_health())
                 elif path == '/status':
-                    self._respond(200, {
-                        'playing': player.is_playing(),
-                        'station': player.get_current_station(),
-                        'stations': player.stations,
-                    })
+                    self._respond(200, player.get_status())
+                elif path == '/network':
+                    if network is not None:
+                        self._respond(200, network.get_state())
+                    else:
+                        self._respond(503, {'error': 'network monitor not running'})
+                elif path == '/stations':
+                    self._respond_stations(parse_qs(url.query))
+                elif path == '/search':
+                    self._respond_stations(parse_qs(url.query), search=True)
+                elif path == '/events':
+                    self._subscribe(parse_qs(url.query))
+                elif path == '/metrics':
+                    self._respond_text(200, metrics.registry.render(), 'text/plain; version=0.0.4')
                 else:
-                    self._respond(404, {'error': 'not found', 'endpoints': ['/toggle', '/play', '/play/<station>', '/stop', '/next', '/prev', '/volume/up', '/volume/down', '/volume/<0-100>', '/status']})
+                    self._respond(404, {'error': 'not found', 'endpoints': ['/toggle', '/play', '/play/<station>', '/stop', '/live', '/next', '/prev', '/volume/up', '/volume/down', '/volume/<0-100>', '/status', '/network', '/stations', '/search?q=<text>', '/health', '/events', '/metrics', '/jobs/<id>']})
+
+            def _respond_stations(self, query: Dict, search: bool = False):
+                """
+                Respond with one page of the station list or of search results.
+
+                Args:
+                    query: Parsed query string with optional offset, limit and (for search) q
+                    search: True to search instead of listing all stations
+                """
+                try:
+                    offset = max(0, int(query.get('offset', ['0'])[0]))
+                    limit = min(const.STATION_PAGE_MAX, max(1, int(query.get('limit', [const.STATION_PAGE_SIZE])[0])))
+                except ValueError:
+                    self._respond(400, {'error': 'offset and limit must be integers'})
+                    return
 
-            def _respond(self, code, data):
+                catalog = player.station_manager.catalog
+                if search:
+                    text = query.get('q', [''])[0]
+                    if not text.strip():
+                        self._respond(400, {'error': 'missing search text', 'parameter': 'q'})
+                        return
+                    total, indices = catalog.search(text, limit, offset)
+                else:
+                    total = len(catalog)
+                    indices = range(offset, min(total, offset + limit))
+
+                body = {'total': total, 'offset': offset, 'limit': limit,
+                        'stations': [catalog.get_info(index) for index in indices]}
+                if search:
+                    body['query'] = text
+                self._respond(200, body)
+
+            def _subscribe(self, query: Dict):
+                """
+                Turn this connection into a server-sent event stream.
+
+                Args:
+                    query: Parsed query string; last_event_id is accepted for clients that cannot set headers
+                """
+                raw = self.headers.get('Last-Event-ID') or query.get('last_event_id', [None])[0]
+                last_event_id = int(raw) if raw and raw.isdigit() else None
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+                self.wfile.flush()
+
+                # The broadcaster owns the socket from here, this thread is released
+                self.close_connection = True
+                self.server.detach(self.connection)
+                events.subscribe(self.connection, last_event_id, player.get_status)
+
+            def _respond_job(self, job: Job, render):
+                """
+                Respond with a command's result, or with its job id if it is still running.
+
+                Args:
+                    job: Submitted job
+                    render: Function turning the job result into the response body
+                """
+                if job.wait(const.HTTP_COMMAND_WAIT) and job.status == 'done':
+                    self._respond(200, {**render(job.result), 'job': job.id})
+                elif job.status == 'failed':
+                    self._respond(500, {'error': job.error, 'job': job.id})
+                else:
+                    self._respond(202, {'status': 'accepted', 'job': job.id, 'poll': f'/jobs/{job.id}'})
+
+            def _respond_text(self, code, text, content_type):
+                body = text.encode()
                 self.send_response(code)
-                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
                 self.end_headers()
-                self.wfile.write(json.dumps(data).encode())
+                self.wfile.write(body)
+
+            def _respond(self, code, data):
+                self._respond_text(code, json.dumps(data), 'application/json')
 
             def log_message(self, format, *args):
                 logger.debug(f"HTTP: {args[0]}")
@@ -809,45 +1644,63 @@ class HttpApi:
         return Handler
 
 
-def wait_for_network(timeout: int = const.NETWORK_TIMEOUT) -> bool:
+def resume_playback(player: RadioPlayer, volume: 'VolumeController', config_manager: 'ConfigManager',
+                    executor: CommandExecutor, network: NetworkMonitor):
     """
-    Wait for network connectivity.
+    Restore the playback state saved before the restart.
+
+    The volume is restored right away; the station is started as soon as the
+    network is up.
 
     Args:
-        timeout: Maximum seconds to wait
+        player: RadioPlayer to resume
+        volume: VolumeController to restore the volume on
+        config_manager: ConfigManager with the saved state and bookmarks
+        executor: CommandExecutor the commands are submitted to
+        network: NetworkMonitor that tells when the network is up
 
     Returns:
-        True if network is available, False otherwise
+        False if there are no stations to play
     """
-    logger.info("Waiting for network connectivity...")
-    start_time = time.time()
+    # Resume where playback was before the restart, else start with the bookmarked or first station
+    state = config_manager.get_playback_state()
+    if state['volume'] is not None:
+        executor.submit('volume', volume.set_level, state['volume'])
+    station_manager = player.station_manager
+    initial_station = next((station for station in (state['last_station'], config_manager.get_bookmark('bookmark_A'))
+                            if station and station_manager.is_valid_station(station)), None)
+    if initial_station is None:
+        if not player.stations:
+            logger.error("No stations available to play!")
+            return False
+        initial_station = player.stations[0]
 
-    while time.time() - start_time < timeout:
-        try:
-            requests.get(const.NETWORK_CHECK_URL, timeout=const.NETWORK_REQUEST_TIMEOUT)
-            logger.info("Network connectivity established")
-            return True
-        except requests.ConnectionError:
-            logger.debug("Network not available, retrying...")
-            time.sleep(const.NETWORK_CHECK_INTERVAL)
-        except Exception as e:
-            logger.error(f"Network check error: {e}")
-            time.sleep(const.NETWORK_CHECK_INTERVAL)
+    if not state['playing']:
+        # Stopped before the restart: only put the cursor back on the station
+        player.current_station_index = station_manager.get_station_index(initial_station)
+        logger.info(f"Playback was stopped, not resuming {initial_station}")
+        return True
 
-    logger.warning(f"Network not available after {timeout} seconds")
-    return False
+    def start_when_online():
+        network.wait_online()
+        executor.submit('play', player.play_station_by_name, initial_station)
 
+    threading.Thread(target=start_when_online, name="resume", daemon=True).start()
+    return True
 
-def setup_signal_handlers(player: RadioPlayer):
+
+def setup_signal_handlers(player: RadioPlayer, config_manager: ConfigManager):
     """
     Setup signal handlers for graceful shutdown.
 
     Args:
         player: RadioPlayer instance to cleanup on shutdown
+        config_manager: ConfigManager whose pending changes are saved on shutdown
     """
     def signal_handler(signum, frame):
         logger.info("Shutdown signal received, cleaning up...")
-        player.stop_stream()
+        config_manager.close()
+        player.shutdown()
         exit(0)
 
     signal.signal(signal.SIGINT, signal_handler)
@@ -856,62 +1709,84 @@ def setup_signal_handlers(player: RadioPlayer):
 
 def main():
     """Main entry point."""
+    timer = StartupTimer()
     logger.info("Pi Radio starting...")
 
     # Get base directory
     base_dir = os.path.dirname(os.path.abspath(__file__))
 
-    # Wait for network first
-    network_connected = False
-    while not network_connected:
-        if wait_for_network():
-            network_connected = True
-        else:
-            logger.warning("Retrying network connection...")
-
-    # Initialize components
+    # Initialize components, the independent ones concurrently
     try:
-        station_manager = StationManager(base_dir)
-        player = RadioPlayer(station_manager)
-        volume = VolumeController()
-        config_manager = ConfigManager(os.path.join(base_dir, const.CONFIG_FILE))
-        system_manager = SystemManager(base_dir, player.speak, player)
-        controller = GamepadController(player, volume, config_manager, system_manager)
+        executor = CommandExecutor()
+        executor.start()
+        events = EventBroadcaster()
+        events.start()
+        # The network is checked in the background while the components start
+        network = NetworkMonitor(events)
+
+        def mark_network_online(online: bool, address_changed: bool):
+            """Log when the network first came up, as a startup phase."""
+            if online and 'network online' not in timer.phases:
+                timer.mark('network online')
+
+        network.add_listener(mark_network_online)
+        network.start()
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="startup") as pool:
+            stations_future = pool.submit(timer.measure, 'stations', StationManager, base_dir)
+            config_future = pool.submit(timer.measure, 'config', ConfigManager,
+                                        os.path.join(base_dir, const.CONFIG_FILE))
+            volume_future = pool.submit(timer.measure, 'volume', VolumeController, events)
+            station_manager = stations_future.result()
+            player = timer.measure('player', RadioPlayer, station_manager, executor, events)
+            player.startup_timer = timer
+            config_manager = config_future.result()
+            volume = volume_future.result()
+        station_watcher = None
+        if const.STATION_WATCH_ENABLED:
+            station_watcher = StationFileWatcher(station_manager)
+            station_watcher.start()
+        events.add_listener(config_manager.record_event)
+        if player.supervisor is not None:
+            network.add_listener(player.supervisor.on_network_change)
+        system_manager = SystemManager(base_dir, player.speak, player, network, config_manager)
+        coalescer = CommandCoalescer(player, volume, executor)
+        controller = GamepadController(player, volume, config_manager, system_manager, coalescer, executor)
     except Exception as e:
         logger.error(f"Failed to initialize components: {e}")
         return
 
     # Start HTTP API
-    http_api = HttpApi(player, volume)
+    http_api = HttpApi(player, volume, coalescer, executor, events, network)
     http_api.start()
+    timer.mark('http api')
 
     # Setup signal handlers
-    setup_signal_handlers(player)
-
-    # Start with bookmarked station or first station
-    initial_station = config_manager.get_bookmark('bookmark_A')
-    if initial_station and station_manager.is_valid_station(initial_station):
-        player.play_station_by_name(initial_station)
-    else:
-        if player.stations:
-            player.start_stream(player.stations[0])
-        else:
-            logger.error("No stations available to play!")
-            return
+    setup_signal_handlers(player, config_manager)
+
+    if not resume_playback(player, volume, config_manager, executor, network):
+        return
+
+    # Imported late because it scans the input devices on import
+    gamepad = timer.measure('gamepad', importlib.import_module, 'inputs')
 
     # Main event loop
     logger.info("Pi Radio ready, listening for gamepad input...")
     try:
         while True:
-            events = get_gamepad()
-            for event in events:
+            pad_events = gamepad.get_gamepad()
+            for event in pad_events:
                 controller.process_event(event)
     except KeyboardInterrupt:
         logger.info("Keyboard interrupt received")
     except Exception as e:
         logger.error(f"Fatal error in main loop: {e}")
     finally:
-        player.stop_stream()
+        if station_watcher is not None:
+            station_watcher.stop()
+        network.stop()
+        config_manager.close()
+        player.shutdown()
+        events.stop()
         logger.info("Pi Radio stopped")
 
 
@@ -0,0 +1,253 @@
+"""
+Metrics registry.
+Counters and histograms in the Prometheus text format, served by the HTTP API
+on /metrics. Recording is a lock, a bisect and two additions, cheap enough to
+stay enabled permanently on a Pi Zero.
+"""
+import bisect
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import constants as const
+
+# Default histogram buckets in seconds, from a fast amixer write to a slow stream start
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: str = '') -> str:
+    """
+    Format a label set, e.g. {station="radio_1",le="0.5"}.
+
+    Args:
+        names: Label names
+        values: Label values in the same order
+        extra: Already formatted label to append
+
+    Returns:
+        Formatted label set, empty if there are no labels
+    """
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _escape(value: str) -> str:
+    """Escape a label value."""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class LabelLimit:
+    """Bounds the distinct values of a label; values seen after the first few are reported as 'other'."""
+
+    OTHER = 'other'
+
+    def __init__(self, limit: int):
+        """
+        Initialize the LabelLimit.
+
+        Args:
+            limit: Number of distinct values that keep their own series
+        """
+        self.limit = limit
+        self._values = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, value: str) -> str:
+        """
+        Get the label value to record.
+
+        Args:
+            value: Actual label value
+
+        Returns:
+            The value itself if it is tracked or there is room for it, 'other' otherwise
+        """
+        with self._lock:
+            if value in self._values:
+                return value
+            if len(self._values) < self.limit:
+                self._values.add(value)
+                return value
+        return self.OTHER
+
+
+def _label_key(names: Sequence[str], labels: Dict, limits: Dict[str, LabelLimit]) -> Tuple:
+    """Get the series key for label values, applying the label limits."""
+    values = []
+    for name in names:
+        value = labels.get(name, '')
+        limit = limits.get(name)
+        values.append(limit(value) if limit is not None else value)
+    return tuple(values)
+
+
+class Counter:
+    """Monotonically increasing count, optionally split by labels."""
+
+    type_name = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 limits: Optional[Dict[str, LabelLimit]] = None):
+        """
+        Initialize the Counter.
+
+        Args:
+            name: Metric name
+            documentation: Help text
+            labels: Label names
+            limits: LabelLimit per label whose values are not a small fixed set
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.limits = limits or {}
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        """
+        Increase the counter.
+
+        Args:
+            amount: Amount to add
+            **labels: Label values
+        """
+        key = _label_key(self.labels, labels, self.limits)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> List[str]:
+        """Render the samples in text format."""
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {value:g}" for key, value in values]
+
+
+class Histogram:
+    """Distribution of observed values in cumulative buckets, optionally split by labels."""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, limits: Optional[Dict[str, LabelLimit]] = None):
+        """
+        Initialize the Histogram.
+
+        Args:
+            name: Metric name
+            documentation: Help text
+            labels: Label names
+            buckets: Upper bounds of the buckets, ascending
+            limits: LabelLimit per label whose values are not a small fixed set
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.limits = limits or {}
+        self.buckets = tuple(buckets)
+        # Label values -> [per-bucket counts (last is +Inf), sum]
+        self._values: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        """
+        Record a value.
+
+        Args:
+            value: Observed value, usually seconds
+            **labels: Label values
+        """
+        key = _label_key(self.labels, labels, self.limits)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def collect(self) -> List[str]:
+        """Render the samples in text format."""
+        with self._lock:
+            values = sorted((key, list(counts), total) for key, (counts, total) in self._values.items())
+
+        lines = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        """Initialize the MetricsRegistry."""
+        self._metrics = []
+
+    def register(self, metric):
+        """
+        Add a metric to the registry.
+
+        Args:
+            metric: Counter or Histogram
+
+        Returns:
+            The metric, so it can be assigned directly
+        """
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+# Shared by all metrics split by station, so they track the same stations and large catalogs stay bounded
+STATION_LABEL = LabelLimit(const.METRICS_MAX_STATIONS)
+
+COMMAND_LATENCY = registry.register(Histogram(
+    'radio_command_seconds', "Time from a gamepad or navigation input until the command returned",
+    labels=('command',)))
+FIRST_AUDIO = registry.register(Histogram(
+    'radio_first_audio_seconds', "Time from a station switch until the first decoded audio",
+    labels=('station', 'warm'), limits={'station': STATION_LABEL}))
+DECODER_START = registry.register(Histogram(
+    'radio_decoder_start_seconds', "Time for the playback backend to spawn or load a stream",
+    labels=('backend',)))
+DECODER_STOP = registry.register(Histogram(
+    'radio_decoder_stop_seconds', "Time for the playback backend to tear down a stream in stop_stream()",
+    labels=('backend',)))
+TTS_DURATION = registry.register(Histogram(
+    'radio_tts_seconds', "Time announcements spend queued, rendered and spoken",
+    labels=('stage',)))
+MIXER_LATENCY = registry.register(Histogram(
+    'radio_mixer_seconds', "Latency of volume mixer calls",
+    labels=('operation', 'mixer')))
+FAILED_STARTS = registry.register(Counter(
+    'radio_stream_start_failures_total', "Streams the playback backend failed to start",
+    labels=('station',), limits={'station': STATION_LABEL}))
+RESOLVER_LOOKUPS = registry.register(Counter(
+    'radio_resolver_lookups_total', "Stream starts by resolver cache result (hit, miss or negative)",
+    labels=('result',)))
+RESOLVER_SAVED = registry.register(Counter(
+    'radio_resolver_saved_seconds_total', "Connect time saved by starting streams from resolved endpoints"))
+BUFFER_SHRINKS = registry.register(Counter(
+    'radio_buffer_shrinks_total', "Times the stream buffers were shrunk because memory ran short",
+    labels=('level',)))
+VARIANT_SWITCHES = registry.register(Counter(
+    'radio_variant_switches_total', "Times a multi-bitrate station stepped to a lower or higher bitrate",
+    labels=('direction',)))
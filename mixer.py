@@ -0,0 +1,331 @@
+"""
+Mixer backends for volume control.
+AmixerSessionMixer keeps one 'amixer -s' process open and feeds it commands
+over stdin, caching level and mute state so each volume step costs a single
+command. Every command waits for amixer to report the new state, so failures
+are noticed. SubprocessMixer runs a separate amixer process per call and is
+used as fallback.
+"""
+import logging
+import os
+import re
+import select
+import subprocess
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import constants as const
+
+logger = logging.getLogger(__name__)
+
+LEVEL_PATTERN = re.compile(r'\[(\d+)%\]')
+SWITCH_PATTERN = re.compile(r'\[(on|off)\]')
+
+
+def parse_mixer_state(lines: List[str]) -> Tuple[Optional[int], Optional[bool]]:
+    """
+    Get the level and mute state from amixer's report of a control.
+
+    Args:
+        lines: Output of 'amixer get' or 'amixer set', one line each
+
+    Returns:
+        Tuple of (level percentage, muted) of the first channel, either None if not reported
+    """
+    text = '\n'.join(lines)
+    level = LEVEL_PATTERN.search(text)
+    switch = SWITCH_PATTERN.search(text)
+    return (int(level.group(1)) if level else None,
+            switch.group(1) == 'off' if switch else None)
+
+
+def read_mixer_state(amixer_path: str, control: str = const.MIXER_CONTROL) -> Tuple[Optional[int], Optional[bool]]:
+    """
+    Read the current level and mute state of a mixer control.
+
+    Args:
+        amixer_path: Path to the amixer binary
+        control: Mixer control name
+
+    Returns:
+        Tuple of (level percentage, muted), either None if unknown
+    """
+    result = subprocess.run([amixer_path, 'get', control], capture_output=True, text=True, timeout=5)
+    return parse_mixer_state(result.stdout.splitlines())
+
+
+class SubprocessMixer:
+    """Runs amixer once to unmute and once to change the volume on every call."""
+
+    name = 'subprocess'
+
+    def __init__(self, amixer_path: str, control: str = const.MIXER_CONTROL):
+        """
+        Initialize the SubprocessMixer.
+
+        Args:
+            amixer_path: Path to the amixer binary
+            control: Mixer control name
+        """
+        self.amixer_path = amixer_path
+        self.control = control
+
+    def _run(self, value: str) -> Optional[int]:
+        """
+        Run 'amixer set <control> <value>' and wait for it to finish.
+
+        Returns:
+            Level reported by amixer afterwards, None if not reported
+
+        Raises:
+            RuntimeError: If amixer failed
+        """
+        result = subprocess.run([self.amixer_path, 'set', self.control, value],
+                                capture_output=True, text=True, timeout=5)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or f"amixer exited with {result.returncode}")
+        return parse_mixer_state(result.stdout.splitlines())[0]
+
+    def adjust(self, delta_percent: int) -> Optional[int]:
+        """
+        Change the volume relative to the current level.
+
+        Args:
+            delta_percent: Percentage points to add, negative to lower the volume
+
+        Returns:
+            New level reported by amixer, None if not reported
+        """
+        self._run('unmute')
+        return self._run(f'{abs(delta_percent)}%{"+" if delta_percent > 0 else "-"}')
+
+    def set_level(self, level: int) -> Optional[int]:
+        """
+        Set the volume to an absolute level.
+
+        Args:
+            level: Volume percentage, 0-100
+
+        Returns:
+            New level reported by amixer, None if not reported
+        """
+        self._run('unmute')
+        return self._run(f'{level}%')
+
+    def get_level(self) -> Optional[int]:
+        """Read the current volume level."""
+        return read_mixer_state(self.amixer_path, self.control)[0]
+
+    def close(self):
+        """Nothing to release."""
+
+
+class AmixerSessionMixer:
+    """Keeps an 'amixer -s' session open and caches level and mute state."""
+
+    name = 'amixer-session'
+
+    def __init__(self, amixer_path: str, control: str = const.MIXER_CONTROL):
+        """
+        Initialize the AmixerSessionMixer.
+
+        Args:
+            amixer_path: Path to the amixer binary
+            control: Mixer control name
+        """
+        self.amixer_path = amixer_path
+        self.control = control
+        self.process: Optional[subprocess.Popen] = None
+        # Partial line of output not yet consumed
+        self._pending = b''
+        self._lock = threading.Lock()
+        self._level: Optional[int] = None
+        self._muted: Optional[bool] = None
+        self._refreshed_at = 0.0
+
+    def _ensure_session(self):
+        """Start the amixer session if it is not running."""
+        if self.process is None or self.process.poll() is not None:
+            # Without -q amixer reports the control after every command, which confirms it
+            self.process = subprocess.Popen(
+                [self.amixer_path, '-s'],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                bufsize=0
+            )
+            self._pending = b''
+            logger.debug(f"amixer session started (pid {self.process.pid})")
+
+    def _refresh(self):
+        """
+        Re-read level and mute state if the cache is older than MIXER_CACHE_TTL.
+
+        Other programs (alsamixer, pulseaudio) may change the volume, so the
+        cache is only trusted for a limited time.
+        """
+        if self._level is None or time.monotonic() - self._refreshed_at > const.MIXER_CACHE_TTL:
+            self._level, self._muted = read_mixer_state(self.amixer_path, self.control)
+            self._refreshed_at = time.monotonic()
+
+    def _send(self, command: str) -> Tuple[Optional[int], Optional[bool]]:
+        """
+        Run a command in the amixer session and wait for its report, restarting the session once if it died.
+
+        The report is also the new cache state, so no 'amixer get' is needed.
+
+        Args:
+            command: amixer command, e.g. 'sset Master 50%'
+
+        Returns:
+            Tuple of (level, muted) reported by amixer
+
+        Raises:
+            RuntimeError: If amixer reported an error or did not answer in time
+        """
+        for attempt in range(2):
+            self._ensure_session()
+            try:
+                self.process.stdin.write(command.encode() + b'\n')
+                break
+            except (BrokenPipeError, OSError):
+                self.process = None
+                if attempt:
+                    raise
+        try:
+            state = parse_mixer_state(self._read_report())
+        except Exception:
+            # The session's output no longer lines up with its commands
+            self.close()
+            raise
+        self._level, self._muted = state
+        self._refreshed_at = time.monotonic()
+        return state
+
+    def _read_report(self) -> List[str]:
+        """
+        Read amixer's report of the control after a command.
+
+        The report lists the playback channels, then one line per channel, so
+        it is complete once every channel's line has arrived.
+
+        Returns:
+            Lines of the report
+
+        Raises:
+            RuntimeError: If amixer wrote an error, exited or did not answer within MIXER_REPLY_TIMEOUT
+        """
+        stdout, stderr = self.process.stdout.fileno(), self.process.stderr.fileno()
+        deadline = time.monotonic() + const.MIXER_REPLY_TIMEOUT
+        lines: List[str] = []
+        channels: Optional[List[str]] = None
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError("no answer from amixer")
+            readable, _, _ = select.select([stdout, stderr], [], [], remaining)
+            if stderr in readable:
+                error = os.read(stderr, 4096).decode(errors='replace').strip()
+                raise RuntimeError(error or "amixer session ended")
+            if stdout not in readable:
+                continue
+            data = os.read(stdout, 4096)
+            if not data:
+                raise RuntimeError("amixer session ended")
+
+            *complete, self._pending = (self._pending + data).split(b'\n')
+            for raw in complete:
+                line = raw.decode(errors='replace')
+                lines.append(line)
+                name, _, value = line.strip().partition(':')
+                if name == 'Playback channels':
+                    channels = [channel.strip() for channel in value.split(' - ')]
+            reported = {line.strip().partition(':')[0] for line in lines if LEVEL_PATTERN.search(line)}
+            if channels is not None and reported.issuperset(channels):
+                return lines
+            if channels is None and reported:
+                # Controls without a channel list report a single level line
+                return lines
+
+    def set_level(self, level: int) -> Optional[int]:
+        """
+        Set the volume to an absolute level, unmuting only if needed.
+
+        Args:
+            level: Volume percentage, 0-100
+
+        Returns:
+            New level reported by amixer
+        """
+        with self._lock:
+            self._refresh()
+            if self._muted is not False:
+                self._send(f'sset {self.control} unmute')
+            if level != self._level:
+                self._send(f'sset {self.control} {level}%')
+            return self._level
+
+    def adjust(self, delta_percent: int) -> Optional[int]:
+        """
+        Change the volume relative to the cached level.
+
+        Args:
+            delta_percent: Percentage points to add, negative to lower the volume
+
+        Returns:
+            New level reported by amixer
+        """
+        with self._lock:
+            self._refresh()
+            current = self._level
+        if current is None:
+            # Level could not be read, let amixer do the arithmetic
+            with self._lock:
+                self._send(f'sset {self.control} unmute')
+                return self._send(f'sset {self.control} {abs(delta_percent)}%{"+" if delta_percent > 0 else "-"}')[0]
+        return self.set_level(max(0, min(100, current + delta_percent)))
+
+    def get_level(self) -> Optional[int]:
+        """Get the cached volume level."""
+        with self._lock:
+            self._refresh()
+            return self._level
+
+    def close(self):
+        """Close the amixer session."""
+        if self.process is not None and self.process.poll() is None:
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=2)
+            except Exception:
+                self.process.kill()
+        if self.process is not None:
+            for pipe in (self.process.stdout, self.process.stderr):
+                pipe.close()
+        self.process = None
+
+
+MIXERS = {
+    'amixer-session': AmixerSessionMixer,
+    'subprocess': SubprocessMixer,
+}
+
+
+def create_mixer(amixer_path: str, name: str = const.MIXER_BACKEND):
+    """
+    Create the configured mixer backend.
+
+    Args:
+        amixer_path: Path to the amixer binary
+        name: 'amixer-session' or 'subprocess'
+
+    Returns:
+        Mixer backend instance
+    """
+    mixer_class = MIXERS.get(name)
+    if mixer_class is None:
+        logger.warning(f"Unknown mixer backend '{name}', using subprocess")
+        mixer_class = SubprocessMixer
+    logger.info(f"Using {mixer_class.name} mixer backend")
+    return mixer_class(amixer_path)
@@ -0,0 +1,281 @@
+"""
+Network monitor.
+Follows link, address and route changes through rtnetlink and keeps the
+connectivity state and the current IP address cached, so callers never probe
+the network themselves. When the connection comes back, listeners are told
+right away, e.g. to reconnect the stream. Falls back to polling where netlink
+is not available.
+"""
+import logging
+import select
+import socket
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import constants as const
+
+logger = logging.getLogger(__name__)
+
+# rtnetlink multicast groups from <linux/rtnetlink.h>
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+RTMGRP_IPV6_IFADDR = 0x100
+NETLINK_GROUPS = RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV4_ROUTE | RTMGRP_IPV6_IFADDR
+
+
+def check_network() -> bool:
+    """
+    Check connectivity with a single TCP connect, without DNS or TLS.
+
+    Returns:
+        True if the probe address could be reached
+    """
+    try:
+        socket.create_connection(const.NETWORK_PROBE_ADDRESS, timeout=const.NETWORK_PROBE_TIMEOUT).close()
+        return True
+    except OSError:
+        return False
+
+
+def get_local_address() -> Optional[str]:
+    """
+    Get the address of the interface used to reach the probe address.
+
+    Connecting a UDP socket only selects a route, no packets are sent.
+
+    Returns:
+        IP address, or None if there is no route
+    """
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect((const.NETWORK_PROBE_ADDRESS[0], 80))
+            return s.getsockname()[0]
+    except OSError:
+        return None
+
+
+def get_default_interface() -> Optional[str]:
+    """
+    Get the interface of the IPv4 default route.
+
+    Returns:
+        Interface name, or None if there is no default route or /proc is not available
+    """
+    try:
+        with open('/proc/net/route') as f:
+            next(f)
+            for line in f:
+                fields = line.split()
+                # Destination 0.0.0.0 with the route-up flag
+                if fields[1] == '00000000' and int(fields[3], 16) & 0x1:
+                    return fields[0]
+    except (OSError, StopIteration, IndexError, ValueError):
+        pass
+    return None
+
+
+def is_link_up(interface: str) -> bool:
+    """
+    Check if an interface has a carrier, e.g. Wi-Fi is still associated.
+
+    Args:
+        interface: Interface name
+
+    Returns:
+        False if the interface reports being down, True otherwise
+    """
+    try:
+        with open(f'/sys/class/net/{interface}/operstate') as f:
+            return f.read().strip() not in ('down', 'dormant', 'lowerlayerdown')
+    except OSError:
+        return True
+
+
+def open_netlink() -> Optional[socket.socket]:
+    """
+    Subscribe to link, address and route changes.
+
+    Returns:
+        Netlink socket, or None if netlink is not available
+    """
+    try:
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+        sock.bind((0, NETLINK_GROUPS))
+        sock.setblocking(False)
+        return sock
+    except (OSError, AttributeError) as e:
+        logger.info(f"Netlink not available, polling the network instead: {e}")
+        return None
+
+
+class NetworkMonitor:
+    """Background thread keeping the connectivity state up to date."""
+
+    def __init__(self, events=None):
+        """
+        Initialize the NetworkMonitor.
+
+        Args:
+            events: EventBroadcaster that receives state changes
+        """
+        self.events = events
+        self.online = False
+        self.ip: Optional[str] = None
+        self.interface: Optional[str] = None
+        self.changes = 0
+        self.mode = 'starting'
+        self._changed_at = time.monotonic()
+        self._online_event = threading.Event()
+        self._listeners: List[Callable[[bool, bool], None]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="network-monitor", daemon=True)
+
+    def start(self):
+        """Start monitoring in the background."""
+        self._thread.start()
+
+    def stop(self):
+        """Stop the monitor thread."""
+        self._stop.set()
+
+    def add_listener(self, callback: Callable[[bool, bool], None]):
+        """
+        Register a function to call when connectivity changes.
+
+        Args:
+            callback: Function taking (online, address_changed), called on the monitor thread
+        """
+        self._listeners.append(callback)
+
+    def wait_online(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until the network is reachable.
+
+        Args:
+            timeout: Maximum seconds to wait, None to wait forever
+
+        Returns:
+            True if the network is reachable
+        """
+        return self._online_event.wait(timeout)
+
+    def get_state(self) -> Dict:
+        """
+        Get the cached connectivity state.
+
+        Returns:
+            Dictionary with online, ip, interface, seconds in the current state, change count and mode
+        """
+        with self._lock:
+            return {
+                'online': self.online,
+                'ip': self.ip,
+                'interface': self.interface,
+                'since_seconds': round(time.monotonic() - self._changed_at, 1),
+                'changes': self.changes,
+                'mode': self.mode,
+            }
+
+    def _run(self):
+        """Monitor loop: re-evaluate on netlink messages, while offline and at a slow interval."""
+        sock = open_netlink()
+        self.mode = 'netlink' if sock is not None else 'polling'
+        changed = True
+        try:
+            while not self._stop.is_set():
+                try:
+                    self._evaluate(probe=changed or not self.online)
+                except Exception as e:
+                    logger.error(f"Network monitor error: {e}")
+
+                if sock is None:
+                    timeout = const.NETWORK_POLL_INTERVAL if self.online else const.NETWORK_CHECK_INTERVAL
+                elif self.online or self.ip is None:
+                    # Notifications cover the changes, the timeout is only a safety net
+                    timeout = const.NETWORK_RECHECK_INTERVAL
+                else:
+                    # A route exists but the probe failed: keep trying
+                    timeout = const.NETWORK_CHECK_INTERVAL
+
+                if sock is None:
+                    self._stop.wait(timeout)
+                    changed = False
+                else:
+                    changed = self._wait_for_change(sock, timeout)
+                    if changed:
+                        # Changes come in bursts, e.g. link up, address, then route
+                        self._wait_for_change(sock, const.NETWORK_SETTLE_TIME, settle=True)
+        finally:
+            if sock is not None:
+                sock.close()
+
+    def _wait_for_change(self, sock: socket.socket, timeout: float, settle: bool = False) -> bool:
+        """
+        Wait for netlink messages and discard them; their content does not matter.
+
+        Args:
+            sock: Netlink socket
+            timeout: Seconds to wait
+            settle: True to keep waiting until no message arrived for `timeout` seconds
+
+        Returns:
+            True if a change was signalled
+        """
+        changed = False
+        while not self._stop.is_set():
+            readable, _, _ = select.select([sock], [], [], timeout)
+            if not readable:
+                return changed
+            try:
+                while sock.recv(65536):
+                    changed = True
+            except BlockingIOError:
+                pass
+            if not settle:
+                return changed
+        return changed
+
+    def _evaluate(self, probe: bool):
+        """
+        Update the cached state and notify listeners if connectivity or address changed.
+
+        Args:
+            probe: True to confirm connectivity with a connect to the probe address;
+                   otherwise only the local address and link state are checked
+        """
+        ip = get_local_address()
+        interface = get_default_interface()
+        if ip is None or (interface is not None and not is_link_up(interface)):
+            online = False
+        elif probe or ip != self.ip:
+            online = check_network()
+        else:
+            online = self.online
+
+        with self._lock:
+            online_changed = online != self.online
+            address_changed = ip != self.ip
+            if not online_changed and not address_changed and interface == self.interface:
+                return
+            self.online, self.ip, self.interface = online, ip, interface
+            if online_changed:
+                self.changes += 1
+                self._changed_at = time.monotonic()
+
+        if online:
+            self._online_event.set()
+            logger.info(f"Network online: {ip} via {interface or 'unknown interface'}")
+        else:
+            self._online_event.clear()
+            logger.warning(f"Network offline{f' (address {ip})' if ip else ''}")
+
+        if self.events is not None:
+            self.events.publish('network', self.get_state())
+        for callback in self._listeners:
+            try:
+                callback(online, address_changed)
+            except Exception as e:
+                logger.error(f"Error in network listener: {e}")
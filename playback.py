@@ -0,0 +1,621 @@
+"""
+Playback backends.
+RadioPlayer talks to the audio decoder through the PlaybackBackend interface.
+MpvBackend keeps a single mpv process alive for the lifetime of the service and
+changes the source over its JSON IPC socket; FfplayBackend starts one ffplay
+process per stream.
+"""
+import json
+import logging
+import os
+import re
+import shutil
+import socket
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import constants as const
+
+logger = logging.getLogger(__name__)
+
+# Patterns for ffplay's stderr output
+FFPLAY_STREAM_PATTERN = re.compile(rb'Stream #\d+:\d+.*?: Audio: (\w+)')
+FFPLAY_BITRATE_PATTERN = re.compile(rb'(\d+) kb/s')
+FFPLAY_AUDIO_QUEUE_PATTERN = re.compile(rb'aq=\s*(\d+)KB')
+
+# mpv properties observed for stream health
+MPV_OBSERVED_PROPERTIES = ('audio-codec-name', 'audio-bitrate', 'demuxer-cache-state', 'paused-for-cache')
+
+
+class StreamHealth:
+    """Live metrics of the stream being decoded, as reported by the backend."""
+
+    def __init__(self):
+        """Initialize the StreamHealth."""
+        self.codec: Optional[str] = None
+        self.bitrate_kbps: Optional[int] = None
+        self.buffer_bytes: Optional[int] = None
+        self.underruns = 0
+        self.playing = False
+        self.updated_at: Optional[float] = None
+
+    def update_buffer(self, buffer_bytes: int):
+        """
+        Record the decoder's buffer fill and count underruns.
+
+        An underrun is counted each time the buffer runs empty after audio has
+        started playing.
+
+        Args:
+            buffer_bytes: Bytes currently buffered by the decoder
+        """
+        if self.playing and buffer_bytes == 0 and self.buffer_bytes:
+            self.underruns += 1
+            logger.debug("Stream buffer underrun")
+        self.buffer_bytes = buffer_bytes
+        self.updated_at = time.time()
+
+    def to_dict(self) -> Dict:
+        """Get the metrics as a dictionary."""
+        return {
+            'codec': self.codec,
+            'bitrate_kbps': self.bitrate_kbps,
+            'buffer_bytes': self.buffer_bytes,
+            'underruns': self.underruns,
+            'playing': self.playing,
+            'updated_at': self.updated_at,
+        }
+
+
+class PlaybackBackend:
+    """Interface for objects that decode and output a stream URL."""
+
+    name = 'none'
+    # True if set_volume() changes the stream volume while it plays
+    can_set_volume = False
+    # Set through set_buffer_size() from the memory budget
+    buffer_bytes = const.BUFFER_MIN_BYTES
+    # True if the decoder keeps its buffer within buffer_bytes
+    limits_buffer = False
+
+    def is_available(self) -> bool:
+        """Check if the backend can be used on this system."""
+        raise NotImplementedError
+
+    def play(self, url: str, on_first_audio: Optional[Callable[[], None]] = None) -> bool:
+        """
+        Start playing a URL, replacing whatever is playing.
+
+        Args:
+            url: Stream URL to play
+            on_first_audio: Called once when audio output has started
+
+        Returns:
+            True if playback was started, False otherwise
+        """
+        raise NotImplementedError
+
+    def pause(self):
+        """Silence the current stream, e.g. while a switch is being prepared."""
+        raise NotImplementedError
+
+    def stop(self):
+        """Stop playback."""
+        raise NotImplementedError
+
+    def set_volume(self, percent: float):
+        """
+        Set the volume of the stream alone, leaving announcements at full volume.
+
+        Ignored by backends that cannot change it while playing (see can_set_volume).
+
+        Args:
+            percent: Stream volume, 100 for unchanged
+        """
+
+    def set_buffer_size(self, buffer_bytes: int):
+        """
+        Limit the memory the decoder uses to buffer the stream.
+
+        Args:
+            buffer_bytes: Maximum bytes buffered ahead of playback
+        """
+        self.buffer_bytes = buffer_bytes
+
+    def is_active(self) -> bool:
+        """Check if a stream has been started and not stopped."""
+        raise NotImplementedError
+
+    def is_alive(self) -> bool:
+        """Check if the decoder is still playing the stream that was started."""
+        raise NotImplementedError
+
+    def get_health(self) -> Dict:
+        """Get live metrics of the current stream."""
+        raise NotImplementedError
+
+    def close(self):
+        """Release all resources held by the backend."""
+        self.stop()
+
+
+class FfplayBackend(PlaybackBackend):
+    """Starts a new ffplay process for every stream."""
+
+    name = 'ffplay'
+
+    def __init__(self):
+        """Initialize the FfplayBackend."""
+        self.process: Optional[subprocess.Popen] = None
+        self.health = StreamHealth()
+
+    def is_available(self) -> bool:
+        """Check if ffplay is installed."""
+        return shutil.which('ffplay') is not None
+
+    def play(self, url: str, on_first_audio: Optional[Callable[[], None]] = None) -> bool:
+        """
+        Start an ffplay process for a URL.
+
+        Args:
+            url: Stream URL to play
+            on_first_audio: Called once when audio output has started
+
+        Returns:
+            True if ffplay was started, False otherwise
+        """
+        self.stop()
+
+        # ffplay's packet queues have fixed limits, only the format probe can be bounded
+        command = [
+            'ffplay',
+            '-autoexit',
+            '-nodisp',
+            '-probesize', str(self.buffer_bytes),
+            '-max_delay', const.FFPLAY_MAX_DELAY,
+            url
+        ]
+
+        try:
+            self.process = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+        except Exception as e:
+            logger.error(f"Failed to start ffplay: {e}")
+            self.process = None
+            return False
+
+        self.health = StreamHealth()
+        threading.Thread(
+            target=self._watch_stderr,
+            args=(self.process, self.health, on_first_audio),
+            daemon=True
+        ).start()
+        threading.Thread(
+            target=self._drain,
+            args=(self.process.stdout,),
+            daemon=True
+        ).start()
+        return True
+
+    @staticmethod
+    def _drain(pipe):
+        """
+        Read and discard a pipe until it is closed so ffplay never blocks on it.
+
+        Args:
+            pipe: Pipe to drain
+        """
+        try:
+            for _ in iter(lambda: pipe.read1(4096), b''):
+                pass
+        except Exception:
+            pass
+
+    def _watch_stderr(self, process: subprocess.Popen, health: StreamHealth,
+                      on_first_audio: Optional[Callable[[], None]]):
+        """
+        Drain ffplay's stderr and parse it into stream health metrics.
+
+        The stream header gives codec and bitrate. ffplay then prints a status
+        line with the master clock, which is 'nan' until audio output has
+        started, and the audio queue size (aq) used as buffer fill.
+
+        Args:
+            process: ffplay process to watch
+            health: Metrics object to update
+            on_first_audio: Called once when audio output has started
+        """
+        pending = b''
+        try:
+            for data in iter(lambda: process.stderr.read1(4096), b''):
+                pending += data
+                *lines, pending = pending.replace(b'\r', b'\n').split(b'\n')
+                for line in lines:
+                    self._parse_line(line, health)
+                    if health.playing and on_first_audio is not None:
+                        if process is self.process:
+                            on_first_audio()
+                        on_first_audio = None
+        except Exception as e:
+            logger.debug(f"Stopped reading ffplay output: {e}")
+        finally:
+            health.playing = False
+
+    @staticmethod
+    def _parse_line(line: bytes, health: StreamHealth):
+        """
+        Update stream health from a single line of ffplay output.
+
+        Args:
+            line: Line of stderr output
+            health: Metrics object to update
+        """
+        fields = line.split()
+        if len(fields) > 1 and fields[1] == b'M-A:':
+            try:
+                health.playing = health.playing or float(fields[0]) > 0
+            except ValueError:
+                pass
+            match = FFPLAY_AUDIO_QUEUE_PATTERN.search(line)
+            if match:
+                health.update_buffer(int(match.group(1)) * 1024)
+            return
+
+        match = FFPLAY_STREAM_PATTERN.search(line)
+        if match:
+            health.codec = match.group(1).decode()
+        if match or b'Duration:' in line:
+            bitrate = FFPLAY_BITRATE_PATTERN.search(line)
+            if bitrate:
+                health.bitrate_kbps = int(bitrate.group(1))
+
+    def pause(self):
+        """ffplay cannot be paused from outside, so the process is stopped."""
+        self.stop()
+
+    def stop(self):
+        """Terminate the ffplay process if running."""
+        if self.process is not None:
+            try:
+                self.process.terminate()
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                logger.warning("Stream didn't stop gracefully, killing...")
+                self.process.kill()
+            except Exception as e:
+                logger.error(f"Error stopping stream: {e}")
+            finally:
+                self.process = None
+
+    def is_active(self) -> bool:
+        """Check if an ffplay process has been started."""
+        return self.process is not None
+
+    def is_alive(self) -> bool:
+        """Check if the ffplay process is still running (it exits at end of stream)."""
+        return self.process is not None and self.process.poll() is None
+
+    def get_health(self) -> Dict:
+        """Get metrics parsed from ffplay's output."""
+        return self.health.to_dict()
+
+
+class MpvBackend(PlaybackBackend):
+    """Keeps one mpv process running and switches streams over JSON IPC."""
+
+    name = 'mpv'
+    can_set_volume = True
+    limits_buffer = True
+
+    def __init__(self, socket_path: str = const.MPV_SOCKET_PATH):
+        """
+        Initialize the MpvBackend.
+
+        Args:
+            socket_path: Path of the mpv IPC socket
+        """
+        self.socket_path = socket_path
+        self.process: Optional[subprocess.Popen] = None
+        self._sock: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+        self._request_id = 0
+        self._pending: Dict[int, list] = {}
+        self._active = False
+        self._on_first_audio: Optional[Callable[[], None]] = None
+        self._ended = False
+        self._volume = 100.0
+        self.health = StreamHealth()
+
+    def is_available(self) -> bool:
+        """Check if mpv is installed."""
+        return shutil.which('mpv') is not None
+
+    def _start_process(self) -> bool:
+        """
+        Start the mpv process and connect to its IPC socket.
+
+        Returns:
+            True if mpv is running and connected, False otherwise
+        """
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        command = [
+            'mpv',
+            '--idle=yes',
+            '--no-video',
+            '--no-terminal',
+            '--cache=yes',
+            f'--demuxer-max-bytes={self.buffer_bytes}',
+            # Rewinding is done by the relay's time-shift buffer, not by mpv
+            '--demuxer-max-back-bytes=0',
+            f'--network-timeout={const.MPV_NETWORK_TIMEOUT}',
+            # A restarted engine keeps the ducked level
+            f'--volume={self._volume:g}',
+            f'--input-ipc-server={self.socket_path}'
+        ]
+
+        try:
+            self.process = subprocess.Popen(
+                command,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+        except Exception as e:
+            logger.error(f"Failed to start mpv: {e}")
+            self.process = None
+            return False
+
+        # Wait for mpv to create its IPC socket
+        deadline = time.monotonic() + const.MPV_STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            try:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.connect(self.socket_path)
+                break
+            except OSError:
+                sock.close()
+                time.sleep(0.05)
+        else:
+            logger.error("mpv IPC socket did not come up")
+            self.process.kill()
+            self.process = None
+            return False
+
+        self._sock = sock
+        threading.Thread(target=self._read_events, args=(sock,), daemon=True).start()
+        for observe_id, name in enumerate(MPV_OBSERVED_PROPERTIES, start=1):
+            self.command('observe_property', observe_id, name)
+        logger.info(f"mpv playback engine started (pid {self.process.pid})")
+        return True
+
+    def _ensure_running(self) -> bool:
+        """
+        Make sure the mpv process is alive, restarting it if it died.
+
+        Returns:
+            True if mpv is running and connected, False otherwise
+        """
+        if self.process is not None and self.process.poll() is None and self._sock is not None:
+            return True
+        if self.process is not None:
+            logger.warning("mpv playback engine exited, restarting")
+        self._active = False
+        return self._start_process()
+
+    def command(self, *args, timeout: float = 2.0) -> Optional[Dict]:
+        """
+        Send a command to mpv and wait for its reply.
+
+        Args:
+            *args: Command name and arguments, e.g. ('loadfile', url, 'replace')
+            timeout: Seconds to wait for the reply
+
+        Returns:
+            Reply message from mpv, or None if it could not be delivered
+        """
+        with self._lock:
+            if self._sock is None:
+                return None
+            self._request_id += 1
+            request_id = self._request_id
+            waiter = [threading.Event(), None]
+            self._pending[request_id] = waiter
+            message = json.dumps({'command': list(args), 'request_id': request_id}) + '\n'
+            try:
+                self._sock.sendall(message.encode())
+            except OSError as e:
+                logger.error(f"mpv IPC error: {e}")
+                self._pending.pop(request_id, None)
+                self._sock = None
+                return None
+
+        waiter[0].wait(timeout)
+        with self._lock:
+            self._pending.pop(request_id, None)
+        reply = waiter[1]
+        if reply is not None and reply.get('error') != 'success':
+            logger.warning(f"mpv command {args[0]} failed: {reply.get('error')}")
+        return reply
+
+    def _read_events(self, sock: socket.socket):
+        """
+        Read replies and events from the mpv IPC socket.
+
+        Args:
+            sock: Connected IPC socket
+        """
+        pending = b''
+        try:
+            for data in iter(lambda: sock.recv(4096), b''):
+                pending += data
+                *lines, pending = pending.split(b'\n')
+                for line in lines:
+                    if line:
+                        self._handle_message(json.loads(line))
+        except Exception as e:
+            logger.debug(f"mpv IPC reader stopped: {e}")
+        finally:
+            with self._lock:
+                if self._sock is sock:
+                    self._sock = None
+                for waiter in self._pending.values():
+                    waiter[0].set()
+
+    def _handle_message(self, message: Dict):
+        """
+        Dispatch a single message received from mpv.
+
+        Args:
+            message: Decoded JSON message
+        """
+        if 'request_id' in message:
+            with self._lock:
+                waiter = self._pending.get(message['request_id'])
+            if waiter is not None:
+                waiter[1] = message
+                waiter[0].set()
+        elif message.get('event') == 'property-change':
+            self._update_health(message.get('name'), message.get('data'))
+        elif message.get('event') == 'playback-restart':
+            self.health.playing = True
+            callback, self._on_first_audio = self._on_first_audio, None
+            if callback is not None:
+                callback()
+        elif message.get('event') == 'end-file' and message.get('reason') in ('eof', 'error'):
+            if message.get('reason') == 'error':
+                logger.warning(f"mpv could not play stream: {message.get('file_error', 'unknown error')}")
+            self._ended = True
+            self.health.playing = False
+
+    def play(self, url: str, on_first_audio: Optional[Callable[[], None]] = None) -> bool:
+        """
+        Load a URL into the running mpv process.
+
+        Args:
+            url: Stream URL to play
+            on_first_audio: Called once when audio output has started
+
+        Returns:
+            True if mpv accepted the stream, False otherwise
+        """
+        if not self._ensure_running():
+            return False
+
+        self._on_first_audio = on_first_audio
+        self._ended = False
+        self.health = StreamHealth()
+        reply = self.command('loadfile', url, 'replace')
+        self._active = reply is not None and reply.get('error') == 'success'
+        if self._active:
+            self.command('set_property', 'pause', False)
+        return self._active
+
+    def pause(self):
+        """Pause output while keeping the audio device open."""
+        if self._active:
+            self.command('set_property', 'pause', True)
+
+    def set_volume(self, percent: float):
+        """Set mpv's own volume, which only affects the stream."""
+        self._volume = percent
+        if self._sock is not None:
+            self.command('set_property', 'volume', round(percent, 1))
+
+    def set_buffer_size(self, buffer_bytes: int):
+        """Limit mpv's demuxer cache, also while it is running."""
+        if buffer_bytes == self.buffer_bytes:
+            return
+        self.buffer_bytes = buffer_bytes
+        if self._sock is not None:
+            self.command('set_property', 'demuxer-max-bytes', str(buffer_bytes))
+
+    def stop(self):
+        """Stop playback but keep mpv running."""
+        if self._active:
+            self._active = False
+            self._on_first_audio = None
+            self.command('stop')
+
+    def is_active(self) -> bool:
+        """Check if a stream has been loaded and not stopped."""
+        return self._active
+
+    def _update_health(self, name: Optional[str], value):
+        """
+        Update stream health from an observed mpv property.
+
+        Args:
+            name: Property name
+            value: New property value, None if unavailable
+        """
+        health = self.health
+        if name == 'audio-codec-name':
+            health.codec = value
+        elif name == 'audio-bitrate' and value:
+            health.bitrate_kbps = int(value) // 1000
+        elif name == 'demuxer-cache-state' and isinstance(value, dict):
+            # Underruns are reported separately through paused-for-cache
+            health.buffer_bytes = int(value.get('fw-bytes', 0))
+            health.updated_at = time.time()
+        elif name == 'paused-for-cache' and value:
+            health.underruns += 1
+            logger.debug("Stream buffer underrun")
+
+    def is_alive(self) -> bool:
+        """Check if mpv is running and has not reached the end of the stream."""
+        return (self._active and not self._ended
+                and self.process is not None and self.process.poll() is None)
+
+    def get_health(self) -> Dict:
+        """Get metrics from the observed mpv properties."""
+        return self.health.to_dict()
+
+    def close(self):
+        """Quit the mpv process."""
+        self.stop()
+        if self.process is not None:
+            self.command('quit', timeout=1.0)
+            try:
+                self.process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.process = None
+
+
+BACKENDS = {
+    'mpv': MpvBackend,
+    'ffplay': FfplayBackend,
+}
+
+
+def create_backend(name: str = const.PLAYBACK_BACKEND) -> Optional[PlaybackBackend]:
+    """
+    Create the configured playback backend, falling back to any available one.
+
+    Args:
+        name: Preferred backend name ('mpv' or 'ffplay')
+
+    Returns:
+        PlaybackBackend instance, or None if no decoder is installed
+    """
+    preferred = BACKENDS.get(name)
+    if preferred is None:
+        logger.warning(f"Unknown playback backend '{name}'")
+    candidates = ([preferred] if preferred else []) + [cls for cls in BACKENDS.values() if cls is not preferred]
+
+    for backend_class in candidates:
+        backend = backend_class()
+        if backend.is_available():
+            if backend_class is not preferred:
+                logger.warning(f"Playback backend '{name}' not available, using {backend.name}")
+            logger.info(f"Using {backend.name} playback backend")
+            return backend
+
+    logger.error("No playback backend found! Install mpv or ffmpeg to play audio.")
+    return None
@@ -0,0 +1,292 @@
+"""
+Concurrent station prober.
+Checks every station from StationManager at once, with bounded parallelism,
+instead of playing them one by one like test_streams.sh. Each probe follows
+redirects and playlists, reads the ICY headers and a few seconds of audio,
+and reports connect time, time to first byte, content type, declared bitrate
+and sustained throughput. Exits with 1 if any station failed, for cron.
+
+Usage: python probe_stations.py [--concurrency N] [--duration S]
+                                [--format json|csv] [--output FILE] [--strict]
+"""
+import argparse
+import asyncio
+import csv
+import json
+import re
+import ssl
+import sys
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+import constants as const
+from relay import PLAYLIST_CONTENT_TYPES, PLAYLIST_EXTENSIONS, extract_playlist_url
+from stations import StationManager
+
+MAX_HOPS = 5  # redirects and playlists followed per station
+HEADER_LIMIT = 64 * 1024
+MIN_AUDIO_BYTES = 4096  # a stream that delivers less than this counts as failed
+BURST_SECONDS = 1.0  # data in the first second after the first byte is left out of the sustained throughput
+AUDIO_INFO_BITRATE = re.compile(r'(?:ice-)?bitrate=(\d+)', re.IGNORECASE)
+
+FIELDS = ['station', 'ok', 'error', 'url', 'final_url', 'status', 'hops', 'connect_ms', 'ttfb_ms',
+          'content_type', 'icy_name', 'declared_kbps', 'throughput_kbps', 'sustaining', 'bytes']
+
+
+async def open_url(url: str, timeout: float) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter, float, float]:
+    """
+    Connect and send a GET request.
+
+    Args:
+        url: http(s) URL
+        timeout: Connect timeout in seconds
+
+    Returns:
+        Tuple of (reader, writer, connect seconds, time the request was sent)
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        raise ValueError(f"unsupported scheme {parts.scheme}")
+    secure = parts.scheme == 'https'
+    port = parts.port or (443 if secure else 80)
+
+    started_at = time.monotonic()
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname, port, ssl=ssl.create_default_context() if secure else None,
+                                server_hostname=parts.hostname if secure else None),
+        timeout)
+    connect_seconds = time.monotonic() - started_at
+
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    host = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+    writer.write(f"GET {path} HTTP/1.0\r\nHost: {host}\r\nUser-Agent: {const.RELAY_USER_AGENT}\r\n"
+                 f"Icy-MetaData: 1\r\nAccept: */*\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    return reader, writer, connect_seconds, time.monotonic()
+
+
+async def read_headers(reader: asyncio.StreamReader, timeout: float) -> Tuple[int, Dict[str, str]]:
+    """
+    Read the status line and headers, accepting Shoutcast's 'ICY 200 OK'.
+
+    Args:
+        reader: Stream to read from
+        timeout: Seconds to wait for the complete header block
+
+    Returns:
+        Tuple of (status code, lower-cased headers)
+    """
+    block = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout)
+    if len(block) > HEADER_LIMIT:
+        raise ValueError("response headers too large")
+    lines = block.decode('latin-1').split('\r\n')
+    status_parts = lines[0].split(None, 2)
+    if len(status_parts) < 2 or not status_parts[1].isdigit():
+        raise ValueError(f"invalid status line {lines[0]!r}")
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    return int(status_parts[1]), headers
+
+
+def declared_bitrate(headers: Dict[str, str]) -> Optional[int]:
+    """
+    Get the bitrate a stream declares in its ICY or Icecast headers.
+
+    Args:
+        headers: Lower-cased response headers
+
+    Returns:
+        Bitrate in kbps, or None if not declared
+    """
+    value = headers.get('icy-br', '').split(',')[0].strip()
+    if value.isdigit():
+        return int(value)
+    match = AUDIO_INFO_BITRATE.search(headers.get('ice-audio-info', ''))
+    return int(match.group(1)) if match else None
+
+
+async def probe(station: str, url: str, timeout: float, duration: float) -> Dict:
+    """
+    Probe one station.
+
+    Args:
+        station: Station name
+        url: Station URL
+        timeout: Connect and first-byte timeout in seconds
+        duration: Seconds of audio to read
+
+    Returns:
+        Result row with the keys in FIELDS
+    """
+    result = {field: None for field in FIELDS}
+    result.update(station=station, url=url, ok=False, hops=0, bytes=0)
+    writer = None
+    try:
+        current = url
+        while True:
+            reader, writer, connect_seconds, sent_at = await open_url(current, timeout)
+            status, headers = await read_headers(reader, timeout)
+            content_type = headers.get('content-type', '').split(';')[0].strip().lower()
+            result.update(final_url=current, status=status, connect_ms=round(connect_seconds * 1000, 1),
+                          content_type=content_type or None)
+
+            if 300 <= status < 400 and 'location' in headers:
+                target = urljoin(current, headers['location'])
+            elif status == 200 and (content_type in PLAYLIST_CONTENT_TYPES
+                                    or urlsplit(current).path.lower().endswith(PLAYLIST_EXTENSIONS)):
+                text = (await asyncio.wait_for(reader.read(HEADER_LIMIT), timeout)).decode('utf-8', errors='replace')
+                if '#EXT-X-' in text:
+                    raise ValueError("HLS playlist, not supported by the relay")
+                target = extract_playlist_url(text)
+                if target is None:
+                    raise ValueError("playlist without stream URL")
+            else:
+                break
+
+            writer.close()
+            writer = None
+            result['hops'] += 1
+            if result['hops'] > MAX_HOPS:
+                raise ValueError("too many redirects or playlists")
+            current = target
+
+        if status != 200:
+            raise ValueError(f"HTTP {status}")
+        result.update(icy_name=headers.get('icy-name'), declared_kbps=declared_bitrate(headers))
+
+        first = await asyncio.wait_for(reader.read(const.RELAY_READ_SIZE), timeout)
+        if not first:
+            raise ValueError("no audio data")
+        first_byte_at = time.monotonic()
+        result['ttfb_ms'] = round((first_byte_at - sent_at) * 1000, 1)
+
+        received = len(first)
+        mark_at, mark_bytes = first_byte_at, received
+        last_data_at = first_byte_at
+        deadline = first_byte_at + duration
+        while time.monotonic() < deadline:
+            try:
+                data = await asyncio.wait_for(reader.read(const.RELAY_READ_SIZE), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+            if not data:
+                break
+            received += len(data)
+            last_data_at = time.monotonic()
+            if mark_at == first_byte_at and last_data_at - first_byte_at >= BURST_SECONDS:
+                # Measure from here so the server's initial burst does not inflate the result
+                mark_at, mark_bytes = last_data_at, received
+
+        # Up to the last chunk, so a partly received chunk at the deadline does not skew the rate
+        elapsed = last_data_at - mark_at
+        result['bytes'] = received
+        if elapsed > 0:
+            result['throughput_kbps'] = round((received - mark_bytes) * 8 / 1000 / elapsed, 1)
+        if result['declared_kbps'] and result['throughput_kbps'] is not None:
+            result['sustaining'] = result['throughput_kbps'] >= result['declared_kbps'] * 0.95
+        if received < MIN_AUDIO_BYTES:
+            raise ValueError(f"only {received} bytes received")
+        result['ok'] = True
+    except asyncio.TimeoutError:
+        result['error'] = "timeout"
+    except Exception as e:
+        result['error'] = str(e) or type(e).__name__
+    finally:
+        if writer is not None:
+            writer.close()
+    return result
+
+
+async def probe_all(stations: Dict[str, str], concurrency: int, timeout: float, duration: float) -> list:
+    """
+    Probe all stations with at most `concurrency` probes at a time.
+
+    Args:
+        stations: Mapping of station name to URL
+        concurrency: Maximum number of simultaneous probes
+        timeout: Connect and first-byte timeout in seconds
+        duration: Seconds of audio to read per station
+
+    Returns:
+        Result rows in station order
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(station, url):
+        async with semaphore:
+            result = await probe(station, url, timeout, duration)
+            mark = 'ok ' if result['ok'] else 'FAIL'
+            print(f"{mark} {station:<32} {result['ttfb_ms'] or '-':>8} ms  "
+                  f"{result['throughput_kbps'] or '-':>7} kbps  {result['error'] or ''}", file=sys.stderr)
+            return result
+
+    return await asyncio.gather(*(limited(station, url) for station, url in stations.items()))
+
+
+def write_results(results: list, output_format: str, output):
+    """
+    Write result rows as JSON or CSV.
+
+    Args:
+        results: Result rows
+        output_format: 'json' or 'csv'
+        output: File object to write to
+    """
+    if output_format == 'csv':
+        writer = csv.DictWriter(output, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+    else:
+        json.dump(results, output, indent=2)
+        output.write('\n')
+
+
+def main():
+    """Probe all stations and write a report."""
+    parser = argparse.ArgumentParser(description="Probe all radio stations concurrently")
+    parser.add_argument('--base-dir', help="directory with the station files (default: this directory)")
+    parser.add_argument('--station', action='append', help="probe only this station (repeatable)")
+    parser.add_argument('--concurrency', type=int, default=32, help="simultaneous probes (default: 32)")
+    parser.add_argument('--timeout', type=float, default=const.RELAY_CONNECT_TIMEOUT,
+                        help=f"connect and first-byte timeout in seconds (default: {const.RELAY_CONNECT_TIMEOUT})")
+    parser.add_argument('--duration', type=float, default=3.0, help="seconds of audio to read (default: 3)")
+    parser.add_argument('--format', choices=('json', 'csv'), default='json', help="report format (default: json)")
+    parser.add_argument('--output', help="report file (default: stdout)")
+    parser.add_argument('--strict', action='store_true',
+                        help="also fail stations that deliver less than their declared bitrate")
+    args = parser.parse_args()
+
+    stations = StationManager(args.base_dir).get_stations()
+    if args.station:
+        stations = {name: url for name, url in stations.items() if name in args.station}
+    if not stations:
+        print("No stations to probe", file=sys.stderr)
+        return 2
+
+    started_at = time.monotonic()
+    results = asyncio.run(probe_all(stations, args.concurrency, args.timeout, args.duration))
+    if args.strict:
+        for result in results:
+            if result['ok'] and result['sustaining'] is False:
+                result['ok'] = False
+                result['error'] = "throughput below declared bitrate"
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            write_results(results, args.format, f)
+    else:
+        write_results(results, args.format, sys.stdout)
+
+    failed = sum(1 for result in results if not result['ok'])
+    print(f"{len(results) - failed} ok, {failed} failed, {time.monotonic() - started_at:.1f}s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,621 @@
+"""
+Local stream relay.
+Keeps upstream radio connections open and buffered in memory, and serves them
+to the decoder over a loopback HTTP server so a switch can start from an
+already connected and filled stream.
+"""
+import collections
+import logging
+import re
+import threading
+import time
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, unquote, urlparse, urlsplit
+
+import constants as const
+
+logger = logging.getLogger(__name__)
+
+PLAYLIST_CONTENT_TYPES = ('audio/x-mpegurl', 'audio/mpegurl', 'audio/x-scpls', 'application/pls+xml')
+PLAYLIST_EXTENSIONS = ('.m3u', '.pls')
+ICY_TITLE_PATTERN = re.compile(rb"StreamTitle='(.*?)';", re.DOTALL)
+
+
+def extract_playlist_url(text: str) -> Optional[str]:
+    """
+    Get the first stream URL from an M3U or PLS playlist.
+
+    Args:
+        text: Playlist contents
+
+    Returns:
+        First http(s) URL in the playlist, or None if there is none
+    """
+    for line in text.splitlines():
+        line = line.strip()
+        if line.lower().startswith('file') and '=' in line:
+            # PLS format: File1=http://...
+            line = line.split('=', 1)[1].strip()
+        if line.startswith(('http://', 'https://')):
+            return line
+    return None
+
+
+def parse_icy_title(block: bytes) -> Optional[str]:
+    """
+    Get the stream title from an ICY metadata block.
+
+    Args:
+        block: Metadata without the length byte, e.g. b"StreamTitle='Artist - Track';" padded with zeros
+
+    Returns:
+        Title, or None if the block has no title or an empty one
+    """
+    match = ICY_TITLE_PATTERN.search(block)
+    if match is None:
+        return None
+    raw = match.group(1)
+    try:
+        title = raw.decode('utf-8')
+    except UnicodeDecodeError:
+        # Older servers send Latin-1
+        title = raw.decode('latin-1')
+    return title.strip() or None
+
+
+class BufferedStream:
+    """A single upstream connection buffered into a bounded in-memory window."""
+
+    def __init__(self, station_name: str, url: str, max_bytes: int = const.WARM_BUFFER_BYTES,
+                 opener: Optional[urllib.request.OpenerDirector] = None,
+                 on_title: Optional[Callable[[str, str], None]] = None):
+        """
+        Initialize the BufferedStream.
+
+        Args:
+            station_name: Name of the station this stream belongs to
+            url: Upstream stream URL
+            max_bytes: Maximum number of bytes kept in memory
+            opener: urllib opener for the upstream connection, e.g. one using cached host addresses
+            on_title: Called with the station name and title when the ICY title changes
+        """
+        self.station_name = station_name
+        self.url = url
+        self.max_bytes = max_bytes
+        self.opener = opener
+        self.on_title = on_title
+        self.content_type = 'application/octet-stream'
+        # From the icy-br header, None if the server does not announce it
+        self.bitrate_kbps: Optional[int] = None
+        # Seconds of audio kept instead of max_bytes, for time-shifting the playing station
+        self.window_seconds: Optional[float] = None
+        # Upper limit of that window in bytes, from the memory budget
+        self.window_limit: Optional[int] = None
+        self.created_at = time.monotonic()
+        self.first_byte_at: Optional[float] = None
+        self.bytes_received = 0
+        self.error: Optional[str] = None
+        # Audio bytes between ICY metadata blocks, None if the server sends no metadata
+        self.metaint: Optional[int] = None
+        # (offset, title) of recent title changes, so time-shifted playback shows its own title
+        self._titles = collections.deque(maxlen=const.ICY_TITLE_HISTORY)
+
+        # Absolute byte offsets of the retained window
+        self._chunks = collections.deque()
+        self._start_offset = 0
+        self._end_offset = 0
+        self._finished = False
+        self._closed = False
+        self._response = None
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=f"relay-{station_name}", daemon=True)
+
+    def start(self):
+        """Start receiving the stream in the background."""
+        self._thread.start()
+
+    def _open(self, url: str, hops: int = 3):
+        """
+        Open the upstream connection, following playlist indirection.
+
+        Args:
+            url: URL to open
+            hops: Maximum number of playlists to follow
+
+        Returns:
+            Open HTTP response for the media stream
+        """
+        headers = {'User-Agent': const.RELAY_USER_AGENT}
+        if const.ICY_METADATA_ENABLED:
+            # Titles come interleaved with the audio, so no second connection is needed for them
+            headers['Icy-MetaData'] = '1'
+        request = urllib.request.Request(url, headers=headers)
+        urlopen = self.opener.open if self.opener is not None else urllib.request.urlopen
+        response = urlopen(request, timeout=const.RELAY_CONNECT_TIMEOUT)
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        path = urlparse(response.geturl()).path.lower()
+
+        if content_type in PLAYLIST_CONTENT_TYPES or path.endswith(PLAYLIST_EXTENSIONS):
+            text = response.read(64 * 1024).decode('utf-8', errors='replace')
+            response.close()
+            target = extract_playlist_url(text)
+            if target is None or hops <= 0 or '#EXT-X-' in text:
+                raise ValueError(f"Unsupported playlist at {url}")
+            logger.debug(f"Following playlist for {self.station_name}: {target}")
+            return self._open(target, hops - 1)
+
+        return response
+
+    def _run(self):
+        """Receive loop running on the stream thread."""
+        try:
+            response = self._open(self.url)
+            with self._cond:
+                if self._closed:
+                    response.close()
+                    return
+                self._response = response
+            self.content_type = response.headers.get('Content-Type', self.content_type)
+            bitrate = response.headers.get('icy-br', '').split(',')[0].strip()
+            if bitrate.isdigit() and int(bitrate) > 0:
+                self.bitrate_kbps = int(bitrate)
+            metaint = response.headers.get('icy-metaint', '').strip()
+            if const.ICY_METADATA_ENABLED and metaint.isdigit() and int(metaint) > 0:
+                self.metaint = int(metaint)
+
+            # Reads stop at each metadata block, so audio chunks are buffered as read, without copying
+            until_metadata = self.metaint
+            while not self._closed:
+                data = response.read1(min(const.RELAY_READ_SIZE, until_metadata) if until_metadata
+                                      else const.RELAY_READ_SIZE)
+                if not data:
+                    break
+                self._append(data)
+                if until_metadata:
+                    until_metadata -= len(data)
+                    if until_metadata == 0:
+                        self._read_metadata(response)
+                        until_metadata = self.metaint
+        except Exception as e:
+            if not self._closed:
+                self.error = str(e)
+                logger.warning(f"Relay stream for {self.station_name} failed: {e}")
+        finally:
+            with self._cond:
+                self._finished = True
+                self._cond.notify_all()
+
+    def _append(self, data: bytes):
+        """
+        Add received data to the window, dropping the oldest data when full.
+
+        Args:
+            data: Bytes received from upstream
+        """
+        with self._cond:
+            if self.first_byte_at is None:
+                self.first_byte_at = time.monotonic()
+            self._chunks.append(data)
+            self._end_offset += len(data)
+            self.bytes_received += len(data)
+
+            self._trim()
+            self._cond.notify_all()
+
+    def _read_metadata(self, response):
+        """
+        Read the ICY metadata block following metaint bytes of audio and record a new title.
+
+        Args:
+            response: Upstream HTTP response positioned at the length byte
+        """
+        length = response.read(1)
+        if not length or not length[0]:
+            # Most blocks are empty: the title is only sent when it changes
+            return
+        block = response.read(length[0] * 16)
+        title = parse_icy_title(block)
+        if title is None or title == self.title:
+            return
+        with self._cond:
+            self._titles.append((self._end_offset, title))
+        logger.debug(f"Now playing on {self.station_name}: {title}")
+        if self.on_title is not None:
+            self.on_title(self.station_name, title)
+
+    @property
+    def title(self) -> Optional[str]:
+        """Latest ICY title received, None if the server sent none."""
+        titles = self._titles
+        return titles[-1][1] if titles else None
+
+    def title_at(self, offset: int) -> Optional[str]:
+        """
+        Get the title of the track playing at a position, for time-shifted playback.
+
+        Args:
+            offset: Absolute offset in the stream
+
+        Returns:
+            Last title received before the offset, the oldest one known if none was
+        """
+        with self._cond:
+            titles = list(self._titles)
+        for title_offset, title in reversed(titles):
+            if title_offset <= offset:
+                return title
+        return titles[0][1] if titles else None
+
+    def _trim(self):
+        """Drop the oldest data beyond the window size. Caller holds the lock."""
+        limit = self.window_bytes
+        while self._end_offset - self._start_offset > limit and len(self._chunks) > 1:
+            dropped = self._chunks.popleft()
+            self._start_offset += len(dropped)
+
+    @property
+    def window_bytes(self) -> int:
+        """Maximum number of bytes kept in memory."""
+        if self.window_seconds is None:
+            return self.max_bytes
+        window = int(self.window_seconds * self.bytes_per_second)
+        if self.window_limit is not None:
+            window = min(window, self.window_limit)
+        return max(window, self.max_bytes)
+
+    @property
+    def bytes_per_second(self) -> float:
+        """Data rate of the stream, assuming TIMESHIFT_DEFAULT_KBPS if the server does not announce it."""
+        return (self.bitrate_kbps or const.TIMESHIFT_DEFAULT_KBPS) * 1000 / 8
+
+    def set_window(self, seconds: Optional[float], limit: Optional[int] = None, max_bytes: Optional[int] = None):
+        """
+        Keep a number of seconds of audio instead of max_bytes, or go back to max_bytes.
+
+        Args:
+            seconds: Seconds of audio to keep, None for max_bytes
+            limit: Upper limit of the window in bytes, None for no limit
+            max_bytes: New size of the default window, None to keep it
+        """
+        with self._cond:
+            self.window_seconds = seconds
+            self.window_limit = limit
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            self._trim()
+
+    def seconds_behind(self, offset: int) -> float:
+        """
+        Get how far a position is behind the newest received data.
+
+        Args:
+            offset: Absolute offset
+
+        Returns:
+            Seconds of audio between the offset and live
+        """
+        return max(self._end_offset - max(offset, self._start_offset), 0) / self.bytes_per_second
+
+    def read(self, offset: int, timeout: float = 1.0, limit: int = 256 * 1024) -> Tuple[int, bytes]:
+        """
+        Read buffered data starting at an absolute offset.
+
+        Readers that fell behind the window skip ahead to the oldest retained byte.
+
+        Args:
+            offset: Absolute offset to read from
+            timeout: Seconds to wait for new data
+            limit: Stop collecting chunks once this many bytes are read, e.g. far behind live
+
+        Returns:
+            Tuple of (next offset, data). Data is empty on timeout or end of stream.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._end_offset > max(offset, self._start_offset) or self._finished,
+                                timeout)
+            offset = max(offset, self._start_offset)
+            if self._end_offset <= offset:
+                return offset, b''
+
+            parts = []
+            size = 0
+            position = self._start_offset
+            for chunk in self._chunks:
+                chunk_end = position + len(chunk)
+                if chunk_end > offset:
+                    part = chunk[offset - position:] if position < offset else chunk
+                    parts.append(part)
+                    size += len(part)
+                    if size >= limit:
+                        break
+                position = chunk_end
+
+            data = b''.join(parts)
+            return offset + len(data), data
+
+    def wait_for_data(self, timeout: float) -> bool:
+        """
+        Wait until the first byte arrives or the stream ends.
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            True if data is available, False otherwise
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._end_offset > 0 or self._finished, timeout)
+            return self._end_offset > 0
+
+    def burst_offset(self) -> int:
+        """Get the offset a newly attached decoder should start reading from."""
+        with self._cond:
+            return max(self._start_offset, self._end_offset - const.WARM_BURST_BYTES)
+
+    @property
+    def start_offset(self) -> int:
+        """Offset of the oldest retained byte."""
+        return self._start_offset
+
+    @property
+    def live_offset(self) -> int:
+        """Offset just past the newest received byte."""
+        return self._end_offset
+
+    @property
+    def buffered_bytes(self) -> int:
+        """Number of bytes currently held in memory."""
+        return self._end_offset - self._start_offset
+
+    @property
+    def finished(self) -> bool:
+        """True once the upstream connection has ended."""
+        return self._finished
+
+    def is_healthy(self) -> bool:
+        """Check if the stream is still connected and has not failed."""
+        return not self._finished and self.error is None
+
+    def close(self):
+        """Close the upstream connection and wake up any readers."""
+        with self._cond:
+            self._closed = True
+            response = self._response
+            self._cond.notify_all()
+        if response is not None:
+            try:
+                response.close()
+            except Exception:
+                pass
+
+
+class StreamRelay:
+    """Pool of buffered upstream streams served to the decoder over loopback HTTP."""
+
+    def __init__(self, max_streams: int = 2 * const.WARM_NEIGHBOUR_COUNT + 1,
+                 opener: Optional[urllib.request.OpenerDirector] = None, max_bytes: int = const.WARM_BUFFER_BYTES):
+        """
+        Initialize the StreamRelay.
+
+        Args:
+            max_streams: Maximum number of upstream connections kept open
+            opener: urllib opener for upstream connections, None for the default
+            max_bytes: Window of each stream that is not time-shifted
+        """
+        self.max_streams = max_streams
+        self.opener = opener
+        self.max_bytes = max_bytes
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.port: Optional[int] = None
+        self._streams: Dict[str, BufferedStream] = {}
+        self._lock = threading.Lock()
+        # Latest ICY title per station, kept after its stream is disconnected
+        self._titles: Dict[str, str] = collections.OrderedDict()
+        self._title_listeners: List[Callable[[str, str], None]] = []
+
+    def start(self):
+        """Start the loopback HTTP server on an ephemeral port."""
+        handler = self._make_handler(self)
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.port = self.server.server_address[1]
+        thread = threading.Thread(target=self.server.serve_forever, name="relay-server", daemon=True)
+        thread.start()
+        logger.info(f"Stream relay listening on 127.0.0.1:{self.port}")
+
+    def stop(self):
+        """Stop the server and close all upstream connections."""
+        if self.server:
+            self.server.shutdown()
+        self.retain([])
+
+    @staticmethod
+    def can_relay(url: str) -> bool:
+        """
+        Check if a stream URL can be buffered by the relay.
+
+        HLS playlists are segment based and are left to the decoder.
+
+        Args:
+            url: Stream URL
+
+        Returns:
+            True if the URL can be relayed, False otherwise
+        """
+        parsed = urlparse(url)
+        return parsed.scheme in ('http', 'https') and not parsed.path.lower().endswith('.m3u8')
+
+    def get(self, station_name: str) -> Optional[BufferedStream]:
+        """
+        Get the stream for a station.
+
+        Args:
+            station_name: Name of the station
+
+        Returns:
+            BufferedStream or None if the station is not connected
+        """
+        with self._lock:
+            return self._streams.get(station_name)
+
+    def open(self, station_name: str, url: str) -> BufferedStream:
+        """
+        Get a healthy stream for a station, connecting it if needed.
+
+        Args:
+            station_name: Name of the station
+            url: Upstream stream URL
+
+        Returns:
+            BufferedStream for the station
+        """
+        with self._lock:
+            stream = self._streams.get(station_name)
+            if stream is not None and stream.url == url and stream.is_healthy():
+                return stream
+
+            if stream is not None:
+                stream.close()
+            elif len(self._streams) >= self.max_streams:
+                # Make room by dropping the oldest connection
+                oldest = min(self._streams.values(), key=lambda s: s.created_at)
+                oldest.close()
+                del self._streams[oldest.station_name]
+
+            stream = BufferedStream(station_name, url, self.max_bytes, opener=self.opener,
+                                    on_title=self._on_title)
+            self._streams[station_name] = stream
+            stream.start()
+            logger.debug(f"Relay connecting {station_name}")
+            return stream
+
+    def add_title_listener(self, callback: Callable[[str, str], None]):
+        """
+        Register a function to call when the ICY title of any relayed station changes.
+
+        Args:
+            callback: Function taking the station name and title, called on the stream thread
+        """
+        self._title_listeners.append(callback)
+
+    def _on_title(self, station_name: str, title: str):
+        """Cache a new title of a station and notify listeners. Called on the stream thread."""
+        with self._lock:
+            self._titles[station_name] = title
+            self._titles.move_to_end(station_name)
+            while len(self._titles) > const.ICY_TITLE_CACHE_SIZE:
+                self._titles.popitem(last=False)
+        for callback in self._title_listeners:
+            try:
+                callback(station_name, title)
+            except Exception as e:
+                logger.error(f"Error in title listener: {e}")
+
+    def get_title(self, station_name: str) -> Optional[str]:
+        """
+        Get the latest ICY title of a station.
+
+        Args:
+            station_name: Name of the station
+
+        Returns:
+            Title, or None if the station has not sent one
+        """
+        with self._lock:
+            return self._titles.get(station_name)
+
+    def retain(self, station_names: Iterable[str]):
+        """
+        Close every stream that is not in the given set of stations.
+
+        Args:
+            station_names: Stations whose streams should stay connected
+        """
+        keep = set(station_names)
+        with self._lock:
+            for name in list(self._streams):
+                if name not in keep:
+                    self._streams.pop(name).close()
+                    logger.debug(f"Relay disconnected {name}")
+
+    def set_window(self, station_name: Optional[str], seconds: Optional[float], limit: Optional[int] = None,
+                   max_bytes: Optional[int] = None):
+        """
+        Keep a longer window for one station, e.g. the playing one, and the default for the others.
+
+        Args:
+            station_name: Station whose stream keeps `seconds` of audio, None for no station
+            seconds: Seconds of audio to keep for that station
+            limit: Upper limit of that station's window in bytes
+            max_bytes: New default window of all streams, None to keep it
+        """
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            streams = list(self._streams.values())
+        for stream in streams:
+            if stream.station_name == station_name:
+                stream.set_window(seconds, limit, max_bytes)
+            else:
+                stream.set_window(None, max_bytes=max_bytes)
+
+    @property
+    def buffered_bytes(self) -> int:
+        """Number of bytes held in memory by all streams."""
+        with self._lock:
+            return sum(stream.buffered_bytes for stream in self._streams.values())
+
+    def local_url(self, station_name: str, offset: Optional[int] = None) -> str:
+        """
+        Get the loopback URL the decoder should play for a station.
+
+        Args:
+            station_name: Name of the station
+            offset: Absolute offset to play from, None to start near live
+
+        Returns:
+            URL served by the relay
+        """
+        url = f"http://127.0.0.1:{self.port}/{quote(station_name)}"
+        return url if offset is None else f"{url}?offset={offset}"
+
+    @staticmethod
+    def _make_handler(relay: 'StreamRelay'):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                stream = relay.get(unquote(url.path.lstrip('/')))
+                if stream is None:
+                    self.send_error(404)
+                    return
+
+                if not stream.wait_for_data(const.RELAY_CONNECT_TIMEOUT):
+                    # Relay could not connect, let the decoder try the source itself
+                    self.send_response(302)
+                    self.send_header('Location', stream.url)
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', stream.content_type)
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+
+                # Resuming from a time-shift position, or near live with a burst for a fast start
+                requested = parse_qs(url.query).get('offset', [''])[0]
+                offset = int(requested) if requested.isdigit() else stream.burst_offset()
+                try:
+                    while True:
+                        offset, data = stream.read(offset)
+                        if data:
+                            self.wfile.write(data)
+                        elif stream.finished:
+                            break
+                except (BrokenPipeError, ConnectionResetError):
+                    logger.debug(f"Decoder detached from {stream.station_name}")
+
+            def log_message(self, format, *args):
+                logger.debug(f"Relay: {args[0]}")
+
+        return Handler
@@ -0,0 +1,421 @@
+"""
+Resolved-URL cache.
+Follows each station's redirects and playlists once in the background and
+remembers the final media URL and the address of its host, so a switch
+connects straight to the stream instead of repeating DNS lookups, redirects
+and playlist downloads. Entries expire after a TTL, failures are cached for a
+shorter time, and the cache is kept on disk across restarts.
+
+Usage: python resolver.py [--station NAME]...   resolve all stations and report the savings
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+import constants as const
+import metrics
+from relay import PLAYLIST_CONTENT_TYPES, PLAYLIST_EXTENSIONS, extract_playlist_url
+
+logger = logging.getLogger(__name__)
+
+
+class ResolverCache:
+    """Background resolver with a persistent cache of final stream URLs and host addresses."""
+
+    def __init__(self, path: Optional[str] = None, workers: int = const.RESOLVER_WORKERS):
+        """
+        Initialize the ResolverCache.
+
+        Args:
+            path: JSON file the cache is kept in, None to keep it in memory only
+            workers: Number of background resolver threads
+        """
+        self.path = path
+        self.workers = workers
+        # Station URL -> {'final_url', 'hops', 'chain_ms', 'direct_ms', 'expires_at'} or {'error', 'expires_at'}
+        self._urls: Dict[str, Dict] = {}
+        # Host name -> {'address', 'expires_at'}
+        self._hosts: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()
+        self._pending = set()
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._load()
+
+    def _load(self):
+        """Load the cache file, dropping expired entries."""
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            now = time.time()
+            self._urls = {url: entry for url, entry in data.get('urls', {}).items() if entry['expires_at'] > now}
+            self._hosts = {host: entry for host, entry in data.get('hosts', {}).items() if entry['expires_at'] > now}
+            logger.info(f"Loaded {len(self._urls)} resolved stream URLs")
+        except Exception as e:
+            logger.error(f"Error loading resolver cache {self.path}: {e}")
+
+    def save(self):
+        """Write the cache file if it changed, replacing it atomically."""
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps({'urls': self._urls, 'hosts': self._hosts}, indent=1)
+            self._dirty = False
+        try:
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving resolver cache {self.path}: {e}")
+
+    def start(self):
+        """Start the background resolver threads."""
+        for number in range(self.workers):
+            threading.Thread(target=self._run, name=f"resolver-{number}", daemon=True).start()
+
+    def stop(self):
+        """Stop the resolver threads and save the cache."""
+        for _ in range(self.workers):
+            self._queue.put(None)
+        self.save()
+
+    def lookup(self, url: str, record: bool = True) -> Optional[str]:
+        """
+        Get the cached final media URL of a station URL, resolving it in the background if unknown.
+
+        Args:
+            url: Station URL
+            record: False to leave the hit and miss statistics alone, e.g. for warm neighbours
+
+        Returns:
+            Final media URL, or None if it is not known (yet) and the original URL should be used
+        """
+        with self._lock:
+            entry = self._urls.get(url)
+            fresh = entry is not None and entry['expires_at'] > time.time()
+            if fresh and 'final_url' in entry:
+                if not record:
+                    return entry['final_url']
+                self.hits += 1
+                saved = max(0.0, entry['chain_ms'] - entry['direct_ms']) / 1000
+                self.saved_seconds += saved
+                metrics.RESOLVER_LOOKUPS.inc(result='hit')
+                metrics.RESOLVER_SAVED.inc(saved)
+                return entry['final_url']
+            if record:
+                self.misses += 1
+                metrics.RESOLVER_LOOKUPS.inc(result='negative' if fresh else 'miss')
+        if not fresh:
+            self.prefetch([url])
+        return None
+
+    def prefetch(self, urls: Iterable[str]):
+        """
+        Resolve station URLs in the background unless they have fresh entries.
+
+        Args:
+            urls: Station URLs
+        """
+        now = time.time()
+        with self._lock:
+            for url in urls:
+                entry = self._urls.get(url)
+                if (entry is None or entry['expires_at'] <= now) and url not in self._pending:
+                    self._pending.add(url)
+                    self._queue.put(url)
+
+    def invalidate(self, url: str):
+        """
+        Forget the resolved endpoint of a station URL, e.g. after the stream failed.
+
+        Args:
+            url: Station URL
+        """
+        with self._lock:
+            entry = self._urls.pop(url, None)
+            if entry is not None and 'final_url' in entry:
+                self._hosts.pop(urlsplit(entry['final_url']).hostname, None)
+                logger.info(f"Dropped resolved endpoint of {url}")
+            self._dirty = True
+
+    def get_address(self, host: str) -> Optional[str]:
+        """
+        Get the cached address of a host.
+
+        Args:
+            host: Host name
+
+        Returns:
+            IP address, or None if not cached
+        """
+        with self._lock:
+            entry = self._hosts.get(host)
+            return entry['address'] if entry is not None and entry['expires_at'] > time.time() else None
+
+    def create_connection(self, address: Tuple[str, int], timeout=socket._GLOBAL_DEFAULT_TIMEOUT,
+                          source_address=None) -> socket.socket:
+        """
+        Drop-in for socket.create_connection that connects to the cached host address.
+
+        Args:
+            address: (host, port) tuple
+            timeout: Socket timeout
+            source_address: Local address to bind to
+
+        Returns:
+            Connected socket
+        """
+        host, port = address
+        cached = self.get_address(host)
+        if cached is not None:
+            try:
+                return socket.create_connection((cached, port), timeout, source_address)
+            except OSError as e:
+                logger.debug(f"Cached address {cached} of {host} failed, looking it up again: {e}")
+                with self._lock:
+                    self._hosts.pop(host, None)
+        return socket.create_connection(address, timeout, source_address)
+
+    def build_opener(self) -> urllib.request.OpenerDirector:
+        """
+        Build a urllib opener whose connections use the cached host addresses.
+
+        Returns:
+            OpenerDirector for urllib requests
+        """
+        resolver = self
+
+        def connection(connection_class):
+            def create(host, **kwargs):
+                conn = connection_class(host, **kwargs)
+                conn._create_connection = resolver.create_connection
+                return conn
+            return create
+
+        class HTTPHandler(urllib.request.HTTPHandler):
+            def http_open(self, req):
+                return self.do_open(connection(http.client.HTTPConnection), req)
+
+        class HTTPSHandler(urllib.request.HTTPSHandler):
+            def https_open(self, req):
+                return self.do_open(connection(http.client.HTTPSConnection), req, context=self._context)
+
+        return urllib.request.build_opener(HTTPHandler, HTTPSHandler)
+
+    def get_stats(self) -> Dict:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with entry counts, hits, misses and the connect time saved by hits
+        """
+        with self._lock:
+            resolved = [entry for entry in self._urls.values() if 'final_url' in entry]
+            return {
+                'entries': len(resolved),
+                'failed': len(self._urls) - len(resolved),
+                'hits': self.hits,
+                'misses': self.misses,
+                'saved_seconds': round(self.saved_seconds, 3),
+            }
+
+    def _run(self):
+        """Resolver thread loop."""
+        while True:
+            url = self._queue.get()
+            if url is None:
+                return
+            try:
+                self.resolve(url)
+            except Exception as e:
+                logger.error(f"Resolver error for {url}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(url)
+            if self._queue.empty():
+                self.save()
+
+    def resolve(self, url: str) -> Dict:
+        """
+        Follow a station URL to its media stream and cache the result.
+
+        Also measures the time to response headers through the whole chain
+        and directly from the cached endpoint; their difference is the
+        connect time a cache hit saves.
+
+        Args:
+            url: Station URL
+
+        Returns:
+            The new cache entry
+        """
+        started_at = time.monotonic()
+        try:
+            final_url, hops = self._follow(url)
+            chain_ms = (time.monotonic() - started_at) * 1000
+
+            direct_started_at = time.monotonic()
+            connection, _ = self._request(final_url)
+            connection.close()
+            direct_ms = (time.monotonic() - direct_started_at) * 1000
+
+            entry = {'final_url': final_url, 'hops': hops, 'chain_ms': round(chain_ms, 1),
+                     'direct_ms': round(direct_ms, 1), 'expires_at': time.time() + const.RESOLVER_TTL}
+            logger.debug(f"Resolved {url} -> {final_url} ({hops} hops, {chain_ms:.0f} ms, direct {direct_ms:.0f} ms)")
+        except Exception as e:
+            entry = {'error': str(e) or type(e).__name__, 'expires_at': time.time() + const.RESOLVER_NEGATIVE_TTL}
+            logger.info(f"Could not resolve {url}: {entry['error']}")
+
+        with self._lock:
+            self._urls[url] = entry
+            self._dirty = True
+        return entry
+
+    def _lookup_host(self, host: str, port: int) -> str:
+        """
+        Resolve a host name and cache its address.
+
+        Args:
+            host: Host name
+            port: Port, used for the address family lookup
+
+        Returns:
+            IP address
+        """
+        address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0][4][0]
+        with self._lock:
+            self._hosts[host] = {'address': address, 'expires_at': time.time() + const.RESOLVER_TTL}
+            self._dirty = True
+        return address
+
+    def _request(self, url: str, lookup: bool = False) -> Tuple[http.client.HTTPConnection,
+                                                                Optional[http.client.HTTPResponse]]:
+        """
+        Send a GET request and read the response headers.
+
+        Args:
+            url: http(s) URL
+            lookup: True to look up the host even if its address is cached
+
+        Returns:
+            Tuple of (connection, response); response is None for a Shoutcast 'ICY 200 OK' stream
+        """
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f"unsupported scheme {parts.scheme}")
+        secure = parts.scheme == 'https'
+        port = parts.port or (443 if secure else 80)
+        if lookup or self.get_address(parts.hostname) is None:
+            self._lookup_host(parts.hostname, port)
+
+        connection_class = http.client.HTTPSConnection if secure else http.client.HTTPConnection
+        connection = connection_class(parts.hostname, port, timeout=const.RELAY_CONNECT_TIMEOUT)
+        connection._create_connection = self.create_connection
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        connection.request('GET', path, headers={'User-Agent': const.RELAY_USER_AGENT, 'Accept': '*/*'})
+        try:
+            return connection, connection.getresponse()
+        except http.client.BadStatusLine as e:
+            if str(e).startswith('ICY'):
+                return connection, None
+            connection.close()
+            raise
+
+    def _follow(self, url: str) -> Tuple[str, int]:
+        """
+        Follow redirects and playlists to the media stream.
+
+        Args:
+            url: Station URL
+
+        Returns:
+            Tuple of (final media URL, number of hops)
+        """
+        current = url
+        for hops in range(const.RESOLVER_MAX_HOPS + 1):
+            # Look up every host, as the decoder would without the cache
+            connection, response = self._request(current, lookup=True)
+            try:
+                if response is None:
+                    return current, hops
+                content_type = (response.getheader('Content-Type') or '').split(';')[0].strip().lower()
+                if 300 <= response.status < 400 and response.getheader('Location'):
+                    current = urljoin(current, response.getheader('Location'))
+                elif response.status != 200:
+                    raise ValueError(f"HTTP {response.status}")
+                elif content_type in PLAYLIST_CONTENT_TYPES or urlsplit(current).path.lower().endswith(PLAYLIST_EXTENSIONS):
+                    text = response.read(64 * 1024).decode('utf-8', errors='replace')
+                    target = extract_playlist_url(text)
+                    if '#EXT-X-' in text:
+                        # HLS playlists are played by the decoder itself
+                        return current, hops
+                    if target is None:
+                        raise ValueError("playlist without stream URL")
+                    current = urljoin(current, target)
+                else:
+                    return current, hops
+            finally:
+                connection.close()
+        raise ValueError("too many redirects or playlists")
+
+
+def main():
+    """Resolve all stations and report how much connect time the cache saves."""
+    from stations import StationManager
+
+    parser = argparse.ArgumentParser(description="Resolve all stations and report the connect time saved")
+    parser.add_argument('--base-dir', help="directory with the station files (default: this directory)")
+    parser.add_argument('--station', action='append', help="resolve only this station (repeatable)")
+    parser.add_argument('--concurrency', type=int, default=8, help="simultaneous lookups (default: 8)")
+    args = parser.parse_args()
+
+    manager = StationManager(args.base_dir)
+    stations = manager.get_stations()
+    if args.station:
+        stations = {name: url for name, url in stations.items() if name in args.station}
+    cache = ResolverCache(os.path.join(manager.base_dir, const.RESOLVER_CACHE_FILE))
+
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        entries = list(pool.map(cache.resolve, stations.values()))
+
+    total_saved = 0.0
+    for name, entry in zip(stations, entries):
+        if 'error' in entry:
+            print(f"FAIL {name:<32} {entry['error']}")
+            continue
+        saved = entry['chain_ms'] - entry['direct_ms']
+        total_saved += max(0.0, saved)
+        print(f"ok   {name:<32} {entry['hops']} hops  chain {entry['chain_ms']:>7.1f} ms  "
+              f"direct {entry['direct_ms']:>7.1f} ms  saved {saved:>7.1f} ms")
+    cache.save()
+
+    resolved = sum(1 for entry in entries if 'error' not in entry)
+    if resolved:
+        print(f"{resolved} resolved, {len(entries) - resolved} failed, "
+              f"{total_saved / resolved:.1f} ms saved per switch on average")
+    return 0 if resolved == len(entries) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""
+Memory soak test.
+Plays the stand-in stations for hours, switching, pausing, resuming and
+catching up to live like a listener would. It samples the RSS of this process
+and the decoder, the relay buffers and the available memory, and reports
+peaks and growth over the session, so leaks and buffer creep show up before
+they reach a 512 MB Pi. No network access is needed.
+
+Usage: python soak_test.py [--hours H] [--dwell SECONDS] [--budget MB]
+                           [--report-interval MINUTES] [--output FILE]
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+import constants as const
+import main as radio
+from bench_switch import git_commit, read_process_stats, write_stations
+from buffering import read_meminfo
+from executor import CommandExecutor
+from stream_standin import StandinServer
+
+SAMPLE_INTERVAL = 5.0
+
+# Listener actions and their weights
+ACTIONS = (('next', 6), ('previous', 2), ('pause', 2), ('live', 1), ('linger', 3))
+
+
+class MemorySampler:
+    """Samples RSS, relay buffers and available memory in the background."""
+
+    def __init__(self, player):
+        """
+        Initialize the MemorySampler.
+
+        Args:
+            player: RadioPlayer whose decoder and relay are sampled
+        """
+        self.player = player
+        # (seconds since start, python RSS KB, decoder RSS KB, relay KB, MemAvailable KB)
+        self.samples: List[tuple] = []
+        self._started_at = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        """Start sampling."""
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling."""
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        """Sampling loop."""
+        while True:
+            self.samples.append(self.sample())
+            if self._stop.wait(SAMPLE_INTERVAL):
+                break
+
+    def sample(self) -> tuple:
+        """Take one sample."""
+        python = read_process_stats(os.getpid())
+        pid = self.player.buffers.decoder_pid()
+        decoder = read_process_stats(pid) if pid else None
+        relay_kb = self.player.relay.buffered_bytes // 1024 if self.player.relay is not None else None
+        available = read_meminfo().get('MemAvailable')
+        return (round(time.monotonic() - self._started_at, 1),
+                python[1] if python else None,
+                decoder[1] if decoder else None,
+                relay_kb,
+                available // 1024 if available is not None else None)
+
+    def results(self) -> Dict:
+        """Get peak, mean and growth per sampled quantity."""
+        results = {}
+        for index, name in enumerate(('python_rss_kb', 'decoder_rss_kb', 'relay_buffer_kb', 'available_kb'), 1):
+            series = [(sample[0], sample[index]) for sample in self.samples if sample[index] is not None]
+            results[name] = summarize_series(series)
+        return results
+
+
+def summarize_series(series: List[tuple]) -> Dict:
+    """
+    Get peak, minimum, mean and growth of a sampled series.
+
+    Growth compares the mean of the last tenth of the session with the first
+    tenth after warm-up, so a steady climb stands out from the initial fill.
+
+    Args:
+        series: List of (seconds, value)
+
+    Returns:
+        Dictionary of statistics
+    """
+    if not series:
+        return {'samples': 0, 'peak': None, 'min': None, 'mean': None, 'growth_per_hour': None}
+    values = [value for _, value in series]
+    tenth = max(len(series) // 10, 1)
+    first, last = series[tenth:2 * tenth] or series[:tenth], series[-tenth:]
+    def mean(samples, index):
+        return sum(sample[index] for sample in samples) / len(samples)
+
+    # Compare the two means over the time between their midpoints
+    hours = (mean(last, 0) - mean(first, 0)) / 3600
+    growth = None
+    if hours > 0:
+        growth = round((mean(last, 1) - mean(first, 1)) / hours, 1)
+    return {
+        'samples': len(series),
+        'peak': max(values),
+        'min': min(values),
+        'mean': round(sum(values) / len(values)),
+        'growth_per_hour': growth,
+    }
+
+
+def run_soak(player, duration: float, dwell: float, seed: int, report_interval: float,
+             sampler: MemorySampler) -> Dict[str, int]:
+    """
+    Act like a listener until the duration has passed.
+
+    Args:
+        player: RadioPlayer instance
+        duration: Seconds to run
+        dwell: Mean seconds between actions
+        seed: Random seed, so runs are comparable
+        report_interval: Seconds between progress lines
+        sampler: Sampler whose latest values are printed
+
+    Returns:
+        Number of times each action was taken
+    """
+    rng = random.Random(seed)
+    names = [name for name, _ in ACTIONS]
+    weights = [weight for _, weight in ACTIONS]
+    counts = {name: 0 for name in names}
+    started_at = time.monotonic()
+    next_report = started_at + report_interval
+
+    player.start_stream(player.stations[0], announce=False)
+    while time.monotonic() - started_at < duration:
+        action = rng.choices(names, weights)[0]
+        counts[action] += 1
+        if action == 'next':
+            player.next_station()
+        elif action == 'previous':
+            player.previous_station()
+        elif action == 'pause':
+            player.toggle()
+            time.sleep(rng.uniform(0.5, 2) * dwell)
+            player.toggle()
+        elif action == 'live':
+            player.go_live()
+        time.sleep(rng.uniform(0.5, 1.5) * dwell)
+
+        if time.monotonic() >= next_report:
+            next_report += report_interval
+            elapsed, python_kb, decoder_kb, relay_kb, available_kb = sampler.sample()
+            print(f"  {elapsed / 60:>6.0f} min  python {python_kb} KB  decoder {decoder_kb} KB  "
+                  f"relay {relay_kb} KB  available {available_kb} KB  memory {player.buffers.level}")
+    return counts
+
+
+def main():
+    """Run the soak test."""
+    parser = argparse.ArgumentParser(description="Play stand-in stations for hours and report peak memory")
+    parser.add_argument('--hours', type=float, default=3.0, help="session length (default: 3)")
+    parser.add_argument('--dwell', type=float, default=20.0, help="mean seconds between actions (default: 20)")
+    parser.add_argument('--budget', type=float, help="buffer budget in MB instead of the one derived from RAM")
+    parser.add_argument('--seed', type=int, default=1, help="random seed for the actions (default: 1)")
+    parser.add_argument('--report-interval', type=float, default=10.0,
+                        help="minutes between progress lines (default: 10)")
+    parser.add_argument('--media', help="directory with canned MP3/AAC files for the stand-in server")
+    parser.add_argument('--output', default='soak_test.json', help="results file (default: soak_test.json)")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    if args.budget:
+        const.BUFFER_MEMORY_BUDGET = int(args.budget * 1024 * 1024)
+
+    server = StandinServer(media_dir=args.media)
+    server.start()
+    base_dir = tempfile.mkdtemp(prefix='pi-radio-soak-')
+    write_stations(base_dir, server)
+
+    executor = CommandExecutor()
+    executor.start()
+    player = radio.RadioPlayer(radio.StationManager(base_dir), executor)
+    print(f"Soak test: {args.hours:g} h, action every ~{args.dwell:g}s, "
+          f"{player.backend.name if player.backend else 'no'} backend, "
+          f"buffer budget {player.buffers.budget_bytes // 1024} KB")
+
+    sampler = MemorySampler(player)
+    sampler.start()
+    started_at = time.monotonic()
+    try:
+        actions = run_soak(player, args.hours * 3600, args.dwell, args.seed, args.report_interval * 60, sampler)
+    except KeyboardInterrupt:
+        print("Interrupted, reporting the session so far")
+        actions = None
+    finally:
+        sampler.stop()
+        memory = player.buffers.get_stats()
+        player.stop_stream()
+        player.shutdown()
+        server.stop()
+        shutil.rmtree(base_dir, ignore_errors=True)
+
+    report = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'hours': round((time.monotonic() - started_at) / 3600, 2),
+        'dwell': args.dwell,
+        'seed': args.seed,
+        'backend': player.backend.name if player.backend else None,
+        'python_version': sys.version.split()[0],
+        'actions': actions,
+        'memory': sampler.results(),
+        'buffer_policy': memory,
+        'standin_connections': server.connections,
+    }
+
+    print()
+    for name, stats in report['memory'].items():
+        print(f"{name:<16} peak {stats['peak']}  mean {stats['mean']}  growth {stats['growth_per_hour']}/h")
+    print(f"memory level at end: {memory['level']}")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,382 @@
+"""
+Text-to-speech worker.
+Announcements are queued and spoken on a dedicated thread so callers never
+wait for speech. Newer announcements in the same category (e.g. station names
+while zapping) cancel older ones, and system messages are spoken first.
+Rendered phrases are kept in an on-disk cache and played back as WAV files.
+Announcements play over the stream, which is ducked while they are spoken.
+"""
+import collections
+import contextlib
+import hashlib
+import itertools
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+import constants as const
+import metrics
+from ducking import AudioDucker
+
+logger = logging.getLogger(__name__)
+
+# Lower values are spoken first
+PRIORITY_SYSTEM = 0
+PRIORITY_NORMAL = 5
+PRIORITY_STATION = 10
+PRIORITY_BACKGROUND = 20
+
+
+class AnnouncementCache:
+    """LRU cache of pre-rendered announcements stored as WAV files."""
+
+    def __init__(self, cache_dir: str, max_bytes: int = const.TTS_CACHE_MAX_BYTES):
+        """
+        Initialize the AnnouncementCache.
+
+        Args:
+            cache_dir: Directory to store rendered files in
+            max_bytes: Total size budget for the cache
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> file size, least recently used first
+        self._entries = collections.OrderedDict()
+        self._total_bytes = 0
+        self._load_index()
+
+    def _load_index(self):
+        """Rebuild the LRU index from the files on disk, oldest access first."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        files = []
+        for filename in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, filename)
+            if not filename.endswith('.wav') or filename.endswith('.tmp.wav'):
+                continue
+            stat = os.stat(path)
+            files.append((stat.st_mtime, filename[:-len('.wav')], stat.st_size))
+
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._total_bytes += size
+        logger.info(f"Announcement cache: {len(self._entries)} phrases, {self._total_bytes // 1024} KB")
+
+    @staticmethod
+    def make_key(text: str, voice_settings: str) -> str:
+        """
+        Get the cache key for a phrase.
+
+        Args:
+            text: Text of the announcement
+            voice_settings: Voice, rate and volume the text is rendered with
+
+        Returns:
+            Hex digest identifying the rendered audio
+        """
+        return hashlib.sha1(f"{voice_settings}|{text}".encode('utf-8')).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        """Get the file path for a cache key."""
+        return os.path.join(self.cache_dir, f"{key}.wav")
+
+    def temp_path_for(self, key: str) -> str:
+        """Get the path a phrase is rendered to before it is added."""
+        return os.path.join(self.cache_dir, f"{key}.tmp.wav")
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a rendered phrase and mark it as recently used.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Path of the WAV file, or None if the phrase is not cached
+        """
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+
+        path = self.path_for(key)
+        try:
+            # Persist recency across restarts through the file's mtime
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._total_bytes -= self._entries.pop(key, 0)
+            return None
+        return path
+
+    def add(self, key: str) -> Optional[str]:
+        """
+        Move a freshly rendered file into the cache and evict old entries.
+
+        Args:
+            key: Cache key whose temporary file was rendered
+
+        Returns:
+            Path of the cached WAV file, or None if rendering produced nothing
+        """
+        temp_path = self.temp_path_for(key)
+        if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
+            return None
+
+        path = self.path_for(key)
+        os.replace(temp_path, path)
+        size = os.path.getsize(path)
+
+        with self._lock:
+            self._total_bytes += size - self._entries.get(key, 0)
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, old_size = self._entries.popitem(last=False)
+                self._total_bytes -= old_size
+                try:
+                    os.remove(self.path_for(old_key))
+                except OSError:
+                    pass
+                logger.debug(f"Evicted cached announcement {old_key}")
+        return path
+
+
+class Announcement:
+    """A single queued piece of text."""
+
+    def __init__(self, text: str, priority: int, category: Optional[str], generation: int,
+                 cache: bool = True, render_only: bool = False):
+        """
+        Initialize the Announcement.
+
+        Args:
+            text: Text to speak
+            priority: Queue priority, lower is spoken first
+            category: Optional category, newer announcements cancel older ones in the same category
+            generation: Category generation at the time the announcement was queued
+            cache: True to render through the announcement cache
+            render_only: True to only render the text into the cache without playing it
+        """
+        self.text = text
+        self.priority = priority
+        self.category = category
+        self.generation = generation
+        self.cache = cache
+        self.render_only = render_only
+        self.queued_at = time.monotonic()
+        self.done = threading.Event()
+
+
+class SpeechWorker:
+    """Speaks queued announcements on a background thread."""
+
+    def __init__(self, cache: Optional[AnnouncementCache] = None, ducker: Optional[AudioDucker] = None):
+        """
+        Initialize the SpeechWorker.
+
+        Args:
+            cache: Optional cache of pre-rendered announcements
+            ducker: Optional AudioDucker that lowers the stream while speaking
+        """
+        self.cache = cache
+        self.ducker = ducker
+        self._player_path = shutil.which(const.TTS_PLAYER_COMMAND[0])
+        self._voice_settings = ''
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._current: Optional[Announcement] = None
+        # pyttsx3 engine, created on the worker thread
+        self._engine = None
+        self._thread = threading.Thread(target=self._run, name="tts", daemon=True)
+
+    def start(self):
+        """Start the worker thread. The TTS engine initializes in the background; announcements queue meanwhile."""
+        self._thread.start()
+
+    def say(self, text: str, priority: int = PRIORITY_NORMAL, category: Optional[str] = None,
+            cache: bool = True) -> threading.Event:
+        """
+        Queue text to be spoken.
+
+        Args:
+            text: Text to speak
+            priority: Queue priority, lower is spoken first
+            category: Optional category; queued or playing announcements in the
+                      same category are cancelled
+            cache: False for one-off text that should not be stored in the cache
+
+        Returns:
+            Event that is set once the announcement was spoken or dropped
+        """
+        with self._lock:
+            generation = 0
+            if category is not None:
+                generation = self._generations.get(category, 0) + 1
+                self._generations[category] = generation
+            announcement = Announcement(text, priority, category, generation, cache)
+
+        self._queue.put((priority, next(self._sequence), announcement))
+        return announcement.done
+
+    def prerender(self, texts: Iterable[str]):
+        """
+        Render phrases into the cache in the background.
+
+        Rendering runs at the lowest priority, so it never delays announcements.
+
+        Args:
+            texts: Phrases to render
+        """
+        if self.cache is None:
+            return
+        for text in texts:
+            announcement = Announcement(text, PRIORITY_BACKGROUND, None, 0, render_only=True)
+            self._queue.put((PRIORITY_BACKGROUND, next(self._sequence), announcement))
+
+    def _is_stale(self, announcement: Announcement) -> bool:
+        """Check if a newer announcement in the same category was queued."""
+        if announcement.category is None:
+            return False
+        with self._lock:
+            return self._generations.get(announcement.category) != announcement.generation
+
+    def _on_word(self, name, location, length):
+        """Stop speaking as soon as the current announcement becomes stale."""
+        current = self._current
+        if current is not None and self._is_stale(current):
+            self._engine.stop()
+
+    def _run(self):
+        """Worker loop: initialize the engine, then speak queued announcements."""
+        try:
+            # Imported here because loading the speech drivers is slow and would delay startup;
+            # pyttsx3 engines must also be used from the thread that created them
+            import pyttsx3
+            started_at = time.monotonic()
+            self._engine = pyttsx3.init()
+            self._engine.connect('started-word', self._on_word)
+            self._voice_settings = '|'.join(
+                str(self._engine.getProperty(name)) for name in ('voice', 'rate', 'volume'))
+            logger.info(f"Text-to-speech initialized in {time.monotonic() - started_at:.2f}s")
+        except Exception as e:
+            logger.error(f"Failed to initialize text-to-speech: {e}")
+            self._engine = None
+
+        while True:
+            _, _, announcement = self._queue.get()
+            try:
+                if self._is_stale(announcement):
+                    logger.debug(f"Skipping stale announcement: {announcement.text}")
+                elif self._engine is None:
+                    if not announcement.render_only:
+                        logger.warning(f"TTS not available, would have said: {announcement.text}")
+                else:
+                    if not announcement.render_only:
+                        metrics.TTS_DURATION.observe(time.monotonic() - announcement.queued_at, stage='queued')
+                    self._current = announcement
+                    started_at = time.monotonic()
+                    self._speak(announcement)
+                    metrics.TTS_DURATION.observe(time.monotonic() - started_at,
+                                                 stage='rendered' if announcement.render_only else 'spoken')
+            except Exception as e:
+                logger.error(f"TTS error: {e}")
+            finally:
+                self._current = None
+                announcement.done.set()
+
+    @contextlib.contextmanager
+    def _ducked(self):
+        """Lower the stream for as long as the block runs."""
+        if self.ducker is None:
+            yield
+            return
+        self.ducker.duck()
+        try:
+            yield
+        finally:
+            self.ducker.release()
+
+    def _speak(self, announcement: Announcement):
+        """
+        Speak an announcement, preferring pre-rendered audio from the cache.
+
+        Args:
+            announcement: Announcement to speak
+        """
+        if self.cache is None or not announcement.cache or self._player_path is None:
+            with self._ducked():
+                self._engine.say(announcement.text)
+                self._engine.runAndWait()
+            return
+
+        key = AnnouncementCache.make_key(announcement.text, self._voice_settings)
+        path = self.cache.get(key)
+        if path is None:
+            path = self._render(announcement.text, key)
+        elif announcement.render_only:
+            return
+
+        if announcement.render_only or self._is_stale(announcement):
+            return
+
+        with self._ducked():
+            if path is None:
+                # Rendering failed, fall back to live synthesis
+                self._engine.say(announcement.text)
+                self._engine.runAndWait()
+            else:
+                self._play_file(path, announcement)
+
+    def _render(self, text: str, key: str) -> Optional[str]:
+        """
+        Render text to a WAV file and add it to the cache.
+
+        Args:
+            text: Text to render
+            key: Cache key for the text
+
+        Returns:
+            Path of the rendered file, or None on failure
+        """
+        try:
+            self._engine.save_to_file(text, self.cache.temp_path_for(key))
+            self._engine.runAndWait()
+            path = self.cache.add(key)
+            if path is not None:
+                logger.debug(f"Rendered announcement: {text}")
+            return path
+        except Exception as e:
+            logger.error(f"Failed to render announcement '{text}': {e}")
+            return None
+
+    def _play_file(self, path: str, announcement: Announcement):
+        """
+        Play a rendered announcement, stopping early if it becomes stale.
+
+        Args:
+            path: WAV file to play
+            announcement: Announcement being played
+        """
+        process = subprocess.Popen(
+            [self._player_path] + const.TTS_PLAYER_COMMAND[1:] + [path],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        while True:
+            try:
+                process.wait(timeout=0.05)
+                return
+            except subprocess.TimeoutExpired:
+                if self._is_stale(announcement):
+                    process.terminate()
+                    process.wait()
+                    return
@@ -0,0 +1,104 @@
+"""
+Startup timing.
+Logs how long each startup phase takes and the time from process start, and
+from system boot, until the first audio, so boot-to-audio time can be
+tracked across changes.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def process_age() -> Optional[float]:
+    """
+    Get the seconds since this process was started, including interpreter startup and imports.
+
+    Returns:
+        Process age, or None where /proc is not available
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            # The command name may contain spaces, the fields after it are fixed
+            fields = f.read().rsplit(')', 1)[1].split()
+        started = int(fields[19]) / os.sysconf('SC_CLK_TCK')
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - started
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def system_uptime() -> Optional[float]:
+    """
+    Get the seconds since the system booted.
+
+    Returns:
+        Uptime, or None where CLOCK_BOOTTIME is not available
+    """
+    try:
+        return time.clock_gettime(time.CLOCK_BOOTTIME)
+    except (OSError, AttributeError):
+        return None
+
+
+class StartupTimer:
+    """Logs startup phases relative to the start of the process."""
+
+    def __init__(self):
+        """Initialize the StartupTimer."""
+        age = process_age()
+        # Phases are reported relative to process start when it is known
+        self.started_at = time.monotonic() - (age or 0.0)
+        self.phases: Dict[str, float] = {}
+        self._first_audio_logged = False
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        """Get the seconds since process start."""
+        return time.monotonic() - self.started_at
+
+    def mark(self, name: str):
+        """
+        Log that a phase has been reached.
+
+        Args:
+            name: Phase name
+        """
+        elapsed = self.elapsed()
+        with self._lock:
+            self.phases[name] = elapsed
+        logger.info(f"Startup: {name} at {elapsed:.2f}s")
+
+    def measure(self, name: str, func: Callable, *args, **kwargs):
+        """
+        Run one startup step and log its duration.
+
+        Args:
+            name: Phase name
+            func: Function to call
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            Return value of func
+        """
+        started_at = time.monotonic()
+        result = func(*args, **kwargs)
+        duration = time.monotonic() - started_at
+        with self._lock:
+            self.phases[name] = self.elapsed()
+        logger.info(f"Startup: {name} took {duration:.2f}s, done at {self.elapsed():.2f}s")
+        return result
+
+    def first_audio(self):
+        """Log the boot-to-audio time once, when the first stream has started playing."""
+        with self._lock:
+            if self._first_audio_logged:
+                return
+            self._first_audio_logged = True
+        self.mark('first audio')
+        uptime = system_uptime()
+        if uptime is not None:
+            logger.info(f"Startup: first audio {uptime:.1f}s after system boot")
@@ -0,0 +1,510 @@
+"""
+SQLite station store.
+Optional StationManager backend for large shared catalogs. Stations live in
+a SQLite database with an FTS5 index and are read on demand, so memory use
+does not grow with the catalog. Provides the same lookups as StationCatalog,
+bulk import from M3U, PLS and JSON in a single transaction, and streaming
+export.
+
+Usage: python station_store.py [--db FILE] import FILE... [--replace]
+       python station_store.py [--db FILE] export FILE [--format json|m3u|pls]
+       python station_store.py [--db FILE] search TEXT
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+from typing import Dict, IO, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import constants as const
+from stations import normalize_stations
+
+logger = logging.getLogger(__name__)
+
+# Columns for the metadata fields stations commonly have; other fields are kept as JSON in 'extra'
+METADATA_COLUMNS = ('display_name', 'genre', 'country', 'bitrate', 'tags')
+PAGE_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stations (
+    id INTEGER PRIMARY KEY,
+    position INTEGER NOT NULL UNIQUE,
+    name TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    display_name TEXT,
+    genre TEXT,
+    country TEXT,
+    bitrate INTEGER,
+    tags TEXT,
+    extra TEXT
+);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS stations_fts USING fts5(
+    name, display_name, genre, country, tags,
+    content='stations', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS stations_ai AFTER INSERT ON stations BEGIN
+    INSERT INTO stations_fts(rowid, name, display_name, genre, country, tags)
+    VALUES (new.id, replace(new.name, '_', ' '), new.display_name, new.genre, new.country, new.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS stations_ad AFTER DELETE ON stations BEGIN
+    INSERT INTO stations_fts(stations_fts, rowid, name, display_name, genre, country, tags)
+    VALUES ('delete', old.id, replace(old.name, '_', ' '), old.display_name, old.genre, old.country, old.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS stations_au AFTER UPDATE ON stations BEGIN
+    INSERT INTO stations_fts(stations_fts, rowid, name, display_name, genre, country, tags)
+    VALUES ('delete', old.id, replace(old.name, '_', ' '), old.display_name, old.genre, old.country, old.tags);
+    INSERT INTO stations_fts(rowid, name, display_name, genre, country, tags)
+    VALUES (new.id, replace(new.name, '_', ' '), new.display_name, new.genre, new.country, new.tags);
+END;
+"""
+
+EXTINF_ATTRIBUTE = re.compile(r'([\w-]+)="([^"]*)"')
+
+
+def make_station_name(title: str) -> str:
+    """
+    Turn a title into a station name, e.g. 'Radio Swiss Jazz' -> 'radio_swiss_jazz'.
+
+    Args:
+        title: Display title or URL
+
+    Returns:
+        Lower-case name with underscores
+    """
+    return re.sub(r'[^a-z0-9]+', '_', title.lower()).strip('_') or 'station'
+
+
+def parse_m3u(text: str) -> Iterator[Tuple[str, str, Dict]]:
+    """
+    Parse an (extended) M3U playlist.
+
+    Titles and the group-title, tvg-country and tvg-genre attributes of
+    #EXTINF lines become display_name, genre and country.
+
+    Args:
+        text: Playlist contents
+
+    Yields:
+        (name, url, metadata) tuples
+    """
+    metadata: Dict = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('#EXTINF'):
+            info, _, title = line.partition(',')
+            attributes = dict(EXTINF_ATTRIBUTE.findall(info))
+            metadata = {'display_name': title.strip() or None,
+                        'genre': attributes.get('group-title') or attributes.get('tvg-genre'),
+                        'country': attributes.get('tvg-country')}
+            metadata = {key: value for key, value in metadata.items() if value}
+        elif line and not line.startswith('#'):
+            yield make_station_name(metadata.get('display_name', line)), line, metadata
+            metadata = {}
+
+
+def parse_pls(text: str) -> Iterator[Tuple[str, str, Dict]]:
+    """
+    Parse a PLS playlist.
+
+    Args:
+        text: Playlist contents
+
+    Yields:
+        (name, url, metadata) tuples in entry order
+    """
+    files: Dict[int, str] = {}
+    titles: Dict[int, str] = {}
+    for line in text.splitlines():
+        key, _, value = line.strip().partition('=')
+        match = re.fullmatch(r'(File|Title)(\d+)', key, re.IGNORECASE)
+        if match:
+            target = files if match.group(1).lower() == 'file' else titles
+            target[int(match.group(2))] = value.strip()
+    for number in sorted(files):
+        title = titles.get(number)
+        yield make_station_name(title or files[number]), files[number], {'display_name': title} if title else {}
+
+
+def unique_names(entries: Iterable[Tuple[str, str, Dict]]) -> Iterator[Tuple[str, str, Dict]]:
+    """
+    Number repeated names, e.g. a second 'radio_1' becomes 'radio_1_2'.
+
+    Args:
+        entries: (name, url, metadata) tuples
+
+    Yields:
+        Entries with unique names, stable when the same file is imported again
+    """
+    seen: Dict[str, int] = {}
+    for name, url, metadata in entries:
+        count = seen.get(name, 0) + 1
+        seen[name] = count
+        yield (name if count == 1 else f"{name}_{count}"), url, metadata
+
+
+def parse_station_file(path: str) -> Iterator[Tuple[str, str, Dict]]:
+    """
+    Parse a station list by extension: .m3u/.m3u8, .pls or .json.
+
+    Args:
+        path: File to read
+
+    Returns:
+        Iterator of (name, url, metadata) tuples
+    """
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        text = f.read()
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.m3u', '.m3u8'):
+        return unique_names(parse_m3u(text))
+    if extension == '.pls':
+        return unique_names(parse_pls(text))
+    if extension == '.json':
+        return iter(normalize_stations(json.loads(text)))
+    raise ValueError(f"Unsupported station file type: {extension}")
+
+
+class StationNames(Sequence):
+    """Read-only list of station names backed by the store, fetched on access."""
+
+    def __init__(self, store: 'SqliteStationStore'):
+        self._store = store
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._store.name_at(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._store.name_at(index)
+
+    def __contains__(self, name) -> bool:
+        return name in self._store
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store)
+
+    def index(self, name, *args) -> int:
+        index = self._store.index_of(name)
+        if index is None:
+            raise ValueError(f"{name} is not a station")
+        return index
+
+
+class SqliteStationStore:
+    """Station catalog kept in SQLite, with the lookups of StationCatalog."""
+
+    def __init__(self, path: str):
+        """
+        Open or create the store.
+
+        Args:
+            path: Database file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        try:
+            self._conn.executescript(FTS_SCHEMA)
+            self.full_text = True
+        except sqlite3.OperationalError as e:
+            # SQLite built without FTS5, fall back to LIKE queries
+            logger.warning(f"FTS5 not available, station search uses plain matching: {e}")
+            self.full_text = False
+        self._count = self._query_one('SELECT COUNT(*) FROM stations')[0]
+
+    def refresh(self):
+        """Update the cached station count after changes by another process."""
+        self._count = self._query_one('SELECT COUNT(*) FROM stations')[0]
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._conn.close()
+
+    def _query_one(self, sql: str, parameters: tuple = ()) -> Optional[tuple]:
+        """Run a query and return its first row."""
+        with self._lock:
+            return self._conn.execute(sql, parameters).fetchone()
+
+    def _query_all(self, sql: str, parameters: tuple = ()) -> List[tuple]:
+        """Run a query and return all rows."""
+        with self._lock:
+            return self._conn.execute(sql, parameters).fetchall()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, name: str) -> bool:
+        return self.index_of(name) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for name, _, _ in self.entries():
+            yield name
+
+    def names(self) -> StationNames:
+        """Get all station names in display order, fetched on access."""
+        return StationNames(self)
+
+    def index_of(self, name: str) -> Optional[int]:
+        """
+        Get the position of a station.
+
+        Args:
+            name: Station name
+
+        Returns:
+            Index in display order, or None if unknown
+        """
+        row = self._query_one('SELECT position FROM stations WHERE name = ?', (name,))
+        return row[0] if row else None
+
+    def name_at(self, index: int) -> str:
+        """Get the name of the station at an index."""
+        row = self._query_one('SELECT name FROM stations WHERE position = ?', (index,))
+        if row is None:
+            raise IndexError(index)
+        return row[0]
+
+    def get_url(self, name: str) -> Optional[str]:
+        """
+        Get the stream URL of a station.
+
+        Args:
+            name: Station name
+
+        Returns:
+            URL, or None if unknown
+        """
+        row = self._query_one('SELECT url FROM stations WHERE name = ?', (name,))
+        return row[0] if row else None
+
+    @staticmethod
+    def _metadata_from_row(row: tuple) -> Dict:
+        """Build the metadata dictionary from the metadata columns and extra."""
+        metadata = {column: value for column, value in zip(METADATA_COLUMNS, row) if value is not None}
+        if row[len(METADATA_COLUMNS)]:
+            metadata.update(json.loads(row[len(METADATA_COLUMNS)]))
+        return metadata
+
+    def get_metadata(self, name: str) -> Dict:
+        """
+        Get the extended-format fields of a station.
+
+        Args:
+            name: Station name
+
+        Returns:
+            Metadata, empty if there is none or the station is unknown
+        """
+        row = self._query_one(f"SELECT {', '.join(METADATA_COLUMNS)}, extra FROM stations WHERE name = ?", (name,))
+        return self._metadata_from_row(row) if row else {}
+
+    def get_info(self, index: int) -> Dict:
+        """
+        Get a station as a dictionary for the API.
+
+        Args:
+            index: Station index
+
+        Returns:
+            Dictionary with name, url and metadata fields
+        """
+        row = self._query_one(f"SELECT name, url, {', '.join(METADATA_COLUMNS)}, extra FROM stations "
+                              f"WHERE position = ?", (index,))
+        if row is None:
+            raise IndexError(index)
+        return {**self._metadata_from_row(row[2:]), 'name': row[0], 'url': row[1]}
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        """Iterate over (name, url) pairs in display order."""
+        for name, url, _ in self.entries():
+            yield name, url
+
+    def entries(self) -> Iterator[Tuple[str, str, Dict]]:
+        """Iterate over (name, url, metadata) tuples in display order, one page at a time."""
+        position = 0
+        while True:
+            rows = self._query_all(f"SELECT position, name, url, {', '.join(METADATA_COLUMNS)}, extra FROM stations "
+                                   f"WHERE position >= ? ORDER BY position LIMIT ?", (position, PAGE_SIZE))
+            for row in rows:
+                yield row[1], row[2], self._metadata_from_row(row[3:])
+            if len(rows) < PAGE_SIZE:
+                return
+            position = rows[-1][0] + 1
+
+    def search(self, query: str, limit: int, offset: int = 0) -> Tuple[int, List[int]]:
+        """
+        Find stations whose name or metadata contain all words of the query.
+
+        Every word also matches as a prefix, so 'jaz' finds 'jazz'.
+
+        Args:
+            query: Search text, case-insensitive
+            limit: Maximum number of results
+            offset: Number of results to skip
+
+        Returns:
+            Tuple of (total number of matches, station indices of the requested page)
+        """
+        words = re.findall(r'\w+', query.lower())
+        if not words:
+            return 0, []
+
+        if self.full_text:
+            match = ' AND '.join(f'"{word}"*' for word in words)
+            total = self._query_one('SELECT COUNT(*) FROM stations_fts WHERE stations_fts MATCH ?', (match,))[0]
+            rows = self._query_all(
+                'SELECT s.position FROM stations_fts JOIN stations s ON s.id = stations_fts.rowid '
+                'WHERE stations_fts MATCH ? ORDER BY rank, s.position LIMIT ? OFFSET ?', (match, limit, offset))
+        else:
+            haystack = "lower(replace(name, '_', ' ') || ' ' || " + \
+                       " || ' ' || ".join(f"coalesce({column}, '')" for column in METADATA_COLUMNS) + ")"
+            condition = ' AND '.join(f"{haystack} LIKE ?" for _ in words)
+            parameters = tuple(f'%{word}%' for word in words)
+            total = self._query_one(f'SELECT COUNT(*) FROM stations WHERE {condition}', parameters)[0]
+            rows = self._query_all(f'SELECT position FROM stations WHERE {condition} ORDER BY position LIMIT ? OFFSET ?',
+                                   parameters + (limit, offset))
+        return total, [row[0] for row in rows]
+
+    def import_entries(self, entries: Iterable[Tuple[str, str, Dict]], replace: bool = False) -> int:
+        """
+        Add or update stations in a single transaction.
+
+        New stations are appended in order; existing names keep their
+        position and get the new URL and metadata.
+
+        Args:
+            entries: (name, url, metadata) tuples
+            replace: True to remove all existing stations first
+
+        Returns:
+            Number of stations imported
+        """
+        imported = 0
+        with self._lock, self._conn:
+            if replace:
+                self._conn.execute('DELETE FROM stations')
+                position = 0
+            else:
+                position = self._conn.execute('SELECT COALESCE(MAX(position) + 1, 0) FROM stations').fetchone()[0]
+
+            for name, url, metadata in entries:
+                metadata = dict(metadata)
+                values = [metadata.pop(column, None) for column in METADATA_COLUMNS]
+                if isinstance(values[-1], list):
+                    # Tags are stored as one searchable string
+                    values[-1] = ', '.join(str(tag) for tag in values[-1])
+                values.append(json.dumps(metadata) if metadata else None)
+
+                cursor = self._conn.execute(
+                    f"UPDATE stations SET url = ?, {', '.join(f'{column} = ?' for column in METADATA_COLUMNS)}, "
+                    f"extra = ? WHERE name = ?", [url] + values + [name])
+                if cursor.rowcount == 0:
+                    self._conn.execute(
+                        f"INSERT INTO stations (position, name, url, {', '.join(METADATA_COLUMNS)}, extra) "
+                        f"VALUES (?, ?, ?{', ?' * (len(METADATA_COLUMNS) + 1)})", [position, name, url] + values)
+                    position += 1
+                imported += 1
+
+            self._count = self._conn.execute('SELECT COUNT(*) FROM stations').fetchone()[0]
+        logger.info(f"Imported {imported} stations, {self._count} in store")
+        return imported
+
+    def import_file(self, path: str, replace: bool = False) -> int:
+        """
+        Import an M3U, PLS or JSON station list.
+
+        Args:
+            path: File to import
+            replace: True to remove all existing stations first
+
+        Returns:
+            Number of stations imported
+        """
+        return self.import_entries(parse_station_file(path), replace)
+
+    def export(self, output: IO[str], output_format: str = 'json'):
+        """
+        Write all stations without loading them into memory at once.
+
+        Args:
+            output: Text file to write to
+            output_format: 'json' (extended station format), 'm3u' or 'pls'
+        """
+        if output_format == 'json':
+            output.write('{')
+            for number, (name, url, metadata) in enumerate(self.entries()):
+                value = {'url': url, **metadata} if metadata else url
+                output.write(f"{',' if number else ''}\n  {json.dumps(name)}: {json.dumps(value)}")
+            output.write('\n}\n')
+        elif output_format == 'm3u':
+            output.write('#EXTM3U\n')
+            for name, url, metadata in self.entries():
+                genre = f' group-title="{metadata["genre"]}"' if metadata.get('genre') else ''
+                output.write(f"#EXTINF:-1{genre},{metadata.get('display_name', name)}\n{url}\n")
+        elif output_format == 'pls':
+            output.write('[playlist]\n')
+            count = 0
+            for count, (name, url, metadata) in enumerate(self.entries(), start=1):
+                output.write(f"File{count}={url}\nTitle{count}={metadata.get('display_name', name)}\n")
+            output.write(f"NumberOfEntries={count}\nVersion=2\n")
+        else:
+            raise ValueError(f"Unsupported export format: {output_format}")
+
+
+def main():
+    """Command line interface for importing, exporting and searching the store."""
+    parser = argparse.ArgumentParser(description="Manage the SQLite station store")
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), const.STATION_DB_FILE),
+                        help=f"database file (default: {const.STATION_DB_FILE})")
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_parser = commands.add_parser('import', help="import M3U, PLS or JSON station lists")
+    import_parser.add_argument('files', nargs='+')
+    import_parser.add_argument('--replace', action='store_true', help="remove all existing stations first")
+    export_parser = commands.add_parser('export', help="export all stations")
+    export_parser.add_argument('file', help="output file, - for stdout")
+    export_parser.add_argument('--format', choices=('json', 'm3u', 'pls'), default='json')
+    search_parser = commands.add_parser('search', help="search stations")
+    search_parser.add_argument('text')
+    search_parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format=const.LOG_FORMAT, datefmt=const.LOG_DATE_FORMAT)
+    store = SqliteStationStore(args.db)
+    try:
+        if args.command == 'import':
+            for number, path in enumerate(args.files):
+                store.import_file(path, replace=args.replace and number == 0)
+        elif args.command == 'export':
+            if args.file == '-':
+                store.export(sys.stdout, args.format)
+            else:
+                with open(args.file, 'w', encoding='utf-8') as f:
+                    store.export(f, args.format)
+        elif args.command == 'search':
+            total, indices = store.search(args.text, args.limit)
+            for index in indices:
+                info = store.get_info(index)
+                print(f"{info['name']:<40} {info.get('genre', ''):<16} {info['url']}")
+            print(f"{total} matches")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
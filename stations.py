@@ -1,15 +1,88 @@
 """
 Radio station management module.
-Handles loading and merging of default and custom radio stations.
+Handles loading and merging of default and custom radio stations, or opens
+the SQLite station store when STATION_BACKEND is 'sqlite'.
 """
 import json
 import os
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 import logging
 
+import constants as const
+from catalog import StationCatalog
+
 logger = logging.getLogger(__name__)
 
 
+def normalize_stations(stations_data: Dict) -> List[Tuple[str, str, Dict]]:
+    """
+    Normalize station data to (name, url, metadata) entries.
+
+    Supports both formats:
+    - Simple: {"station_name": "url"}
+    - Extended: {"station_name": {"url": "...", "display_name": "...", "genre": "..."}}
+
+    Extended entries may list "variants" of the stream at different bitrates
+    instead of, or in addition to, a url. Without a url the highest bitrate
+    variant is the station URL.
+
+    Args:
+        stations_data: Raw station data from JSON
+
+    Returns:
+        List of (station_name, url, metadata) tuples; metadata holds the
+        extended-format fields other than url
+    """
+    normalized = []
+
+    for key, value in stations_data.items():
+        if isinstance(value, str):
+            # Simple format: direct URL
+            normalized.append((key, value, {}))
+        elif isinstance(value, dict) and ('url' in value or 'variants' in value):
+            # Extended format: keep the other fields as metadata
+            metadata = {field: item for field, item in value.items() if field != 'url'}
+            if 'variants' in value:
+                metadata['variants'] = normalize_variants(key, value['variants'])
+            url = value.get('url') or (metadata['variants'][0]['url'] if metadata.get('variants') else None)
+            if url is None:
+                logger.warning(f"Station '{key}' has no valid URL or variant")
+                continue
+            if not metadata.get('variants'):
+                metadata.pop('variants', None)
+            normalized.append((key, url, metadata))
+        else:
+            logger.warning(f"Invalid station format for '{key}': {value}")
+
+    return normalized
+
+
+def normalize_variants(station_name: str, variants) -> List[Dict]:
+    """
+    Normalize the bitrate variants of a station, best first.
+
+    Args:
+        station_name: Station the variants belong to, for warnings
+        variants: List of {"url": "...", "bitrate": kbps} entries
+
+    Returns:
+        Valid variants as {"url", "bitrate"} dictionaries, by descending bitrate
+    """
+    if not isinstance(variants, list):
+        logger.warning(f"Variants of '{station_name}' must be a list: {variants}")
+        return []
+
+    normalized = []
+    for variant in variants:
+        if (isinstance(variant, dict) and isinstance(variant.get('url'), str)
+                and isinstance(variant.get('bitrate'), (int, float)) and variant['bitrate'] > 0):
+            normalized.append({'url': variant['url'], 'bitrate': int(variant['bitrate'])})
+        else:
+            logger.warning(f"Invalid variant for '{station_name}', url and bitrate are required: {variant}")
+    normalized.sort(key=lambda variant: variant['bitrate'], reverse=True)
+    return normalized
+
+
 class StationManager:
     """Manages radio stations from default and custom configuration files."""
 
@@ -27,15 +100,19 @@ class StationManager:
         self.base_dir = base_dir
         self.default_stations_file = os.path.join(base_dir, 'default_stations.json')
         self.custom_stations_file = os.path.join(base_dir, 'custom_stations.json')
-        self._stations: Dict[str, str] = {}
+        self.station_db_file = os.path.join(base_dir, const.STATION_DB_FILE)
+        # StationCatalog, or SqliteStationStore with the sqlite backend; both have the same lookups
+        self.catalog = StationCatalog()
+        self._reload_listeners: List[Callable[[], None]] = []
         self._load_stations()
 
-    def _load_json_file(self, filepath: str) -> Dict[str, any]:
+    def _load_json_file(self, filepath: str, strict: bool = False) -> Dict[str, any]:
         """
         Load a JSON file safely.
 
         Args:
             filepath: Path to the JSON file
+            strict: True to raise on invalid files instead of returning an empty dict
 
         Returns:
             Dictionary with loaded data, or empty dict if file doesn't exist or is invalid
@@ -51,61 +128,68 @@ class StationManager:
                 return data
         except json.JSONDecodeError as e:
             logger.error(f"Invalid JSON in {filepath}: {e}")
+            if strict:
+                raise
             return {}
         except Exception as e:
             logger.error(f"Error loading {filepath}: {e}")
+            if strict:
+                raise
             return {}
 
-    def _normalize_stations(self, stations_data: Dict) -> Dict[str, str]:
+    def _load_stations(self, strict: bool = False):
         """
-        Normalize station data to simple key-url mapping.
-
-        Supports both formats:
-        - Simple: {"station_name": "url"}
-        - Extended: {"station_name": {"url": "...", "display_name": "..."}}
+        Load custom stations if available, otherwise fall back to default stations.
 
         Args:
-            stations_data: Raw station data from JSON
-
-        Returns:
-            Normalized dictionary with station_name: url mapping
+            strict: True to raise on invalid station files, e.g. a half-edited file on reload
         """
-        normalized = {}
-
-        for key, value in stations_data.items():
-            if isinstance(value, str):
-                # Simple format: direct URL
-                normalized[key] = value
-            elif isinstance(value, dict) and 'url' in value:
-                # Extended format: extract URL
-                normalized[key] = value['url']
-            else:
-                logger.warning(f"Invalid station format for '{key}': {value}")
-
-        return normalized
+        if const.STATION_BACKEND == 'sqlite':
+            self._open_store()
+            return
 
-    def _load_stations(self):
-        """Load custom stations if available, otherwise fall back to default stations."""
         # Load custom stations first
-        custom_data = self._load_json_file(self.custom_stations_file)
-        custom_stations = self._normalize_stations(custom_data)
+        custom_data = self._load_json_file(self.custom_stations_file, strict)
+        custom_stations = normalize_stations(custom_data)
 
         # If custom stations exist, use only those
         if custom_stations:
-            self._stations = custom_stations
+            self.catalog = StationCatalog(custom_stations)
             logger.info(f"Using custom stations only (default stations ignored)")
         else:
             # Fall back to default stations if no custom stations
-            default_data = self._load_json_file(self.default_stations_file)
-            default_stations = self._normalize_stations(default_data)
-            self._stations = default_stations
+            default_data = self._load_json_file(self.default_stations_file, strict)
+            default_stations = normalize_stations(default_data)
+            self.catalog = StationCatalog(default_stations)
             logger.info(f"No custom stations found, using default stations")
 
-        logger.info(f"Total stations loaded: {len(self._stations)}")
+        logger.info(f"Total stations loaded: {len(self.catalog)}")
 
-        if not self._stations:
+        if not self.catalog:
             logger.warning("No stations loaded! Check your station files.")
 
+    def _open_store(self):
+        """Open the SQLite station store, seeding it from the JSON station files when empty."""
+        # Imported here because station_store uses normalize_stations from this module
+        from station_store import SqliteStationStore
+
+        if isinstance(self.catalog, SqliteStationStore):
+            # Pick up imports made with the command line tool since the last load
+            self.catalog.refresh()
+        else:
+            self.catalog = SqliteStationStore(self.station_db_file)
+
+        if not self.catalog:
+            stations = normalize_stations(self._load_json_file(self.custom_stations_file))
+            if not stations:
+                stations = normalize_stations(self._load_json_file(self.default_stations_file))
+            self.catalog.import_entries(stations)
+
+        logger.info(f"Total stations in {os.path.basename(self.station_db_file)}: {len(self.catalog)}")
+
+        if not self.catalog:
+            logger.warning("No stations loaded! Import stations with station_store.py.")
+
     def get_stations(self) -> Dict[str, str]:
         """
         Get all loaded stations.
@@ -113,7 +197,7 @@ class StationManager:
         Returns:
             Dictionary mapping station names to URLs
         """
-        return self._stations.copy()
+        return dict(self.catalog.items())
 
     def get_station_names(self) -> list:
         """
@@ -122,7 +206,43 @@ class StationManager:
         Returns:
             List of station name strings
         """
-        return list(self._stations.keys())
+        return self.catalog.names()
+
+    def get_station_index(self, station_name: str) -> Optional[int]:
+        """
+        Get the position of a station in the station list.
+
+        Args:
+            station_name: Name of the station
+
+        Returns:
+            Index of the station, or None if station not found
+        """
+        return self.catalog.index_of(station_name)
+
+    def get_station_metadata(self, station_name: str) -> Dict:
+        """
+        Get the extended-format fields of a station, e.g. display_name or genre.
+
+        Args:
+            station_name: Name of the station
+
+        Returns:
+            Metadata dictionary, empty if the station has none
+        """
+        return self.catalog.get_metadata(station_name)
+
+    def get_station_variants(self, station_name: str) -> List[Dict]:
+        """
+        Get the bitrate variants of a station.
+
+        Args:
+            station_name: Name of the station
+
+        Returns:
+            List of {"url", "bitrate"} dictionaries, best first; empty for single-stream stations
+        """
+        return self.catalog.get_metadata(station_name).get('variants') or []
 
     def get_station_url(self, station_name: str) -> Optional[str]:
         """
@@ -134,7 +254,7 @@ class StationManager:
         Returns:
             Station URL or None if station not found
         """
-        return self._stations.get(station_name)
+        return self.catalog.get_url(station_name)
 
     def is_valid_station(self, station_name: str) -> bool:
         """
@@ -146,9 +266,49 @@ class StationManager:
         Returns:
             True if station exists, False otherwise
         """
-        return station_name in self._stations
+        return station_name in self.catalog
+
+    def add_reload_listener(self, callback: Callable[[], None]):
+        """
+        Register a function to call after stations have been reloaded.
 
-    def reload(self):
-        """Reload stations from files."""
+        Args:
+            callback: Function without arguments
+        """
+        self._reload_listeners.append(callback)
+
+    def get_watched_files(self) -> List[str]:
+        """
+        Get the files the station list is loaded from.
+
+        Returns:
+            Paths of the station files, or of the database with the sqlite backend
+        """
+        if const.STATION_BACKEND == 'sqlite':
+            # Imports commit to the write-ahead log first
+            return [self.station_db_file, self.station_db_file + '-wal']
+        return [self.custom_stations_file, self.default_stations_file]
+
+    def reload(self) -> bool:
+        """
+        Reload stations from files.
+
+        The new catalog replaces the old one in a single assignment, and the
+        current stations are kept if a file cannot be read.
+
+        Returns:
+            True if the stations were reloaded
+        """
         logger.info("Reloading stations...")
-        self._load_stations()
+        try:
+            self._load_stations(strict=True)
+        except Exception as e:
+            logger.error(f"Keeping current stations, reload failed: {e}")
+            return False
+
+        for callback in self._reload_listeners:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Error in station reload listener: {e}")
+        return True
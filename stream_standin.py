@@ -0,0 +1,290 @@
+"""
+Stand-in stream server for benchmarks.
+Serves audio the way an Icecast server does, from synthetic MP3 frames or
+canned files, on localhost so benchmarks need no network access. Faults are
+chosen per request through the query string of /stream/<name>:
+
+    delay       seconds before the response headers are sent
+    rate        bytes per second after the burst (default: the stream bitrate)
+    burst       bytes sent at once on connect (default: 64 KB, like Icecast)
+    drop_after  close the connection after this many bytes
+    redirect    number of 302 hops before the stream is served
+    media       canned file from the media directory instead of synthetic MP3
+
+/playlist/<name>.m3u and /playlist/<name>.pls return playlists pointing to
+/stream/<name> with the same query string. Clients sending 'Icy-MetaData: 1'
+get ICY metadata with a title that changes every TITLE_INTERVAL seconds.
+
+Usage: python stream_standin.py [--port PORT] [--media DIR]
+"""
+import argparse
+import logging
+import mimetypes
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+logger = logging.getLogger(__name__)
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, mono, no CRC. All-zero side info and
+# main data decode as silence, and 417 bytes is the exact frame length.
+MP3_FRAME = bytes([0xFF, 0xFB, 0x90, 0xC4]) + bytes(413)
+MP3_FRAME_SECONDS = 1152 / 44100
+MP3_BYTES_PER_SECOND = int(len(MP3_FRAME) / MP3_FRAME_SECONDS)
+
+DEFAULT_BURST = 64 * 1024
+ICY_METAINT = 16000
+TITLE_INTERVAL = 10  # seconds between ICY title changes
+CHUNK_SIZE = 4096
+
+
+def synthetic_mp3(seconds: float = 10) -> bytes:
+    """
+    Build a silent MP3 stream.
+
+    Args:
+        seconds: Approximate duration
+
+    Returns:
+        Concatenated MP3 frames, safe to loop
+    """
+    return MP3_FRAME * max(1, int(seconds / MP3_FRAME_SECONDS))
+
+
+def icy_metadata_block(title: str) -> bytes:
+    """
+    Encode an ICY metadata block.
+
+    Args:
+        title: Stream title
+
+    Returns:
+        Length byte followed by the padded metadata
+    """
+    text = f"StreamTitle='{title}';".encode('utf-8')
+    blocks = (len(text) + 15) // 16
+    return bytes([blocks]) + text.ljust(blocks * 16, b'\0')
+
+
+class StandinServer:
+    """Local Icecast-like server with configurable faults."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, media_dir: Optional[str] = None):
+        """
+        Initialize the StandinServer.
+
+        Args:
+            host: Address to listen on
+            port: Port to listen on, 0 for any free port
+            media_dir: Directory with canned audio files
+        """
+        self.host = host
+        self.port = port
+        self.media_dir = media_dir
+        self.server: Optional[ThreadingHTTPServer] = None
+        self._media: Dict[str, bytes] = {'': synthetic_mp3()}
+        # Connections served, per stream name
+        self.connections: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start serving in a background thread."""
+        self.server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        thread = threading.Thread(target=self.server.serve_forever, name="standin", daemon=True)
+        thread.start()
+        logger.info(f"Stand-in stream server listening on {self.host}:{self.port}")
+
+    def stop(self):
+        """Stop the server."""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def url(self, name: str, **params) -> str:
+        """
+        Get the URL of a stand-in stream.
+
+        Args:
+            name: Stream name, only used for logging and connection counts
+            **params: Faults, see the module docstring
+
+        Returns:
+            Stream URL
+        """
+        query = f"?{urlencode(params)}" if params else ''
+        return f"http://{self.host}:{self.port}/stream/{name}{query}"
+
+    def playlist_url(self, name: str, extension: str = 'm3u', **params) -> str:
+        """
+        Get the URL of a playlist pointing to a stand-in stream.
+
+        Args:
+            name: Stream name
+            extension: 'm3u' or 'pls'
+            **params: Faults of the stream, see the module docstring
+
+        Returns:
+            Playlist URL
+        """
+        query = f"?{urlencode(params)}" if params else ''
+        return f"http://{self.host}:{self.port}/playlist/{name}.{extension}{query}"
+
+    def _load_media(self, filename: str) -> Optional[bytes]:
+        """
+        Load a canned file from the media directory.
+
+        Args:
+            filename: File name inside the media directory
+
+        Returns:
+            File contents, or None if not found
+        """
+        if filename in self._media:
+            return self._media[filename]
+        if self.media_dir is None or os.path.basename(filename) != filename:
+            return None
+        path = os.path.join(self.media_dir, filename)
+        if not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            data = f.read()
+        self._media[filename] = data
+        return data
+
+    def _count_connection(self, name: str):
+        """Count a served connection."""
+        with self._lock:
+            self.connections[name] = self.connections.get(name, 0) + 1
+
+    def _make_handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                if url.path.startswith('/stream/'):
+                    self._stream(url.path[len('/stream/'):], params)
+                elif url.path.startswith('/playlist/'):
+                    self._playlist(url.path[len('/playlist/'):], url.query)
+                else:
+                    self.send_error(404)
+
+            def _playlist(self, filename: str, query: str):
+                name, _, extension = filename.rpartition('.')
+                stream_url = f"http://{standin.host}:{standin.port}/stream/{name}" + (f"?{query}" if query else '')
+                if extension == 'm3u':
+                    body, content_type = f"#EXTM3U\n{stream_url}\n", 'audio/x-mpegurl'
+                elif extension == 'pls':
+                    body, content_type = f"[playlist]\nFile1={stream_url}\nNumberOfEntries=1\n", 'audio/x-scpls'
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode()
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, name: str, params: Dict[str, str]):
+                time.sleep(float(params.get('delay', 0)))
+
+                redirects = int(params.get('redirect', 0))
+                if redirects > 0:
+                    params['redirect'] = str(redirects - 1)
+                    self.send_response(302)
+                    self.send_header('Location', standin.url(name, **params))
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                media = params.get('media', '')
+                data = standin._load_media(media)
+                if data is None:
+                    self.send_error(404, f"unknown media {media}")
+                    return
+                content_type = 'audio/mpeg' if not media else mimetypes.guess_type(media)[0] or 'application/octet-stream'
+
+                icy = self.headers.get('Icy-MetaData') == '1'
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('icy-name', f"Stand-in {name}")
+                self.send_header('icy-br', '128')
+                if icy:
+                    self.send_header('icy-metaint', str(ICY_METAINT))
+                self.end_headers()
+                standin._count_connection(name)
+
+                rate = float(params.get('rate', MP3_BYTES_PER_SECOND))
+                burst = int(params.get('burst', DEFAULT_BURST))
+                drop_after = int(params['drop_after']) if 'drop_after' in params else None
+                try:
+                    self._send_audio(name, data, rate, burst, drop_after, icy)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def _send_audio(self, name: str, data: bytes, rate: float, burst: int,
+                            drop_after: Optional[int], icy: bool):
+                started_at = time.monotonic()
+                sent = 0
+                position = 0
+                until_metadata = ICY_METAINT
+                while drop_after is None or sent < drop_after:
+                    size = CHUNK_SIZE
+                    if drop_after is not None:
+                        size = min(size, drop_after - sent)
+                    if icy:
+                        size = min(size, until_metadata)
+                    chunk = data[position:position + size]
+                    if len(chunk) < size:
+                        chunk += data[:size - len(chunk)]
+                    position = (position + size) % len(data)
+
+                    # Pace everything after the burst at the configured rate
+                    due = started_at + max(0, sent + size - burst) / rate
+                    delay = due - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+
+                    self.wfile.write(chunk)
+                    sent += size
+                    if icy:
+                        until_metadata -= size
+                        if until_metadata == 0:
+                            track = int((time.monotonic() - started_at) // TITLE_INTERVAL) + 1
+                            self.wfile.write(icy_metadata_block(f"Stand-in {name} - Track {track}"))
+                            until_metadata = ICY_METAINT
+
+            def log_message(self, format, *args):
+                logger.debug(f"Stand-in: {format % args}")
+
+        return Handler
+
+
+def main():
+    """Run the stand-in server in the foreground."""
+    parser = argparse.ArgumentParser(description="Local Icecast-like stand-in stream server")
+    parser.add_argument('--port', type=int, default=8000, help="port to listen on (default: 8000)")
+    parser.add_argument('--media', help="directory with canned audio files")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    server = StandinServer(port=args.port, media_dir=args.media)
+    server.start()
+    print(f"Try: mpv {server.url('test')}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Stream supervisor.
+Watches the playing stream for decoder exits and stalled input, reconnects
+with jittered exponential backoff and keeps reliability statistics.
+"""
+import collections
+import logging
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+import constants as const
+
+logger = logging.getLogger(__name__)
+
+
+class StreamSupervisor:
+    """Background watchdog that keeps the requested station playing."""
+
+    def __init__(self, player):
+        """
+        Initialize the StreamSupervisor.
+
+        Args:
+            player: RadioPlayer instance to supervise
+        """
+        self.player = player
+        self.reconnects = 0
+        self.station_failures: Dict[str, int] = collections.Counter()
+        # Recent outages as (station, seconds)
+        self.outages = collections.deque(maxlen=const.SUPERVISOR_OUTAGE_HISTORY)
+        self.total_outage_seconds = 0.0
+
+        # Guards the stall tracking and the outage and attempt state, which the
+        # watchdog thread and the NetworkMonitor callback both update
+        self._lock = threading.Lock()
+        self._reconnecting = False
+        self._started_at = time.monotonic()
+        self._last_bytes: Optional[int] = None
+        self._last_progress_at = time.monotonic()
+        self._outage_started_at: Optional[float] = None
+        self._outage_station: Optional[str] = None
+        self._attempt = 0
+        self._next_attempt_at = 0.0
+        self.network_online = True
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="supervisor", daemon=True)
+
+    def start(self):
+        """Start watching in the background."""
+        self._thread.start()
+
+    def stop(self):
+        """Stop the watchdog thread."""
+        self._stop.set()
+
+    def on_stream_started(self):
+        """Reset stall tracking when a stream is started. Called by RadioPlayer."""
+        with self._lock:
+            self._started_at = time.monotonic()
+            self._last_bytes = None
+            self._last_progress_at = self._started_at
+            if not self._reconnecting:
+                # A user action replaces whatever outage was going on
+                self._end_outage(recovered=False)
+
+    def on_network_change(self, online: bool, address_changed: bool):
+        """
+        Pause reconnects while offline and reconnect at once when the network returns.
+
+        Called by NetworkMonitor on its thread.
+
+        Args:
+            online: True if the network is reachable
+            address_changed: True if the local IP address changed
+        """
+        self.network_online = online
+        if not online or not self.player.is_playing():
+            return
+        # A new address breaks the existing connection even if data still seems to flow
+        problem = "address changed" if address_changed else None
+        if problem is None:
+            with self._lock:
+                in_outage = self._outage_started_at is not None
+            problem = "network restored" if in_outage else self._find_problem(time.monotonic())
+        if problem is None:
+            return
+
+        station = self.player.playing_station
+        with self._lock:
+            if self._outage_started_at is None:
+                self._start_outage(station, time.monotonic())
+            # The outage was the network, not the station: retry it without backoff
+            self._attempt = 0
+            skip = self._count_attempt(station, problem)
+        self._reconnect(station, skip)
+
+    def _run(self):
+        """Watchdog loop."""
+        while not self._stop.wait(const.SUPERVISOR_INTERVAL):
+            try:
+                self._check()
+                # The watchdog tick doubles as the health and title sampling for /events
+                self.player.publish_health()
+                self.player.check_title()
+            except Exception as e:
+                logger.error(f"Supervisor error: {e}")
+
+    def _check(self):
+        """Check the current stream once and reconnect if it failed."""
+        if not self.player.is_playing():
+            return
+
+        now = time.monotonic()
+        problem = self._find_problem(now)
+        station = self.player.playing_station
+
+        with self._lock:
+            if problem is None:
+                if self._outage_started_at is not None and now - self._started_at >= const.SUPERVISOR_START_GRACE:
+                    self._end_outage(recovered=True)
+                return
+
+            if self._outage_started_at is None:
+                logger.warning(f"Stream problem on {station}: {problem}")
+                self._start_outage(station, now)
+
+            if not self.network_online:
+                # Reconnecting cannot succeed, on_network_change() retries when the network returns
+                return
+            if now < self._next_attempt_at:
+                return
+            skip = self._count_attempt(station, problem)
+        self._reconnect(station, skip)
+
+    def _find_problem(self, now: float) -> Optional[str]:
+        """
+        Look for a reason the current stream is not playing.
+
+        Args:
+            now: Current monotonic time
+
+        Returns:
+            Description of the problem, or None if the stream looks healthy
+        """
+        backend = self.player.backend
+        if backend is not None and not backend.is_alive():
+            return "decoder stopped"
+
+        stream = self.player.get_current_relay_stream()
+        if stream is None:
+            return None
+
+        with self._lock:
+            if stream.bytes_received != self._last_bytes:
+                self._last_bytes = stream.bytes_received
+                self._last_progress_at = now
+            stalled_for = now - max(self._last_progress_at, self._started_at)
+
+        if stalled_for >= const.SUPERVISOR_STALL_TIMEOUT:
+            return f"no data for {stalled_for:.0f}s"
+        return None
+
+    def _start_outage(self, station: Optional[str], now: float):
+        """
+        Open an outage with the first attempt due at once. Caller holds the lock.
+
+        Args:
+            station: Station that failed
+            now: Current monotonic time
+        """
+        self._outage_started_at = now
+        self._outage_station = station
+        self._attempt = 0
+        self._next_attempt_at = now
+
+    def _count_attempt(self, station: Optional[str], problem: str) -> bool:
+        """
+        Count a reconnect attempt and schedule the next one. Caller holds the lock.
+
+        Args:
+            station: Station that failed
+            problem: Description of the failure
+
+        Returns:
+            True to move on to the next station after repeated failures, False to restart this one
+        """
+        if station is not None:
+            self.station_failures[station] += 1
+        self._attempt += 1
+        self.reconnects += 1
+
+        # Jittered exponential backoff before the next attempt
+        delay = min(const.SUPERVISOR_BACKOFF_MAX, const.SUPERVISOR_BACKOFF_BASE * 2 ** (self._attempt - 1))
+        self._next_attempt_at = time.monotonic() + delay * random.uniform(0.5, 1.5)
+
+        skip = const.SUPERVISOR_SKIP_FAILED_STATIONS and self._attempt > const.SUPERVISOR_MAX_ATTEMPTS
+        if skip:
+            logger.warning(f"{station} failed {self._attempt - 1} times, moving to next station")
+            self._attempt = 0
+        else:
+            logger.info(f"Reconnecting {station} (attempt {self._attempt}, {problem})")
+        return skip
+
+    def _reconnect(self, station: Optional[str], skip: bool):
+        """
+        Restart the stream, or move on to the next station. Called without the lock,
+        since the restart reports back through on_stream_started().
+
+        Args:
+            station: Station that failed
+            skip: True to move on to the next station
+        """
+        if self.player.executor is not None:
+            # Queue behind user commands so a reconnect never races a station switch
+            self.player.executor.submit('reconnect', self._restart, station, skip)
+        else:
+            self._restart(station, skip)
+
+    def _restart(self, station: Optional[str], skip: bool):
+        """
+        Restart the failed station or skip to the next one.
+
+        Args:
+            station: Station that failed
+            skip: True to move on to the next station
+        """
+        if self.player.playing_station != station or self.player.is_paused():
+            # The user switched, stopped or paused while this reconnect was queued
+            return
+        self._reconnecting = True
+        try:
+            if skip:
+                self.player.next_station()
+            elif station is not None:
+                # The cached endpoint may be what failed, reconnect through the station URL
+                self.player.forget_resolved_url(station)
+                self.player.start_stream(station, announce=False)
+        finally:
+            self._reconnecting = False
+
+    def _end_outage(self, recovered: bool):
+        """
+        Close the current outage and record its duration. Caller holds the lock.
+
+        Args:
+            recovered: True if the stream came back, False if it was replaced by the user
+        """
+        if self._outage_started_at is None:
+            return
+        duration = time.monotonic() - self._outage_started_at
+        station = self._outage_station
+        self.outages.append((station, round(duration, 1)))
+        self.total_outage_seconds += duration
+        self._outage_started_at = None
+        self._attempt = 0
+        if recovered:
+            logger.info(f"Stream recovered after {duration:.1f}s outage on {station}")
+
+    def get_stats(self) -> Dict:
+        """
+        Get reliability statistics.
+
+        Returns:
+            Dictionary with reconnect count, outage durations and failures per station
+        """
+        with self._lock:
+            outage = self._outage_started_at
+            return {
+                'reconnects': self.reconnects,
+                'in_outage': outage is not None,
+                'current_outage_seconds': round(time.monotonic() - outage, 1) if outage is not None else None,
+                'total_outage_seconds': round(self.total_outage_seconds, 1),
+                'recent_outages': [{'station': station, 'seconds': seconds} for station, seconds in self.outages],
+                'station_failures': dict(self.station_failures),
+            }
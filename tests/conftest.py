@@ -0,0 +1,9 @@
+"""
+Shared test setup.
+The modules live at the top level of the repository, so it is put on the
+import path here.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
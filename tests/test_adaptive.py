@@ -0,0 +1,141 @@
+"""Tests for the bitrate variant selection."""
+import pytest
+
+import adaptive
+import constants as const
+from adaptive import VariantSelector
+
+VARIANTS = [{'url': 'http://s/320', 'bitrate': 320}, {'url': 'http://s/128', 'bitrate': 128},
+            {'url': 'http://s/64', 'bitrate': 64}]
+
+
+class Clock:
+    """Monotonic clock moved by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Link:
+    """Stream whose bytes arrive at a set rate, measured by the selector."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.kbps = 0
+        self.bytes_received = 0
+        self.underruns = 0
+        self._last = clock.now
+
+    def measure(self):
+        self.bytes_received += int((self.clock.now - self._last) * self.kbps * 1000 / 8)
+        self._last = self.clock.now
+        return self.bytes_received, self.underruns
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(adaptive.time, 'monotonic', clock)
+    return clock
+
+
+def run(selector, clock, link, seconds, step=2.0):
+    """Sample for a while and return the stations the selector asked to restart."""
+    restarts = []
+    for _ in range(int(seconds / step)):
+        clock.now += step
+        station = selector.sample()
+        if station is not None:
+            restarts.append(station)
+            # The player restarts the station with the new ceiling
+            selector.choose(station, VARIANTS)
+            link.bytes_received = 0
+    return restarts
+
+
+def test_index_follows_the_ceiling():
+    selector = VariantSelector(lambda: None)
+    assert selector.index_for(VARIANTS) == 0
+    selector.ceiling_kbps = 128
+    assert selector.index_for(VARIANTS) == 1
+    selector.ceiling_kbps = 100
+    assert selector.index_for(VARIANTS) == 2
+    selector.ceiling_kbps = 32
+    assert selector.index_for(VARIANTS) == 2
+    assert selector.index_for([]) == 0
+
+
+def test_slow_link_steps_down_to_what_fits(clock):
+    link = Link(clock)
+    selector = VariantSelector(link.measure)
+    selector.choose('jazz', VARIANTS)
+    link.kbps = 170
+    restarts = run(selector, clock, link, const.ADAPTIVE_START_GRACE + const.ADAPTIVE_WINDOW + 4)
+    assert restarts == ['jazz']
+    # 170 kbps carries 128 kbps within the safety margin
+    assert selector.ceiling_kbps == 128
+    assert selector.index == 1
+    assert selector.step_downs == 1
+
+
+def test_underruns_step_down(clock):
+    link = Link(clock)
+    selector = VariantSelector(link.measure)
+    selector.choose('jazz', VARIANTS)
+    link.kbps = 320
+    run(selector, clock, link, const.ADAPTIVE_START_GRACE + 2)
+    link.underruns += const.ADAPTIVE_UNDERRUNS_DOWN
+    assert run(selector, clock, link, 2) == ['jazz']
+    assert selector.index == 1
+    assert 'underruns' in selector.reason
+
+
+def test_single_underrun_delays_step_up(clock):
+    link = Link(clock)
+    selector = VariantSelector(link.measure)
+    selector.ceiling_kbps = 128
+    selector.choose('jazz', VARIANTS)
+    link.kbps = 320
+    run(selector, clock, link, const.ADAPTIVE_UP_HOLD / 2)
+    link.underruns += 1
+    assert run(selector, clock, link, const.ADAPTIVE_UP_HOLD / 2 + 4) == []
+    # Stable again once the underrun left the window
+    assert run(selector, clock, link, const.ADAPTIVE_UP_HOLD / 2 + const.ADAPTIVE_WINDOW) == ['jazz']
+    assert selector.ceiling_kbps is None
+    assert selector.index == 0
+
+
+def test_failed_step_up_doubles_the_wait(clock):
+    link = Link(clock)
+    selector = VariantSelector(link.measure)
+    selector.ceiling_kbps = 128
+    selector.choose('jazz', VARIANTS)
+    link.kbps = 200
+    assert run(selector, clock, link, const.ADAPTIVE_UP_HOLD + 2) == ['jazz']
+    assert selector.index == 0
+    # 200 kbps does not carry 320 kbps, so the step up does not hold
+    assert run(selector, clock, link, const.ADAPTIVE_START_GRACE + const.ADAPTIVE_WINDOW + 4) == ['jazz']
+    assert selector.index == 1
+    assert selector._up_hold == 2 * const.ADAPTIVE_UP_HOLD
+    assert run(selector, clock, link, const.ADAPTIVE_UP_HOLD + 2) == []
+
+
+def test_single_stream_station_is_measured_but_not_switched(clock):
+    link = Link(clock)
+    selector = VariantSelector(link.measure)
+    selector.choose('talk', [])
+    link.kbps = 10
+    assert run(selector, clock, link, 60) == []
+    assert selector.get_stats()['throughput_kbps'] == 10
+    assert selector.get_stats()['bitrate_kbps'] is None
+
+
+def test_paused_playback_is_not_measured(clock):
+    selector = VariantSelector(lambda: None)
+    selector.choose('jazz', VARIANTS)
+    clock.now += 60
+    assert selector.sample() is None
+    assert selector.get_stats()['throughput_kbps'] is None
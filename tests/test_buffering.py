@@ -0,0 +1,66 @@
+"""Tests for the memory-budgeted buffer sizes and memory levels."""
+import pytest
+
+import buffering
+import constants as const
+from buffering import BufferPolicy, read_meminfo
+
+
+@pytest.fixture
+def policy(monkeypatch):
+    monkeypatch.setattr(const, 'BUFFER_MEMORY_BUDGET', 16 * 1024 * 1024)
+    return BufferPolicy()
+
+
+def test_read_meminfo(tmp_path):
+    meminfo = tmp_path / 'meminfo'
+    meminfo.write_text("MemTotal:        3884136 kB\nMemAvailable:    1000 kB\nHugePages_Total:       0\n")
+    info = read_meminfo(str(meminfo))
+    assert info == {'MemTotal': 3884136 * 1024, 'MemAvailable': 1000 * 1024, 'HugePages_Total': 0}
+    assert read_meminfo(str(tmp_path / 'missing')) == {}
+
+
+def test_budget_is_a_share_of_ram_up_to_the_maximum(monkeypatch):
+    monkeypatch.setattr(const, 'BUFFER_MEMORY_BUDGET', None)
+    assert BufferPolicy._compute_budget(128 * 1024 * 1024) == int(128 * 1024 * 1024 * const.BUFFER_MEMORY_FRACTION)
+    assert BufferPolicy._compute_budget(8 * 1024 * 1024 * 1024) == const.BUFFER_MEMORY_MAX
+    assert BufferPolicy._compute_budget(None) == const.BUFFER_MEMORY_MAX
+
+
+def test_levels_drop_at_once_and_recover_with_hysteresis(policy):
+    pressure, critical = const.BUFFER_PRESSURE_AVAILABLE, const.BUFFER_CRITICAL_AVAILABLE
+    recover = const.BUFFER_RECOVER_FACTOR
+    levels = []
+    for fraction in (0.5, pressure * 0.9, critical * 0.9, critical * 1.1, critical * recover * 1.1,
+                     pressure * 1.1, pressure * recover * 1.1):
+        policy.level = policy._next_level(fraction)
+        levels.append(policy.level)
+    assert levels == ['normal', 'pressure', 'critical', 'critical', 'pressure', 'pressure', 'normal']
+
+
+def test_buffers_shrink_with_the_level(policy):
+    sizes = {}
+    for level in ('normal', 'pressure', 'critical'):
+        policy.level = level
+        sizes[level] = (policy.decoder_buffer_bytes(128), policy.warm_buffer_bytes(), policy.timeshift_bytes())
+    for index in range(3):
+        assert sizes['normal'][index] >= sizes['pressure'][index] >= sizes['critical'][index]
+        assert sizes['critical'][index] >= const.BUFFER_MIN_BYTES
+    assert sizes['pressure'][2] == sizes['normal'][2] // 2
+
+
+def test_decoder_buffer_follows_the_bitrate(policy):
+    assert policy.decoder_buffer_bytes(64) < policy.decoder_buffer_bytes(128)
+    assert policy.decoder_buffer_bytes(10000) == int(policy.budget_bytes * const.BUFFER_DECODER_SHARE)
+
+
+def test_sample_changes_level_and_counts_shrinks(policy, monkeypatch):
+    policy.total_bytes = 1000
+    available = {'MemAvailable': 500}
+    monkeypatch.setattr(buffering, 'read_meminfo', lambda: available)
+    assert not policy.sample()
+    available['MemAvailable'] = 10
+    assert policy.sample()
+    assert policy.level == 'critical'
+    assert policy.min_available_bytes == 10
+    assert policy.get_stats()['level'] == 'critical'
@@ -0,0 +1,43 @@
+"""Tests for the station catalog search."""
+from catalog import StationCatalog
+
+
+def make_catalog():
+    return StationCatalog([
+        ('radio_swiss_jazz', 'http://a/jazz', {'genre': 'jazz', 'country': 'CH'}),
+        ('Bayern_3', 'http://a/b3', {}),
+        ('jazz_fm', 'http://a/jfm', {'genre': 'jazz'}),
+        ('classic', 'http://a/classic', {'tags': ['piano', 'Jazz Piano']}),
+        ('Jazzradio', 'http://a/jr', {}),
+    ])
+
+
+def test_prefix_matches_first_in_alphabetical_order():
+    catalog = make_catalog()
+    total, indices = catalog.search('JAZZ', limit=10)
+    names = [catalog.name_at(index) for index in indices]
+    assert total == 4
+    assert names == ['jazz_fm', 'Jazzradio', 'radio_swiss_jazz', 'classic']
+
+
+def test_all_words_must_match_and_paging():
+    catalog = make_catalog()
+    assert catalog.search('jazz ch', limit=10) == (1, [0])
+    assert catalog.search('jazz', limit=2, offset=1) == (4, [4, 0])
+    assert catalog.search('   ', limit=10) == (0, [])
+
+
+def test_prefix_past_every_name():
+    catalog = make_catalog()
+    assert catalog.search('zzz', limit=10) == (0, [])
+    assert catalog.search('bay', limit=10) == (1, [1])
+
+
+def test_name_lookup_across_table_growth():
+    entries = [(f'station_{i}_ä', f'http://a/{i}', {}) for i in range(500)]
+    catalog = StationCatalog(entries + [('station_7_ä', 'http://dup', {})])
+    assert len(catalog) == 500
+    assert catalog.index_of('station_321_ä') == 321
+    assert catalog.get_url('station_7_ä') == 'http://a/7'
+    assert 'station_500_ä' not in catalog
+    assert catalog.names()[:2] == ['station_0_ä', 'station_1_ä']
@@ -0,0 +1,97 @@
+"""Tests for merging navigation and volume commands."""
+import time
+
+import pytest
+
+import constants as const
+from coalescer import CommandCoalescer
+
+
+class InlineExecutor:
+    """Runs submitted commands right away."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, name, function, *args):
+        self.submitted.append(name)
+        return function(*args)
+
+
+class FakePlayer:
+    def __init__(self, stations):
+        self.stations = stations
+        self.current_station_index = 0
+        self.started = []
+        self.spoken = []
+
+    def start_stream(self, station, announce=True):
+        self.started.append(station)
+
+    def publish(self, event_type, data):
+        pass
+
+    def speak(self, text, priority=None, category=None):
+        self.spoken.append(text)
+
+
+class FakeVolume:
+    step_percent = 5
+
+    def __init__(self):
+        self.calls = []
+
+    def adjust(self, direction, steps=1):
+        self.calls.append(('adjust', direction, steps))
+
+    def set_level(self, level):
+        self.calls.append(('set_level', level))
+
+
+@pytest.fixture
+def coalescer(monkeypatch):
+    monkeypatch.setattr(const, 'COALESCE_SETTLE_TIME', 0.05)
+    monkeypatch.setattr(const, 'COALESCE_VOLUME_WINDOW', 0.05)
+    return CommandCoalescer(FakePlayer(['a', 'b', 'c', 'd']), FakeVolume(), InlineExecutor())
+
+
+def wait_for(condition, timeout=2.0):
+    """Poll until a condition holds."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_navigation_starts_one_stream(coalescer):
+    assert coalescer.navigate(1) == 'b'
+    assert coalescer.navigate(1) == 'c'
+    assert coalescer.navigate(-3) == 'd'
+    wait_for(lambda: coalescer.player.started)
+    time.sleep(0.1)
+    assert coalescer.player.started == ['d']
+    assert coalescer.player.spoken == ['b', 'c', 'd']
+
+
+def test_cancel_pending_drops_the_start(coalescer):
+    coalescer.navigate(1)
+    coalescer.cancel_pending()
+    time.sleep(0.15)
+    assert coalescer.player.started == []
+
+
+def test_volume_steps_are_merged(coalescer):
+    coalescer.adjust_volume('up')
+    coalescer.adjust_volume('up')
+    coalescer.adjust_volume('down')
+    coalescer.adjust_volume('up')
+    wait_for(lambda: coalescer.volume.calls)
+    assert coalescer.volume.calls == [('adjust', 'up', 2)]
+
+
+def test_absolute_level_replaces_steps(coalescer):
+    coalescer.adjust_volume('down')
+    coalescer.set_volume(40)
+    coalescer.adjust_volume('up')
+    wait_for(lambda: coalescer.volume.calls)
+    assert coalescer.volume.calls == [('set_level', 45)]
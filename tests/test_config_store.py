@@ -0,0 +1,105 @@
+"""Tests for the write-behind config store."""
+import json
+import threading
+
+import pytest
+
+import config_store
+import constants as const
+from config_store import ConfigStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(const, 'CONFIG_FLUSH_DELAY', 0.01)
+    monkeypatch.setattr(const, 'CONFIG_FLUSH_MAX_DELAY', 0.05)
+    store = ConfigStore(str(tmp_path / 'config.json'), {'volume': None, 'playing': True})
+    yield store
+    store.stop()
+
+
+def read(store):
+    with open(store.path) as f:
+        return json.load(f)
+
+
+def test_defaults_and_file_values(tmp_path):
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps({'volume': 40}))
+    store = ConfigStore(str(path), {'volume': None, 'playing': True})
+    assert store.get('volume') == 40
+    assert store.get('playing') is True
+
+
+def test_invalid_file_falls_back_to_defaults(tmp_path):
+    path = tmp_path / 'config.json'
+    path.write_text('{"volume": ')
+    assert ConfigStore(str(path), {'volume': 10}).get('volume') == 10
+
+
+def test_unchanged_values_are_not_written(store):
+    store.update(playing=True)
+    assert store.flush()
+    assert store.writes == 0
+
+
+def test_flush_writes_pending_changes(store):
+    store.update(volume=30)
+    assert store.flush()
+    assert read(store)['volume'] == 30
+    assert store.writes == 1
+    # Nothing pending any more
+    assert store.flush()
+    assert store.writes == 1
+
+
+def test_stop_writes_pending_changes(store):
+    store.start()
+    store.update(volume=55)
+    store.stop()
+    assert read(store)['volume'] == 55
+
+
+def test_concurrent_flushes_keep_the_newest_snapshot(store, monkeypatch):
+    """A slow write of an older snapshot must not finish after a newer one."""
+    first_write_started = threading.Event()
+    release_first_write = threading.Event()
+    original = config_store.write_atomic
+    calls = []
+
+    def slow_write(path, text):
+        calls.append(json.loads(text)['volume'])
+        if len(calls) == 1:
+            first_write_started.set()
+            release_first_write.wait(2)
+        original(path, text)
+
+    monkeypatch.setattr(config_store, 'write_atomic', slow_write)
+    store.update(volume=1)
+    background = threading.Thread(target=store.flush)
+    background.start()
+    assert first_write_started.wait(2)
+
+    store.update(volume=2)
+    foreground = threading.Thread(target=store.flush)
+    foreground.start()
+    # Without serialized writes the newer snapshot would be written meanwhile
+    foreground.join(0.2)
+    release_first_write.set()
+    background.join(2)
+    foreground.join(2)
+
+    assert calls == [1, 2]
+    assert read(store)['volume'] == 2
+
+
+def test_failed_write_stays_pending(store, monkeypatch):
+    def failing_write(path, text):
+        raise OSError("read-only file system")
+
+    monkeypatch.setattr(config_store, 'write_atomic', failing_write)
+    store.update(volume=70)
+    assert not store.flush()
+    monkeypatch.undo()
+    assert store.flush()
+    assert read(store)['volume'] == 70
@@ -0,0 +1,50 @@
+"""Tests for the metrics registry and its bounded station labels."""
+import collections
+
+import metrics
+from main import RadioPlayer
+from metrics import Counter, Histogram, LabelLimit, MetricsRegistry
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('latency_seconds', "Latency", labels=('kind',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 2.0):
+        histogram.observe(value, kind='a')
+    assert histogram.collect() == [
+        'latency_seconds_bucket{kind="a",le="0.1"} 1',
+        'latency_seconds_bucket{kind="a",le="1"} 2',
+        'latency_seconds_bucket{kind="a",le="+Inf"} 3',
+        'latency_seconds_sum{kind="a"} 2.550000',
+        'latency_seconds_count{kind="a"} 3',
+    ]
+
+
+def test_label_limit_reports_later_values_as_other():
+    limit = LabelLimit(2)
+    counter = Counter('failures_total', "Failures", labels=('station',), limits={'station': limit})
+    histogram = Histogram('first_audio_seconds', "First audio", labels=('station',), buckets=(1.0,),
+                          limits={'station': limit})
+    for station in ('a', 'b', 'c', 'd', 'a'):
+        counter.inc(station=station)
+    histogram.observe(0.5, station='c')
+    histogram.observe(0.5, station='b')
+    assert counter.collect() == ['failures_total{station="a"} 2', 'failures_total{station="b"} 1',
+                                 'failures_total{station="other"} 2']
+    # The limit is shared, so both metrics keep the same stations
+    assert [line for line in histogram.collect() if '_count' in line] == [
+        'first_audio_seconds_count{station="b"} 1', 'first_audio_seconds_count{station="other"} 1']
+
+
+def test_registry_render_has_help_and_type():
+    registry = MetricsRegistry()
+    registry.register(Counter('events_total', "Events")).inc()
+    assert registry.render() == '# HELP events_total Events\n# TYPE events_total counter\nevents_total 1\n'
+
+
+def test_switch_latency_is_recorded_per_station():
+    player = RadioPlayer.__new__(RadioPlayer)
+    player.switch_latencies = collections.deque()
+    player.startup_timer = None
+    player._record_switch_latency('jazz', 0.4, warm=True)
+    assert 'radio_first_audio_seconds_count{station="jazz",warm="true"} 1' in metrics.FIRST_AUDIO.collect()
+    assert metrics.FIRST_AUDIO.limits['station'] is metrics.FAILED_STARTS.limits['station']
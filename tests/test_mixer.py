@@ -0,0 +1,155 @@
+"""Tests for the mixer backends against a fake amixer."""
+import sys
+import textwrap
+
+import pytest
+
+from main import VolumeController
+from mixer import AmixerSessionMixer, SubprocessMixer, parse_mixer_state
+
+FAKE_AMIXER = '''
+import sys
+
+STATE = {state!r}
+
+
+def load():
+    with open(STATE) as f:
+        level, switch = f.read().split()
+    return int(level), switch
+
+
+def report(control):
+    level, switch = load()
+    print(f"Simple mixer control '{{control}}',0")
+    print("  Playback channels: Front Left - Front Right")
+    print("  Mono:")
+    for channel in ("Front Left", "Front Right"):
+        print(f"  {{channel}}: Playback {{level * 655}} [{{level}}%] [{{switch}}]")
+    sys.stdout.flush()
+
+
+def run(args):
+    command, control = args[0], args[1]
+    if control != 'Master':
+        print(f"amixer: Unable to find simple control '{{control}}',0", file=sys.stderr)
+        sys.stderr.flush()
+        return 1
+    if command in ('set', 'sset'):
+        level, switch = load()
+        value = args[2]
+        if value in ('mute', 'unmute'):
+            switch = 'off' if value == 'mute' else 'on'
+        elif value.endswith(('%+', '%-')):
+            delta = int(value[:-2])
+            level += delta if value.endswith('+') else -delta
+        else:
+            level = int(value.rstrip('%'))
+        with open(STATE, 'w') as f:
+            f.write(f"{{max(0, min(100, level))}} {{switch}}")
+    report(control)
+    return 0
+
+
+if sys.argv[1:] == ['-s']:
+    for line in sys.stdin:
+        run(line.split())
+else:
+    sys.exit(run(sys.argv[1:]))
+'''
+
+
+@pytest.fixture
+def amixer(tmp_path):
+    state = tmp_path / 'state'
+    state.write_text('50 off')
+    path = tmp_path / 'amixer'
+    path.write_text(f"#!{sys.executable}\n" + FAKE_AMIXER.format(state=str(state)))
+    path.chmod(0o755)
+    return str(path)
+
+
+@pytest.fixture
+def session(amixer):
+    mixer = AmixerSessionMixer(amixer)
+    yield mixer
+    mixer.close()
+
+
+def test_parse_mixer_state():
+    lines = textwrap.dedent("""\
+        Simple mixer control 'Master',0
+          Mono: Playback 30 [47%] [-17.25dB] [off]
+    """).splitlines()
+    assert parse_mixer_state(lines) == (47, True)
+    assert parse_mixer_state([]) == (None, None)
+
+
+def test_session_confirms_level_and_unmutes(session):
+    assert session.set_level(70) == 70
+    assert session.get_level() == 70
+    assert session.adjust(-5) == 65
+    assert session._muted is False
+
+
+def test_session_raises_on_error(amixer):
+    mixer = AmixerSessionMixer(amixer, control='Missing')
+    try:
+        with pytest.raises(RuntimeError, match='Unable to find'):
+            mixer._send('sset Missing 40%')
+        assert mixer.process is None
+    finally:
+        mixer.close()
+
+
+def test_session_restarts_after_error(session):
+    with pytest.raises(RuntimeError):
+        session._send('sset Missing 40%')
+    assert session.set_level(30) == 30
+
+
+def test_subprocess_confirms_level(amixer):
+    mixer = SubprocessMixer(amixer)
+    assert mixer.set_level(20) == 20
+    assert mixer.adjust(5) == 25
+
+
+def test_subprocess_raises_on_error(amixer):
+    mixer = SubprocessMixer(amixer, control='Missing')
+    with pytest.raises(RuntimeError, match='Unable to find'):
+        mixer.set_level(20)
+
+
+class RecordingEvents:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, event_type, data):
+        self.published.append((event_type, data))
+
+
+@pytest.fixture
+def volume(amixer):
+    controller = VolumeController(RecordingEvents())
+    controller.amixer_path = amixer
+    controller.mixer = AmixerSessionMixer(amixer)
+    yield controller
+    controller.mixer.close()
+
+
+def test_volume_publishes_confirmed_level_without_reading_back(volume, monkeypatch):
+    monkeypatch.setattr(volume.mixer, 'get_level', lambda: pytest.fail("level read back"))
+    assert volume.set_level(40)
+    volume.adjust('up', 2)
+    step = volume.step_percent
+    assert volume.events.published == [('volume', {'level': 40}), ('volume', {'level': 40 + 2 * step})]
+
+
+def test_volume_falls_back_when_session_fails(volume, monkeypatch):
+    def fail(command):
+        raise RuntimeError("no answer from amixer")
+
+    monkeypatch.setattr(volume.mixer, '_send', fail)
+    assert volume.set_level(35)
+    assert isinstance(volume.mixer, SubprocessMixer)
+    assert volume.events.published == [('volume', {'level': 35})]
@@ -0,0 +1,55 @@
+"""Tests for saving the playback state that is restored after a restart."""
+import json
+
+import pytest
+
+from main import ConfigManager, SystemManager
+
+
+class FakePlayer:
+    """Publishes playback events to the config manager like RadioPlayer does."""
+
+    def __init__(self, config_manager):
+        self.config_manager = config_manager
+
+    def play(self, station):
+        self.config_manager.record_event('playback', {'playing': True, 'station': station})
+
+    def stop_stream(self, user_initiated=True):
+        self.config_manager.record_event('playback', {'playing': False, 'station': None,
+                                                      'user_initiated': user_initiated})
+
+
+@pytest.fixture
+def config_manager(tmp_path):
+    manager = ConfigManager(str(tmp_path / 'config.json'))
+    yield manager
+    manager.close()
+
+
+def saved_state(config_manager):
+    with open(config_manager.config_file) as f:
+        return json.load(f)
+
+
+def test_user_stop_is_saved(config_manager):
+    player = FakePlayer(config_manager)
+    player.play('jazz')
+    player.stop_stream()
+    assert config_manager.get_playback_state() == {'last_station': 'jazz', 'volume': None, 'playing': False}
+
+
+def test_volume_is_saved(config_manager):
+    config_manager.record_event('volume', {'level': 35})
+    assert config_manager.get_playback_state()['volume'] == 35
+
+
+def test_stop_for_restart_keeps_playing_and_is_flushed(config_manager, tmp_path):
+    player = FakePlayer(config_manager)
+    player.play('jazz')
+    system = SystemManager(str(tmp_path), lambda *args, **kwargs: None, player, config_manager=config_manager)
+    system._stop_for_exit()
+    assert config_manager.get_playback_state()['playing'] is True
+    # Written before the service goes down, not left to the background writer
+    assert saved_state(config_manager)['last_station'] == 'jazz'
+    assert saved_state(config_manager)['playing'] is True
@@ -0,0 +1,119 @@
+"""Tests for the relay's buffering, playlist handling and ICY metadata parsing."""
+import io
+
+import constants as const
+import relay
+from relay import BufferedStream, extract_playlist_url, parse_icy_title
+
+
+def icy_block(title: str) -> bytes:
+    """Encode a metadata block with its length byte, like a server does."""
+    text = f"StreamTitle='{title}';".encode('utf-8')
+    padded = text + b'\0' * (-len(text) % 16)
+    return bytes([len(padded) // 16]) + padded
+
+
+class FakeResponse(io.BufferedReader):
+    """Upstream response with headers, read from bytes."""
+
+    def __init__(self, body: bytes, headers: dict):
+        super().__init__(io.BytesIO(body), buffer_size=5)
+        self.headers = headers
+
+    def geturl(self):
+        return 'http://example.com/stream'
+
+
+def receive(body: bytes, headers: dict) -> BufferedStream:
+    """Run the receive loop of a stream over a canned response."""
+    stream = BufferedStream('test', 'http://example.com/stream', max_bytes=1024 * 1024)
+    stream._open = lambda url, hops=3: FakeResponse(body, headers)
+    stream._run()
+    return stream
+
+
+def read_all(stream: BufferedStream) -> bytes:
+    """Get all buffered audio of a finished stream."""
+    _, data = stream.read(stream.start_offset, timeout=0)
+    return data
+
+
+def test_extract_playlist_url():
+    assert extract_playlist_url("#EXTM3U\n#EXTINF:-1,Radio\nhttp://a/stream\n") == 'http://a/stream'
+    assert extract_playlist_url("[playlist]\nFile1=https://b/stream\nTitle1=B\n") == 'https://b/stream'
+    assert extract_playlist_url("no urls here") is None
+
+
+def test_window_drops_oldest_chunks():
+    stream = BufferedStream('test', 'http://example.com/stream', max_bytes=10)
+    for chunk in (b'aaaa', b'bbbb', b'cccc', b'dddd'):
+        stream._append(chunk)
+    assert stream.start_offset == 8
+    assert stream.live_offset == 16
+    # Readers behind the window skip ahead to the oldest retained byte
+    offset, data = stream.read(0, timeout=0)
+    assert data == b'ccccdddd'
+    assert offset == 16
+
+
+def test_read_stops_at_limit():
+    stream = BufferedStream('test', 'http://example.com/stream', max_bytes=1024)
+    for chunk in (b'aaaa', b'bbbb', b'cccc'):
+        stream._append(chunk)
+    offset, data = stream.read(2, timeout=0, limit=4)
+    assert data == b'aabbbb'
+    assert offset == 8
+
+
+def test_parse_icy_title():
+    assert parse_icy_title(b"StreamTitle='Artist - Track';StreamUrl='';\0\0\0") == 'Artist - Track'
+    assert parse_icy_title("StreamTitle='Café';".encode('utf-8')) == 'Café'
+    assert parse_icy_title("StreamTitle='Café';".encode('latin-1')) == 'Café'
+    assert parse_icy_title(b"StreamTitle='';\0") is None
+    assert parse_icy_title(b"StreamUrl='http://x';") is None
+
+
+def test_metadata_is_removed_from_the_audio(monkeypatch):
+    monkeypatch.setattr(const, 'RELAY_READ_SIZE', 7)
+    audio = bytes(range(256)) * 4
+    metaint = 100
+    body = b''
+    titles = iter(['One', 'One', 'Two'])
+    for start in range(0, len(audio), metaint):
+        body += audio[start:start + metaint]
+        if start + metaint <= len(audio):
+            # Servers send an empty block while the title is unchanged
+            body += icy_block(next(titles)) if start // metaint < 3 else b'\0'
+
+    stream = receive(body, {'Content-Type': 'audio/mpeg', 'icy-metaint': str(metaint), 'icy-br': '128'})
+
+    assert stream.error is None
+    assert read_all(stream) == audio
+    assert stream.bytes_received == len(audio)
+    assert stream.title == 'Two'
+    assert stream.title_at(0) == 'One'
+    assert stream.title_at(2 * metaint) == 'One'
+    assert stream.title_at(3 * metaint) == 'Two'
+
+
+def test_stream_without_metaint_is_passed_through():
+    body = b'\xff\xfb' * 500
+    stream = receive(body, {'Content-Type': 'audio/mpeg'})
+    assert read_all(stream) == body
+    assert stream.title is None
+    assert stream.metaint is None
+
+
+def test_relay_title_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(const, 'ICY_TITLE_CACHE_SIZE', 2)
+    pool = relay.StreamRelay()
+    received = []
+    pool.add_title_listener(lambda station, title: received.append((station, title)))
+    pool._on_title('a', 'A1')
+    pool._on_title('b', 'B1')
+    pool._on_title('a', 'A2')
+    pool._on_title('c', 'C1')
+    assert pool.get_title('a') == 'A2'
+    assert pool.get_title('b') is None
+    assert pool.get_title('c') == 'C1'
+    assert received[-1] == ('c', 'C1')
@@ -0,0 +1,27 @@
+"""Tests for the soak test's series statistics."""
+from soak_test import summarize_series
+
+
+def test_empty_series():
+    assert summarize_series([]) == {'samples': 0, 'peak': None, 'min': None, 'mean': None,
+                                    'growth_per_hour': None}
+
+
+def test_steady_growth_is_reported_per_hour():
+    # One sample a minute for two hours, growing by 60 KB per hour
+    series = [(minute * 60.0, 1000 + minute) for minute in range(121)]
+    stats = summarize_series(series)
+    assert stats['samples'] == 121
+    assert stats['peak'] == 1120
+    assert stats['min'] == 1000
+    assert stats['mean'] == 1060
+    assert 55 <= stats['growth_per_hour'] <= 65
+
+
+def test_flat_series_has_no_growth():
+    series = [(seconds * 5.0, 500) for seconds in range(100)]
+    assert summarize_series(series)['growth_per_hour'] == 0
+
+
+def test_single_sample_has_no_growth():
+    assert summarize_series([(0.0, 42)])['growth_per_hour'] is None
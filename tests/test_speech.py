@@ -0,0 +1,57 @@
+"""Tests for the announcement cache."""
+import os
+
+from speech import AnnouncementCache
+
+
+def render(cache: AnnouncementCache, key: str, size: int) -> str:
+    """Write a rendered file of the given size and add it to the cache."""
+    with open(cache.temp_path_for(key), 'wb') as f:
+        f.write(b'\0' * size)
+    return cache.add(key)
+
+
+def test_add_and_get(tmp_path):
+    cache = AnnouncementCache(str(tmp_path), max_bytes=1000)
+    key = cache.make_key("Starting stream of jazz", 'voice')
+    assert cache.get(key) is None
+    path = render(cache, key, 100)
+    assert cache.get(key) == path
+    assert not os.path.exists(cache.temp_path_for(key))
+
+
+def test_empty_render_is_not_cached(tmp_path):
+    cache = AnnouncementCache(str(tmp_path), max_bytes=1000)
+    assert render(cache, 'empty', 0) is None
+    assert cache.get('empty') is None
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    cache = AnnouncementCache(str(tmp_path), max_bytes=250)
+    render(cache, 'a', 100)
+    render(cache, 'b', 100)
+    # Using 'a' makes 'b' the oldest entry
+    assert cache.get('a') is not None
+    render(cache, 'c', 100)
+    assert cache.get('b') is None
+    assert not os.path.exists(cache.path_for('b'))
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+
+
+def test_index_is_rebuilt_from_disk(tmp_path):
+    cache = AnnouncementCache(str(tmp_path), max_bytes=1000)
+    render(cache, 'a', 100)
+    # Left over from a render that was interrupted
+    with open(cache.temp_path_for('b'), 'wb') as f:
+        f.write(b'\0' * 10)
+    reopened = AnnouncementCache(str(tmp_path), max_bytes=1000)
+    assert reopened.get('a') == cache.path_for('a')
+    assert reopened.get('b') is None
+
+
+def test_missing_file_is_dropped(tmp_path):
+    cache = AnnouncementCache(str(tmp_path), max_bytes=1000)
+    render(cache, 'a', 100)
+    os.remove(cache.path_for('a'))
+    assert cache.get('a') is None
@@ -0,0 +1,27 @@
+"""Tests for the playback state reported by /status."""
+from main import RadioPlayer
+
+
+def make_player(stations):
+    player = RadioPlayer.__new__(RadioPlayer)
+    player.stations = stations
+    player.current_station_index = 0
+    player.get_current_station = lambda: stations[0]
+    for name in ('is_playing', 'is_paused', 'get_now_playing', 'get_timeshift', 'get_switch_latency_stats'):
+        setattr(player, name, lambda: None)
+    player.adaptive = None
+    return player
+
+
+def test_status_reports_station_list_and_neighbours():
+    status = make_player(['a', 'b', 'c']).get_status()
+    assert status['stations'] == ['a', 'b', 'c']
+    assert (status['station_count'], status['previous'], status['next']) == (3, 'c', 'b')
+
+
+def test_status_leaves_out_lazy_station_lists():
+    # Stands in for the sqlite backend's StationNames sequence
+    status = make_player(('a', 'b', 'c')).get_status()
+    assert status['stations'] is None
+    assert (status['station_count'], status['previous'], status['next']) == (3, 'c', 'b')
+
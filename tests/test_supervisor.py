@@ -0,0 +1,85 @@
+"""Tests for the stream supervisor's outage and reconnect bookkeeping."""
+import pytest
+
+from supervisor import StreamSupervisor
+
+
+class FakeBackend:
+    def __init__(self):
+        self.alive = True
+
+    def is_alive(self):
+        return self.alive
+
+
+class FakePlayer:
+    """Plays one station; restarts are recorded instead of run."""
+
+    executor = None
+
+    def __init__(self):
+        self.backend = FakeBackend()
+        self.playing_station = 'jazz'
+        self.restarts = []
+        self.supervisor = None
+
+    def is_playing(self):
+        return True
+
+    def is_paused(self):
+        return False
+
+    def get_current_relay_stream(self):
+        return None
+
+    def forget_resolved_url(self, station):
+        pass
+
+    def start_stream(self, station, announce=True):
+        self.restarts.append(station)
+        # Reports back while the supervisor may still be in its reconnect path
+        self.supervisor.on_stream_started()
+
+    def next_station(self):
+        self.restarts.append('next')
+
+
+@pytest.fixture
+def player():
+    player = FakePlayer()
+    player.supervisor = StreamSupervisor(player)
+    return player
+
+
+def test_failed_decoder_reconnects_with_backoff(player):
+    supervisor = player.supervisor
+    player.backend.alive = False
+    supervisor._check()
+    supervisor._check()
+    assert player.restarts == ['jazz']
+    assert supervisor.get_stats()['in_outage']
+    assert supervisor._attempt == 1
+
+
+def test_network_return_retries_without_backoff(player):
+    supervisor = player.supervisor
+    player.backend.alive = False
+    supervisor.network_online = False
+    supervisor._check()
+    assert player.restarts == []
+
+    supervisor.on_network_change(True, address_changed=False)
+    assert player.restarts == ['jazz']
+    assert supervisor._attempt == 1
+    # The attempt just made pushed the next one out, so the watchdog does not repeat it
+    supervisor._check()
+    assert player.restarts == ['jazz']
+
+
+def test_address_change_reconnects_healthy_stream(player):
+    supervisor = player.supervisor
+    supervisor.on_network_change(True, address_changed=True)
+    assert player.restarts == ['jazz']
+    stats = supervisor.get_stats()
+    assert stats['reconnects'] == 1
+    assert stats['station_failures'] == {'jazz': 1}
@@ -0,0 +1,182 @@
+"""
+Station file watcher.
+Reloads the station list when the station files change, so edits to
+custom_stations.json take effect without restarting the service. Uses
+inotify on Linux and falls back to polling modification times.
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import constants as const
+
+logger = logging.getLogger(__name__)
+
+# inotify flags from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+def open_inotify(directory: str) -> Optional[int]:
+    """
+    Create an inotify descriptor watching a directory.
+
+    Directories are watched instead of files because editors often save by
+    writing a new file and renaming it over the old one.
+
+    Args:
+        directory: Directory to watch
+
+    Returns:
+        Non-blocking file descriptor, or None if inotify is not available
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        if libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK) < 0:
+            error = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(error, os.strerror(error))
+        return fd
+    except (OSError, AttributeError) as e:
+        logger.info(f"inotify not available, polling station files instead: {e}")
+        return None
+
+
+def read_event_names(fd: int) -> List[str]:
+    """
+    Read pending inotify events.
+
+    Args:
+        fd: inotify file descriptor
+
+    Returns:
+        File names the events refer to
+    """
+    names = []
+    try:
+        data = os.read(fd, 64 * 1024)
+    except BlockingIOError:
+        return names
+    offset = 0
+    while offset + EVENT_HEADER.size <= len(data):
+        _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+        offset += EVENT_HEADER.size
+        names.append(os.fsdecode(data[offset:offset + length].rstrip(b'\0')))
+        offset += length
+    return names
+
+
+class StationFileWatcher:
+    """Background thread that reloads the StationManager when its files change."""
+
+    def __init__(self, station_manager):
+        """
+        Initialize the StationFileWatcher.
+
+        Args:
+            station_manager: StationManager to reload
+        """
+        self.station_manager = station_manager
+        self.reloads = 0
+        self._files = station_manager.get_watched_files()
+        self._directory = os.path.dirname(self._files[0])
+        self._fingerprints = self._take_fingerprints()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="station-watcher", daemon=True)
+
+    def start(self):
+        """Start watching in the background."""
+        self._thread.start()
+
+    def stop(self):
+        """Stop the watcher thread."""
+        self._stop.set()
+
+    def _take_fingerprints(self) -> Dict[str, Optional[Tuple[int, int, int]]]:
+        """Get (inode, size, mtime) of every watched file, None for missing files."""
+        fingerprints = {}
+        for path in self._files:
+            try:
+                stat = os.stat(path)
+                fingerprints[path] = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+            except FileNotFoundError:
+                fingerprints[path] = None
+        return fingerprints
+
+    def check(self) -> bool:
+        """
+        Reload the stations if a watched file changed since the last check.
+
+        Returns:
+            True if a watched file changed
+        """
+        fingerprints = self._take_fingerprints()
+        if fingerprints == self._fingerprints:
+            return False
+        changed = [os.path.basename(path) for path in self._files if fingerprints[path] != self._fingerprints[path]]
+        self._fingerprints = fingerprints
+        logger.info(f"Station files changed: {', '.join(changed)}")
+        if self.station_manager.reload():
+            self.reloads += 1
+        return True
+
+    def _run(self):
+        """Watch loop, event driven with inotify and polling otherwise."""
+        fd = open_inotify(self._directory)
+        try:
+            while not self._stop.is_set():
+                if fd is None:
+                    self._stop.wait(const.STATION_WATCH_POLL_INTERVAL)
+                elif not self._wait_for_event(fd):
+                    continue
+                try:
+                    self.check()
+                except Exception as e:
+                    logger.error(f"Station watcher error: {e}")
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def _wait_for_event(self, fd: int) -> bool:
+        """
+        Wait for a change to a watched file and for writes to settle.
+
+        Args:
+            fd: inotify file descriptor
+
+        Returns:
+            True if a watched file was touched
+        """
+        names = {os.path.basename(path) for path in self._files}
+        # Wake up regularly to notice stop()
+        readable, _, _ = select.select([fd], [], [], 1.0)
+        if not readable or not names.intersection(read_event_names(fd)):
+            return False
+
+        # Editors and imports write in several steps, reload once they are done
+        settle_until = time.monotonic() + const.STATION_WATCH_DEBOUNCE
+        while not self._stop.is_set():
+            remaining = settle_until - time.monotonic()
+            if remaining <= 0:
+                return True
+            readable, _, _ = select.select([fd], [], [], remaining)
+            if readable and names.intersection(read_event_names(fd)):
+                settle_until = time.monotonic() + const.STATION_WATCH_DEBOUNCE
+        return False